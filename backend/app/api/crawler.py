@@ -4,13 +4,14 @@ Crawler service for managing the web crawler.
 
 import asyncio
 import httpx
-import re
 import logging
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from datetime import datetime, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, text
+from sqlalchemy import select, text, update
 from typing import List, Optional
 from ..config.globals import (
     logger,
@@ -21,19 +22,21 @@ from ..config.globals import (
     set_current_crawler,
     get_seed_urls,
     set_seed_urls,
+    bump_index_generation,
 )
-from ..database.connection import get_db
+from ..database.connection import get_crawl_index, get_db
 from ..database.models import (
     Document,
-    DocumentRelationship,
     CrawlStatistics,
-    Term,
-    InvertedIndex,
     CrawlerState,
 )
 from .websocket_utils import broadcast_log
 from ..config.settings import settings
-from ..utils.rate_limiter import RateLimiter
+from ..database.frontier import PersistentFrontier
+from ..database.crawl_writer import CrawlWriter
+from ..database.link_analysis import LinkGraph, compute_pagerank
+from ..utils.bloom_filter import ScalableBloomFilter
+from ..utils.page_parser import PARSER_BACKENDS, ParsedPage, parse_page
 
 logging.getLogger("sqlalchemy.engine").setLevel(logging.ERROR)
 logging.getLogger("sqlalchemy.pool").setLevel(logging.ERROR)
@@ -55,12 +58,18 @@ class CrawlerService:
         self._running = False
         self._task = None
         self._seed_urls = []
-        self.to_visit = []
-        self.visited = set()
-        self.failed = set()
+        self.frontier = self._new_frontier()
+        self.writer = self._new_writer()
+        self.visited = self._new_seen_set()
+        self.failed = self._new_seen_set()
+        self._visited_before = 0
+        self._failed_before = 0
         self.stats = None
-        self.rate_limiter = RateLimiter(requests_per_second=1.0)
-        self.semaphore = asyncio.Semaphore(1)
+        self.num_workers = max(1, settings.CRAWLER_WORKERS)
+        self._db_lock = asyncio.Lock()
+        # Link graph loaded so far, so PageRank updates read only new links
+        self._link_graph = LinkGraph()
+        self._link_scores_updated = time.monotonic()
         self.client = httpx.AsyncClient(
             timeout=60.0,
             follow_redirects=True,
@@ -70,8 +79,24 @@ class CrawlerService:
                 "Accept": "text/html,application/xhtml+xml,application/xml",
                 "Accept-Language": "en-US,en;q=0.9",
             },
-            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
+            limits=httpx.Limits(
+                max_keepalive_connections=settings.CRAWLER_MAX_CONNECTIONS,
+                max_connections=settings.CRAWLER_MAX_CONNECTIONS,
+            ),
         )
+        if settings.CRAWLER_PARSER_BACKEND not in PARSER_BACKENDS:
+            raise ValueError(
+                f"Unknown parser backend {settings.CRAWLER_PARSER_BACKEND!r}, "
+                f"expected one of {list(PARSER_BACKENDS)}"
+            )
+        self.parser_backend = settings.CRAWLER_PARSER_BACKEND
+        # Parsing is CPU-bound, so it runs in worker processes off the event loop
+        self._parser_pool = None
+        if settings.CRAWLER_PARSER_PROCESSES > 0:
+            self._parser_pool = ProcessPoolExecutor(
+                max_workers=settings.CRAWLER_PARSER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
 
     async def start(self, seed_urls: Optional[List[str]] = None) -> None:
         """Start the crawler with optional seed URLs"""
@@ -88,24 +113,29 @@ class CrawlerService:
             await broadcast_log("No seed URLs provided")
             return
 
-        self.to_visit = []
-        self.visited = set()
-        self.failed = set()
+        self.frontier = self._new_frontier()
+        self.writer = self._new_writer()
+        self.visited = self._new_seen_set()
+        self.failed = self._new_seen_set()
 
         async with get_db() as db:
-            existing_docs = await db.execute(
-                select(Document).where(Document.is_crawled == True)
-            )
-            existing_docs = existing_docs.scalars().all()
+            # Resume from the frontier table; seeds already seen are ignored
+            pending = await self.frontier.open(db)
+            added = await self.frontier.push(db, seed_urls)
+            await db.commit()
+            await self.frontier.refill(db)
 
-            for doc in existing_docs:
-                if doc.crawl_failed:
-                    self.failed.add(doc.url)
-                else:
-                    self.visited.add(doc.url)
+            # Counts carry over from the previous run's state, if any
+            state = await db.execute(
+                select(CrawlerState).order_by(CrawlerState.id.desc()).limit(1)
+            )
+            state = state.scalar_one_or_none()
+            self._visited_before = state.urls_visited if state else 0
+            self._failed_before = state.urls_failed if state else 0
 
-        self.to_visit.extend(seed_urls)
-        await broadcast_log(f"Initialized crawler with {len(seed_urls)} seed URLs")
+        await broadcast_log(
+            f"Initialized crawler with {len(added)} new seed URLs and {pending} pending URLs"
+        )
 
         set_crawler_running(True)
         self._task = asyncio.create_task(self._crawl(seed_urls))
@@ -132,6 +162,7 @@ class CrawlerService:
         await broadcast_log("Stopped crawler")
 
     async def _crawl(self, seed_urls: List[str]) -> None:
+        workers = []
         try:
             async with get_db() as db:
                 # Initialize statistics
@@ -146,339 +177,292 @@ class CrawlerService:
                 # Initialize or update crawler state
                 state = CrawlerState(
                     current_url=seed_urls[0] if seed_urls else None,
-                    urls_visited=len(self.visited),
-                    urls_failed=len(self.failed),
-                    urls_queued=len(self.to_visit),
+                    urls_visited=self._visited_before,
+                    urls_failed=self._failed_before,
+                    urls_queued=len(self.frontier),
                     updated_at=datetime.now(timezone.utc),
                 )
                 db.add(state)
                 await db.commit()
 
-                # Initialize queue with seed URLs if empty
-                if not self.to_visit:
-                    self.to_visit.extend(seed_urls)
-                    await broadcast_log(
-                        f"Added {len(seed_urls)} seed URLs to the queue"
-                    )
+            await broadcast_log(
+                f"Starting crawl with {len(self.frontier)} URLs in queue and {self.num_workers} workers"
+            )
+            sample_urls = list(islice(self.frontier, 3))
+            await broadcast_log(
+                f"Queue content: {', '.join(sample_urls)}{'...' if len(self.frontier) > 3 else ''}"
+            )
 
-                await broadcast_log(
-                    f"Starting crawl with {len(self.to_visit)} URLs in queue"
-                )
-                await broadcast_log(
-                    f"Queue content: {', '.join(self.to_visit[:3])}{'...' if len(self.to_visit) > 3 else ''}"
-                )
+            workers = [
+                asyncio.create_task(self._worker(worker_id))
+                for worker_id in range(self.num_workers)
+            ]
+            await asyncio.gather(*workers)
 
-                while self.to_visit and is_crawler_running():
-                    url = self.to_visit.pop(0)
-                    await broadcast_log(f"Processing URL: {url}")
-
-                    if url in self.visited or url in self.failed:
-                        await broadcast_log(
-                            f"Skipping already visited/failed URL: {url}"
-                        )
-                        continue
-
-                    try:
-                        async with self.semaphore:  # Limit concurrent crawls
-                            await broadcast_log(f"Crawling: {url}")
-
-                            domain = urlparse(url).netloc
-                            await self.rate_limiter.async_wait_if_needed(domain)
-
-                            start_time = datetime.now(timezone.utc)
-                            await broadcast_log(f"Sending request to: {url}")
-
-                            response = await self.client.get(url)
-                            response.raise_for_status()
-
-                            end_time = datetime.now(timezone.utc)
-                            duration = (end_time - start_time).total_seconds()
-                            await broadcast_log(
-                                f"Received response from {url} in {duration:.2f} seconds"
-                            )
-
-                            soup = BeautifulSoup(response.text, "html.parser")
-                            title = soup.title.string if soup.title else url
-                            content = soup.get_text()
-
-                            await broadcast_log(
-                                f"Parsed content from {url}, title: {title[:30]}{'...' if len(title) > 30 else ''}"
-                            )
-
-                            # Use a new session for database operations
-                            async with get_db() as db:
-                                # Update or create document
-                                existing_doc = await self._document_exists(db, url)
-                                if existing_doc:
-                                    existing_doc.title = title
-                                    existing_doc.content = content
-                                    existing_doc.last_crawled_at = datetime.now(
-                                        timezone.utc
-                                    )
-                                    existing_doc.is_crawled = True
-                                    existing_doc.crawl_failed = False
-                                    existing_doc.error_message = None
-                                    doc = existing_doc
-                                else:
-                                    doc = Document(
-                                        url=url,
-                                        title=title,
-                                        content=content,
-                                        last_crawled_at=datetime.now(timezone.utc),
-                                        is_crawled=True,
-                                        crawl_failed=False,
-                                        error_message=None,
-                                    )
-                                    db.add(doc)
-
-                                await db.flush()
-                                await broadcast_log(
-                                    f"Added document to database, ID: {doc.id}"
-                                )
-
-                                # Extract and process new URLs
-                                new_urls = set()
-                                for link in soup.find_all("a", href=True):
-                                    href = link["href"]
-                                    if href.startswith("#") or href.startswith(
-                                        "mailto:"
-                                    ):
-                                        continue
-                                    full_url = urljoin(url, href)
-                                    normalized_url = self._normalize_url(full_url)
-                                    if (
-                                        normalized_url not in self.visited
-                                        and normalized_url not in self.failed
-                                        and normalized_url not in self.to_visit
-                                        and normalized_url != url
-                                        and self._is_valid_uci_url(normalized_url)
-                                    ):
-                                        new_urls.add(normalized_url)
-
-                                await broadcast_log(
-                                    f"Found {len(new_urls)} new URLs on {url}"
-                                )
-
-                                # Process new URLs and create relationships
-                                for new_url in new_urls:
-                                    if new_url not in self.to_visit:
-                                        self.to_visit.append(new_url)
-
-                                        existing_doc = await self._document_exists(
-                                            db, new_url
-                                        )
-                                        if existing_doc:
-                                            relationship = DocumentRelationship(
-                                                source_document_id=doc.id,
-                                                target_document_id=existing_doc.id,
-                                            )
-                                            db.add(relationship)
-                                        else:
-                                            target_doc = Document(
-                                                url=new_url,
-                                                title=new_url,
-                                                content="",
-                                                discovered_at=datetime.now(
-                                                    timezone.utc
-                                                ),
-                                                is_crawled=False,
-                                                crawl_failed=False,
-                                            )
-                                            db.add(target_doc)
-                                            await db.flush()
-
-                                            relationship = DocumentRelationship(
-                                                source_document_id=doc.id,
-                                                target_document_id=target_doc.id,
-                                            )
-                                            db.add(relationship)
-
-                                        state.urls_queued += 1
-
-                                await broadcast_log(
-                                    f"Crawled: {url} | Queue: {len(self.to_visit)} | New URLs: {len(new_urls)}"
-                                )
-                                if new_urls:
-                                    sample_urls = list(new_urls)[:3]
-                                    await broadcast_log(
-                                        f"Found URLs: {', '.join(sample_urls)}{'...' if len(new_urls) > 3 else ''}"
-                                    )
-
-                                # Update crawler state
-                                self.visited.add(url)
-                                state.current_url = url
-                                state.urls_visited += 1
-                                state.updated_at = datetime.now(timezone.utc)
-
-                                await self._update_statistics(True, db)
-                                await db.commit()
-                                await broadcast_log(f"Committed changes for {url}")
-
-                    except Exception as e:
-                        self.failed.add(url)
-                        error_msg = str(e)
-
-                        if "greenlet_spawn has not been called" in error_msg:
-                            logger.error(f"Async context error for {url}: {error_msg}")
-                            error_msg = "Database async context error. Try adjusting concurrency settings."
-
-                        try:
-                            # Use a new session for error logging
-                            async with get_db() as db:
-                                # Update failed state
-                                state = await db.execute(
-                                    select(CrawlerState)
-                                    .order_by(CrawlerState.id.desc())
-                                    .limit(1)
-                                )
-                                state = state.scalar_one_or_none()
-
-                                if state:
-                                    state.urls_failed += 1
-                                    state.updated_at = datetime.now(timezone.utc)
-                                    await db.commit()
-
-                                # Update document error state
-                                doc = await self._document_exists(db, url)
-                                if doc:
-                                    doc.crawl_failed = True
-                                    doc.error_message = error_msg
-                                    doc.last_crawled_at = datetime.now(timezone.utc)
-                                    await db.commit()
-
-                        except Exception as recovery_error:
-                            await broadcast_log(
-                                f"Failed to recover from error: {str(recovery_error)}"
-                            )
-
-                        await broadcast_log(f"Failed to crawl {url}: {error_msg}")
-
-                        try:
-                            async with get_db() as db:
-                                await self._update_statistics(False, db)
-                                await db.commit()
-                        except Exception:
-                            await broadcast_log(
-                                "Failed to update statistics after error"
-                            )
-
-                await broadcast_log(
-                    f"Crawling complete or stopped. Visited {len(self.visited)} URLs, Failed {len(self.failed)} URLs"
-                )
+            await broadcast_log(
+                f"Crawling complete or stopped. Visited {len(self.visited)} URLs, Failed {len(self.failed)} URLs"
+            )
 
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             await broadcast_log(f"Crawler error: {str(e)}")
             import traceback
 
             await broadcast_log(f"Stack trace: {traceback.format_exc()}")
         finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            # Persist whatever the workers buffered before stopping
+            await self._flush_writer(force=True)
+            await self._update_link_scores(force=True)
+            if self.writer.index is not None:
+                await self.writer.index.wait_for_merges()
+            try:
+                self.frontier.save_seen_filter()
+            except OSError as e:
+                logger.error(f"Error saving seen-URL filter: {str(e)}")
             set_crawler_running(False)
             set_crawler_task(None)
             set_current_crawler(None)
             await self.close()
             await broadcast_log("Crawler resources have been released")
 
+    async def _worker(self, worker_id: int) -> None:
+        """Fetch URLs from the shared queue until it drains or the crawler stops"""
+        while is_crawler_running():
+            # Blocks until some host is ready; None once memory has drained
+            url = await self.frontier.get()
+            if url is None:
+                # Buffered pages may hold the outlinks that refill the queue
+                await self._flush_writer(force=True)
+                async with self._db_lock, get_db() as db:
+                    await self.frontier.refill(db)
+                if not self.frontier.queue:
+                    return
+                continue
+
+            try:
+                if await self._already_processed(url):
+                    await broadcast_log(f"Skipping already visited/failed URL: {url}")
+                    continue
+
+                await broadcast_log(f"Worker {worker_id} processing URL: {url}")
+                await self._crawl_url(url)
+            finally:
+                self.frontier.release(url)
+
+    async def _crawl_url(self, url: str) -> None:
+        try:
+            await broadcast_log(f"Crawling: {url}")
+
+            start_time = datetime.now(timezone.utc)
+            await broadcast_log(f"Sending request to: {url}")
+
+            response = await self.client.get(url)
+            response.raise_for_status()
+
+            end_time = datetime.now(timezone.utc)
+            duration = (end_time - start_time).total_seconds()
+            await broadcast_log(
+                f"Received response from {url} in {duration:.2f} seconds"
+            )
+
+            page = await self._parse(url, response.text)
+            title = page.title
+
+            await broadcast_log(
+                f"Parsed content from {url}, title: {title[:30]}{'...' if len(title) > 30 else ''}"
+            )
+
+            # The writer links the page to every outlink and queues the ones
+            # the frontier has not seen yet
+            await broadcast_log(f"Found {len(page.outlinks)} links on {url}")
+
+            self.visited.add(url)
+            self.writer.add_page(
+                url,
+                title,
+                page.text,
+                page.outlinks,
+                page.term_frequencies,
+                page.passages,
+                page.term_positions,
+            )
+            await self._flush_writer()
+            await broadcast_log(f"Crawled: {url} | Queue: {len(self.frontier)}")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not is_crawler_running():
+                # Interrupted by stop(); the URL stays pending in the frontier
+                return
+
+            self.failed.add(url)
+            error_msg = str(e)
+
+            if "greenlet_spawn has not been called" in error_msg:
+                logger.error(f"Async context error for {url}: {error_msg}")
+                error_msg = (
+                    "Database async context error. Try adjusting concurrency settings."
+                )
+
+            self.writer.add_failure(url, error_msg)
+            await self._flush_writer()
+
+            await broadcast_log(f"Failed to crawl {url}: {error_msg}")
+
     async def close(self):
         await self.client.aclose()
+        if self._parser_pool:
+            self._parser_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _parse(self, url: str, html: str) -> ParsedPage:
+        """Parse a page in the process pool, or inline if the pool is disabled"""
+        if self._parser_pool is None:
+            return parse_page(url, html, self.parser_backend)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._parser_pool, parse_page, url, html, self.parser_backend
+        )
 
-    def _normalize_url(self, url: str) -> str:
-        """Normalize URL by removing fragments, query parameters and trailing slashes."""
-        parsed = urlparse(url)
-        normalized = f"{parsed.scheme}://{parsed.netloc}{parsed.path}".rstrip(
-            "/"
-        ).lower()
+    def _new_frontier(self) -> PersistentFrontier:
+        seen_filter = None
+        if settings.CRAWLER_SEEN_FILTER:
+            seen_filter = PersistentFrontier.load_seen_filter(
+                settings.CRAWLER_SEEN_FILTER_CAPACITY,
+                settings.CRAWLER_SEEN_FILTER_ERROR_RATE,
+            )
+        return PersistentFrontier(
+            requests_per_second=1.0 / settings.CRAWLER_DELAY,
+            batch_size=settings.CRAWLER_FRONTIER_BATCH_SIZE,
+            seen_filter=seen_filter,
+        )
 
-        if parsed.query and (
-            any(parsed.path.endswith(ext) for ext in [".php", ".aspx", ".jsp"])
-            or any(param in parsed.query for param in ["id", "article", "page", "p"])
-        ):
-            normalized += f"?{parsed.query}"
-
-        return normalized
-
-    def _is_valid_uci_url(self, url: str) -> bool:
-        parsed = urlparse(url)
-        return any(
-            domain in parsed.netloc
-            for domain in [
-                "uci.edu",
-                "ics.uci.edu",
-                "cs.uci.edu",
-                "informatics.uci.edu",
-                "stat.uci.edu",
-            ]
+    def _new_writer(self) -> CrawlWriter:
+        index = get_crawl_index() if settings.INDEX_SEGMENTS else None
+        return CrawlWriter(
+            self.frontier,
+            batch_size=settings.CRAWLER_WRITE_BATCH_SIZE,
+            flush_interval=settings.CRAWLER_WRITE_INTERVAL,
+            index=index,
         )
 
-    def _extract_text_content(self, soup: BeautifulSoup) -> str:
-        for script in soup(["script", "style"]):
-            script.decompose()
-        text = soup.get_text()
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        return " ".join(chunk for chunk in chunks if chunk)
-
-    def _tokenize(self, text: str) -> List[str]:
-        return [word.lower() for word in re.findall(r"\w+", text)]
-
-    async def _build_inverted_index(
-        self, doc_id: int, text: str, db: AsyncSession
-    ) -> None:
-        tokens = self._tokenize(text)
-        term_frequencies = {}
-
-        for token in tokens:
-            term_frequencies[token] = term_frequencies.get(token, 0) + 1
-
-        total_terms = len(tokens)
-
-        total_docs = (await db.execute(select(Document))).scalars().all()
-        total_docs = len(total_docs) or 1
-
-        for token, frequency in term_frequencies.items():
-            term = (
-                await db.execute(select(Term).where(Term.term == token))
-            ).scalar_one_or_none()
-            if not term:
-                term = Term(term=token)
-                db.add(term)
-                await db.commit()
+    async def _flush_writer(self, force: bool = False) -> None:
+        """Persist buffered crawl results once the batch is large or old enough"""
+        # An empty writer has nothing to flush
+        if not self.writer or not (force or self.writer.should_flush):
+            return
 
-            tf = frequency / total_terms
-            df = (
-                (
-                    await db.execute(
-                        select(InvertedIndex).where(InvertedIndex.term_id == term.id)
-                    )
+        try:
+            # SQLite allows a single writer, so workers take turns persisting
+            async with self._db_lock, get_db() as db:
+                result = await self.writer.flush(db)
+                await self._update_statistics(
+                    result.crawled, result.failed, db, current_url=result.last_url
                 )
-                .scalars()
-                .all()
+                await db.commit()
+                self.writer.confirm()
+                # Only committed frontier rows are paged into memory
+                await self.frontier.refill(db)
+        except Exception as e:
+            # The batch is buffered again and retried by the next flush
+            self.writer.rollback()
+            await broadcast_log(f"Failed to persist crawl batch: {str(e)}")
+            return
+
+        try:
+            # Segments are written outside the database lock
+            await self.writer.publish(result)
+        except Exception as e:
+            await broadcast_log(f"Failed to write index segment: {str(e)}")
+        bump_index_generation()
+
+        await broadcast_log(
+            f"Persisted {result.crawled} crawled and {result.failed} failed URLs | "
+            f"Queue: {len(self.frontier)} | New URLs: {len(result.new_urls)}"
+        )
+        if result.new_urls:
+            sample_urls = result.new_urls[:3]
+            await broadcast_log(
+                f"Found URLs: {', '.join(sample_urls)}{'...' if len(result.new_urls) > 3 else ''}"
             )
-            df = len(df) or 1
-            idf = 1 + (total_docs / df)
-            tf_idf = tf * idf
-
-            index_entry = InvertedIndex(
-                term_id=term.id,
-                document_id=doc_id,
-                term_frequency=frequency,
-                tf_idf=tf_idf,
+        await self._update_link_scores()
+
+    async def _update_link_scores(self, force: bool = False) -> None:
+        """Incrementally update PageRank once the update interval has passed"""
+        interval = settings.CRAWLER_PAGERANK_INTERVAL
+        if interval <= 0 or not (
+            force or time.monotonic() - self._link_scores_updated >= interval
+        ):
+            return
+        self._link_scores_updated = time.monotonic()
+
+        try:
+            async with self._db_lock, get_db() as db:
+                result = await compute_pagerank(
+                    db,
+                    damping=settings.PAGERANK_DAMPING,
+                    tolerance=settings.PAGERANK_TOLERANCE,
+                    max_iterations=settings.PAGERANK_MAX_ITERATIONS,
+                    incremental=True,
+                    graph=self._link_graph,
+                )
+        except Exception as e:
+            await broadcast_log(f"Failed to update PageRank: {str(e)}")
+            return
+        bump_index_generation()
+        await broadcast_log(
+            f"Updated PageRank of {result['updated']} of {result['documents']} documents"
+        )
+
+    def _new_seen_set(self):
+        if settings.CRAWLER_SEEN_FILTER:
+            return ScalableBloomFilter(
+                initial_capacity=settings.CRAWLER_SEEN_FILTER_CAPACITY,
+                error_rate=settings.CRAWLER_SEEN_FILTER_ERROR_RATE,
             )
-            db.add(index_entry)
+        return set()
 
-        await db.commit()
+    async def _already_processed(self, url: str) -> bool:
+        """Check whether a URL was crawled or failed during this run"""
+        if url not in self.visited and url not in self.failed:
+            return False
+        if not settings.CRAWLER_SEEN_FILTER:
+            return True
 
-    async def _update_statistics(self, success: bool = True, db: AsyncSession = None):
+        # Filter hits may be false positives; confirm against the documents table
+        async with get_db() as db:
+            doc = await self._document_exists(db, url)
+            return doc is not None and (doc.is_crawled or doc.crawl_failed)
+
+    async def _update_statistics(
+        self,
+        crawled: int = 0,
+        failed: int = 0,
+        db: AsyncSession = None,
+        current_url: Optional[str] = None,
+    ):
         """Update crawler statistics with minimal logging"""
         if not db:
             async with get_db() as db:
-                await self._update_statistics(success, db)
+                await self._update_statistics(crawled, failed, db, current_url)
                 return
 
         try:
-            if success:
-                self.stats.urls_crawled += 1
-            else:
-                self.stats.urls_failed += 1
+            # Increment in SQL: self.stats belongs to the session that created it
+            self.stats.urls_crawled += crawled
+            self.stats.urls_failed += failed
+            await db.execute(
+                update(CrawlStatistics)
+                .where(CrawlStatistics.id == self.stats.id)
+                .values(
+                    urls_crawled=CrawlStatistics.urls_crawled + crawled,
+                    urls_failed=CrawlStatistics.urls_failed + failed,
+                )
+            )
 
             state = await db.execute(
                 select(CrawlerState).order_by(CrawlerState.id.desc()).limit(1)
@@ -486,9 +470,11 @@ class CrawlerService:
             state = state.scalar_one_or_none()
 
             if state:
-                state.urls_visited = len(self.visited)
-                state.urls_failed = len(self.failed)
-                state.urls_queued = len(self.to_visit)
+                if current_url:
+                    state.current_url = current_url
+                state.urls_visited = self._visited_before + len(self.visited)
+                state.urls_failed = self._failed_before + len(self.failed)
+                state.urls_queued = len(self.frontier)
                 state.updated_at = datetime.now(timezone.utc)
 
             domains_query = """
@@ -500,6 +486,11 @@ class CrawlerService:
             """
             result = await db.execute(text(domains_query))
             self.stats.unique_domains = result.scalar() or 0
+            await db.execute(
+                update(CrawlStatistics)
+                .where(CrawlStatistics.id == self.stats.id)
+                .values(unique_domains=self.stats.unique_domains)
+            )
 
             await db.commit()
 
@@ -507,44 +498,11 @@ class CrawlerService:
             logger.error(f"Error updating statistics: {str(e)}")
 
     async def _reconstruct_queue(self, db: AsyncSession) -> int:
-        """Reconstruct the queue from database relationships"""
-        crawled_docs = (
-            (
-                await db.execute(
-                    select(Document)
-                    .join(
-                        DocumentRelationship,
-                        Document.id == DocumentRelationship.source_document_id,
-                    )
-                    .distinct()
-                )
-            )
-            .scalars()
-            .all()
-        )
-
-        discovered_docs = (
-            (
-                await db.execute(
-                    select(Document)
-                    .join(
-                        DocumentRelationship,
-                        Document.id == DocumentRelationship.target_document_id,
-                    )
-                    .distinct()
-                )
-            )
-            .scalars()
-            .all()
-        )
-
-        discovered_urls = {doc.url for doc in discovered_docs}
-        crawled_urls = {doc.url for doc in crawled_docs}
-
-        self.to_visit = list(discovered_urls - crawled_urls)
-        self.visited = crawled_urls
-
-        return len(self.to_visit)
+        """Reconstruct the queue from the documents table"""
+        await PersistentFrontier.clear(db)
+        self.frontier = self._new_frontier()
+        self.writer = self._new_writer()
+        return await self.frontier.open(db)
 
     async def _document_exists(self, db: AsyncSession, url: str) -> Optional[Document]:
         """Check if a document with the given URL exists in the database"""
@@ -11,19 +11,38 @@ from fastapi import (
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from ..database.connection import (
+    get_crawl_index,
     get_db,
+    get_seen_filter_path,
+    get_segment_path,
+    get_segments_path,
+    get_shards_path,
     handle_uploaded_db,
     setup_connections,
 )
 from .crawler import CrawlerService
+from ..database.frontier import PersistentFrontier
+from ..database.index_segment import export_segment, get_segment, remove_segment
+from ..database.link_analysis import compute_pagerank
+from ..database.postings_store import compact_postings
+from ..database.segmented_index import get_segmented_index
+from ..database.sharded_index import remove_sharded_index
 from .search import SearchService
+from ..utils.query_cache import QueryCache
+from ..utils.query_parser import parse_query
 from ..database.models import (
     Document,
     CrawlStatistics,
     Term,
+    TermStats,
+    DocumentStats,
+    Statistics,
     InvertedIndex,
+    TermPostings,
     CrawlerState,
     DocumentRelationship,
+    DocumentRank,
+    DocumentPassages,
 )
 from datetime import datetime, timezone
 import os
@@ -32,6 +51,8 @@ from ..config.globals import (
     logger,
     get_current_db,
     set_current_db,
+    get_index_generation,
+    bump_index_generation,
     get_available_databases,
     is_crawler_running,
     get_current_crawler,
@@ -46,10 +67,37 @@ from ..config.settings import settings
 from sqlalchemy import select, delete, update
 from fastapi.responses import FileResponse
 import traceback
+import httpx
 from pydantic import BaseModel
 
 router = APIRouter()
 
+search_cache = QueryCache(
+    max_entries=settings.SEARCH_CACHE_ENTRIES,
+    max_bytes=settings.SEARCH_CACHE_MAX_BYTES,
+    ttl=settings.SEARCH_CACHE_TTL,
+)
+# Client for forwarding searches when SEARCH_SERVER_URL is set, opened and
+# closed with the application
+_search_client: Optional[httpx.AsyncClient] = None
+
+
+async def open_search_client() -> None:
+    """Create the client that forwards searches to the search server"""
+    global _search_client
+    if settings.SEARCH_SERVER_URL and _search_client is None:
+        _search_client = httpx.AsyncClient(
+            base_url=settings.SEARCH_SERVER_URL, timeout=60.0
+        )
+
+
+async def close_search_client() -> None:
+    """Close the search server client and its connections"""
+    global _search_client
+    if _search_client is not None:
+        await _search_client.aclose()
+        _search_client = None
+
 
 async def verify_secret_key(
     x_secret_key: Optional[str] = Header(None, alias="X-Secret-Key")
@@ -111,6 +159,15 @@ async def delete_database(
 
     db_path = get_db_path(db_name)
     os.remove(db_path)
+    seen_filter_path = get_seen_filter_path(db_name)
+    if os.path.exists(seen_filter_path):
+        os.remove(seen_filter_path)
+    remove_segment(get_segment_path(db_name))
+    segments_path = get_segments_path(db_name)
+    if os.path.isdir(segments_path):
+        get_segmented_index(segments_path).clear()
+        os.rmdir(segments_path)
+    remove_sharded_index(get_shards_path(db_name))
     return {"message": f"Deleted database: {db_name}"}
 
 
@@ -130,6 +187,20 @@ async def upload_database(
     return {"message": f"Uploaded database: {new_db_name}"}
 
 
+async def clear_index(db: AsyncSession):
+    """Delete the inverted index and its statistics"""
+    await db.execute(delete(InvertedIndex))
+    await db.execute(delete(TermPostings))
+    await db.execute(delete(TermStats))
+    await db.execute(delete(DocumentStats))
+    await db.execute(delete(DocumentPassages))
+    await db.execute(delete(Statistics))
+    await db.execute(delete(Term))
+    if settings.INDEX_SEGMENTS:
+        get_crawl_index().clear()
+    bump_index_generation()
+
+
 @router.post("/crawler/start")
 async def start_crawler(
     seed_urls: List[str],
@@ -146,10 +217,12 @@ async def start_crawler(
                 await broadcast_log(f"Fresh mode: Clearing existing database content")
 
                 await db.execute(delete(DocumentRelationship))
-                await db.execute(delete(InvertedIndex))
+                await db.execute(delete(DocumentRank))
+                await clear_index(db)
                 await db.execute(delete(Document))
                 await db.execute(delete(CrawlStatistics))
                 await db.execute(delete(CrawlerState))
+                await PersistentFrontier.clear(db)
                 await db.commit()
 
                 crawler = CrawlerService()
@@ -167,25 +240,15 @@ async def start_crawler(
                         detail="No previous crawler state found to continue from",
                     )
 
-                uncrawled_docs = await db.execute(
-                    select(Document)
-                    .where(Document.is_crawled == False)
-                    .where(Document.crawl_failed == False)
-                )
-                uncrawled_docs = uncrawled_docs.scalars().all()
-                urls_to_visit = [doc.url for doc in uncrawled_docs]
-
-                if not urls_to_visit:
+                if not await PersistentFrontier.has_pending(db):
                     raise HTTPException(
                         status_code=400,
                         detail="No URLs found to continue crawling from",
                     )
 
-                await broadcast_log(
-                    f"Continue mode: Resuming with {len(urls_to_visit)} uncrawled URLs"
-                )
+                await broadcast_log("Continue mode: Resuming from the crawl frontier")
                 crawler = CrawlerService()
-                await crawler.start(urls_to_visit)
+                await crawler.start(seed_urls)
 
             elif mode == "recrawl":
                 await broadcast_log(f"Recrawl mode: Resetting crawl status")
@@ -199,8 +262,12 @@ async def start_crawler(
                     )
                 )
 
+                # Compacted postings cannot be updated in place, so every
+                # page is indexed again from scratch
+                await clear_index(db)
                 await db.execute(delete(CrawlStatistics))
                 await db.execute(delete(CrawlerState))
+                await PersistentFrontier.clear(db)
                 await db.commit()
 
                 crawler = CrawlerService()
@@ -239,6 +306,78 @@ async def stop_crawler(x_secret_key: str = Depends(verify_secret_key)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/index/compact")
+async def compact_index(x_secret_key: str = Depends(verify_secret_key)):
+    """Move the inverted index rows into compressed postings blobs"""
+    if is_crawler_running():
+        raise HTTPException(
+            status_code=400, detail="Cannot compact the index while crawling"
+        )
+
+    try:
+        async with get_db() as db:
+            terms = await compact_postings(db)
+        await broadcast_log(f"Compacted the postings of {terms} terms")
+        return {"message": "Index compacted successfully", "terms_compacted": terms}
+    except Exception as e:
+        logger.error(f"Error compacting index: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/index/export")
+async def export_index(x_secret_key: str = Depends(verify_secret_key)):
+    """Export the index as memory-mapped segment files for search serving"""
+    if is_crawler_running():
+        raise HTTPException(
+            status_code=400, detail="Cannot export the index while crawling"
+        )
+
+    try:
+        async with get_db() as db:
+            manifest = await export_segment(db, get_segment_path())
+        bump_index_generation()
+        await broadcast_log(
+            f"Exported an index segment of {manifest['documents']} documents"
+        )
+        return {"message": "Index exported successfully", "segment": manifest}
+    except Exception as e:
+        logger.error(f"Error exporting index: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/index/pagerank")
+async def rank_documents(
+    incremental: bool = Query(
+        False, description="Update the stored scores instead of recomputing them"
+    ),
+    x_secret_key: str = Depends(verify_secret_key),
+):
+    """Compute PageRank over the link graph for ranking search results"""
+    if is_crawler_running():
+        raise HTTPException(
+            status_code=400, detail="Cannot compute PageRank while crawling"
+        )
+
+    try:
+        async with get_db() as db:
+            result = await compute_pagerank(
+                db,
+                damping=settings.PAGERANK_DAMPING,
+                tolerance=settings.PAGERANK_TOLERANCE,
+                max_iterations=settings.PAGERANK_MAX_ITERATIONS,
+                incremental=incremental,
+            )
+        bump_index_generation()
+        await broadcast_log(
+            f"Computed PageRank of {result['documents']} documents over "
+            f"{result['links']} links in {result['iterations']} iterations"
+        )
+        return {"message": "PageRank computed successfully", **result}
+    except Exception as e:
+        logger.error(f"Error computing PageRank: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/crawler/status")
 async def get_crawler_status():
     """Get crawler status"""
@@ -285,7 +424,7 @@ async def get_detailed_statistics(db: AsyncSession = Depends(get_db)):
         await db.execute(select(CrawlStatistics).order_by(CrawlStatistics.id.desc()))
     ).scalar_one_or_none()
 
-    queue_size = len(get_current_crawler().to_visit) if get_current_crawler() else 0
+    queue_size = len(get_current_crawler().frontier) if get_current_crawler() else 0
 
     total_documents = (await db.execute(select(Document))).scalars().count()
     total_terms = (await db.execute(select(Term))).scalars().count()
@@ -354,7 +493,7 @@ async def run_crawler(mode: str):
             elif mode == "continue":
                 crawler = get_current_crawler()
                 if crawler:
-                    await crawler.start(crawler.to_visit)
+                    await crawler.start(list(crawler.frontier))
             elif mode == "recrawl":
                 crawler = CrawlerService()
                 seed_urls = [
@@ -380,11 +519,72 @@ async def search(
     query: str = Query(..., description="Search query"),
     page: int = Query(1, description="Page number", ge=1),
     per_page: int = Query(10, description="Results per page", ge=1, le=50),
-    db: AsyncSession = Depends(get_db),
 ):
     """Search the crawled content."""
-    search_service = SearchService(db)
-    return search_service.search(query, page, per_page)
+    if settings.SEARCH_SERVER_URL:
+        response = await _forward_search(query, page, per_page)
+        if response is not None:
+            return response
+    return await search_index(query, page, per_page)
+
+
+async def search_index(query: str, page: int, per_page: int):
+    """Search the current index, serving repeated queries from the cache"""
+    # Responses depend on the query only through its distinct terms and phrases
+    key = (get_current_db(), parse_query(query), page, per_page)
+    # Read before searching, so a response from a changing index is not kept
+    generation = get_index_generation()
+    cached = search_cache.get(key, generation)
+    if cached is not None:
+        return {**cached, "query": query}
+
+    response = await _search(query, page, per_page)
+    search_cache.put(key, generation, response)
+    return response
+
+
+@router.get("/search/cache")
+async def get_search_cache_statistics():
+    """Get search cache hit and miss counters"""
+    return search_cache.statistics()
+
+
+async def _forward_search(query: str, page: int, per_page: int):
+    """Send a search to the search server processes, or return None if they
+    serve a database other than the current one"""
+    if _search_client is None:
+        raise HTTPException(status_code=503, detail="Search server client not open")
+    db_name = get_current_db()
+    try:
+        response = await _search_client.get(
+            "/api/search",
+            params={"query": query, "page": page, "per_page": per_page, "db": db_name},
+        )
+        if response.status_code == 409:
+            logger.warning(f"Search server does not serve {db_name}, searching here")
+            return None
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.error(f"Error forwarding search: {str(e)}")
+        raise HTTPException(status_code=502, detail="Search server unavailable")
+    return response.json()
+
+
+async def _search(query: str, page: int, per_page: int):
+    segment = None
+    if settings.INDEX_SEGMENTS:
+        segment = get_crawl_index().snapshot()
+    elif settings.SEARCH_FROM_SEGMENT:
+        segment = get_segment(get_segment_path())
+    # Segment searches read only PageRank from the database
+    async with get_db() as db:
+        search_service = SearchService(
+            db,
+            segment=segment,
+            pagerank_weight=settings.SEARCH_PAGERANK_WEIGHT,
+            proximity_weight=settings.SEARCH_PROXIMITY_WEIGHT,
+        )
+        return await search_service.search(query, page, per_page)
 
 
 @router.get("/seed-urls")
@@ -1,43 +1,462 @@
+import asyncio
 import numpy as np
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-from ..database.models import Document, Term, InvertedIndex
-from .tokenizer import tokenize
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional, Tuple, Union
+from ..database.index_segment import IndexSegment
+from ..database.indexer import INDEX_STATISTICS_ID
+from ..database.link_analysis import PAGERANK_STATISTICS_ID
+from ..database.models import Document, DocumentPassages, DocumentRank, Statistics
+from ..database.postings_store import TermPositions, load_postings
+from ..database.segmented_index import SegmentSnapshot
+from ..database.sharded_index import ShardedSnapshot
+from ..database.term_dictionary import get_term_dictionary
+from ..utils.ranking import PostingList, accumulate, top_k
+from ..utils.positional import PositionalPostings, min_distances, phrase_documents
+from ..utils.query_parser import ParsedQuery, parse_query
+from ..utils.snippets import passage_snippet
+
+# Log-scaled PageRank of each database, with the time it was computed
+_link_score_cache: Dict[str, Tuple[datetime, Tuple[np.ndarray, np.ndarray]]] = {}
 
 
 class SearchService:
-    def __init__(self, db: Session):
+    """BM25 search over the inverted index.
+
+    Postings for the query terms are loaded once, from index rows and
+    compacted blobs, as NumPy arrays of (document, term frequency, document
+    length) and scored in a single vectorized pass, so a search costs a
+    fixed number of queries however many documents match. Only the top
+    page * per_page scores are ordered, and snippets are built only for the
+    returned page.
+
+    Queries are awaited on the AsyncSession, and scoring, segment reads and
+    snippets run in worker threads, so a large query does not hold up the
+    event loop serving the crawler and other requests.
+
+    Given an exported IndexSegment or a SegmentSnapshot of the segmented
+    index, searches read the mapped segment files instead of the database.
+    Given a ShardedSnapshot, each shard is ranked in its own thread with
+    index-wide document frequencies and the shards' top k lists are merged.
+    Otherwise query terms are resolved through the process-wide
+    TermDictionary, which queries only terms it has not seen since the
+    index last changed.
+
+    Quoted phrases restrict the results to documents containing them, found
+    by intersecting the phrase terms' positional postings. With a
+    proximity_weight, documents also score proximity_weight / d for each
+    pair of consecutive query terms whose closest occurrences are d
+    positions apart. Documents whose postings were indexed without positions
+    match no phrase and add no proximity score for those terms.
+
+    With a pagerank_weight, documents also score pagerank_weight *
+    log(1 + N * PageRank), where N * PageRank is 1 for a page of average
+    rank. The scores come from the database, also when searching segments,
+    whose document ids are the database's, and are cached per database until
+    compute_pagerank runs again.
+    """
+
+    def __init__(
+        self,
+        db: Optional[AsyncSession] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        segment: Optional[Union[IndexSegment, SegmentSnapshot, ShardedSnapshot]] = None,
+        pagerank_weight: float = 0.0,
+        proximity_weight: float = 0.0,
+    ):
         self.db = db
+        self.k1 = k1
+        self.b = b
+        self.segment = segment
+        self.pagerank_weight = pagerank_weight
+        self.proximity_weight = proximity_weight
+
+    async def _get_terms(self, query_terms: List[str]) -> Dict[str, Tuple[int, int]]:
+        """Map the indexed query terms to their id and document frequency"""
+        if self.segment is not None:
+            terms = {}
+            for term in query_terms:
+                term_id = self.segment.lookup(term)
+                if term_id is not None:
+                    terms[term] = (term_id, self.segment.document_frequency(term_id))
+            return terms
 
-    def _get_document_frequency(self, term: str) -> int:
-        term_record = self.db.query(Term).filter(Term.term == term).first()
-        if term_record and term_record.stats:
-            return term_record.stats.document_frequency
-        return 0
+        stats = await self.db.get(Statistics, INDEX_STATISTICS_ID)
+        if not stats:
+            return {}
+        # Indexing any document changes the index totals
+        version = (stats.timestamp, stats.documents_crawled, stats.total_terms)
+        return await get_term_dictionary(self.db.bind).lookup(
+            self.db, query_terms, version
+        )
 
-    def _get_documents_with_term(self, term: str) -> List[Document]:
-        term_record = self.db.query(Term).filter(Term.term == term).first()
-        if not term_record:
-            return []
+    async def _get_corpus_stats(self) -> Tuple[int, float]:
+        """Return the number of indexed documents and their average length"""
+        if self.segment is not None:
+            return self.segment.num_documents, self.segment.average_length
 
-        doc_ids = [entry.document_id for entry in term_record.inverted_index_entries]
-        return self.db.query(Document).filter(Document.id.in_(doc_ids)).all()
+        stats = await self.db.get(Statistics, INDEX_STATISTICS_ID)
+        if not stats or stats.documents_crawled <= 0:
+            return 0, 0.0
+        return stats.documents_crawled, stats.total_terms / stats.documents_crawled
 
-    def _get_term_positions(self, term: str, doc_id: int) -> List[int]:
-        term_record = self.db.query(Term).filter(Term.term == term).first()
-        if not term_record:
-            return []
+    async def _get_postings(
+        self, term_ids: List[int], with_positions: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Optional[TermPositions]]:
+        """Load postings as arrays of document id, term id, tf and doc length,
+        and the positions of each term's postings if requested"""
+        if self.segment is not None:
+            return await asyncio.to_thread(
+                self._read_segment_postings, self.segment, term_ids, with_positions
+            )
+
+        terms, docs, tf, doc_length, *positions = await load_postings(
+            self.db, term_ids, with_positions
+        )
+        return (
+            docs,
+            terms,
+            tf.astype(np.float64),
+            doc_length.astype(np.float64),
+            positions[0] if with_positions else None,
+        )
+
+    @staticmethod
+    def _read_segment_postings(
+        segment: Union[IndexSegment, SegmentSnapshot],
+        term_ids: List[int],
+        with_positions: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Optional[TermPositions]]:
+        term_ids = sorted(term_ids)
+        positions = None
+        if with_positions:
+            columns = [segment.positional_postings(t) for t in term_ids]
+            positions = {t: column[3] for t, column in zip(term_ids, columns)}
+            columns = [column[:3] for column in columns]
+        else:
+            columns = [segment.postings(t) for t in term_ids]
+        docs, tf, doc_length = (np.concatenate(c) for c in zip(*columns))
+        terms = np.repeat(term_ids, [segment.document_frequency(t) for t in term_ids])
+        return (
+            docs,
+            terms,
+            tf.astype(np.float64),
+            doc_length.astype(np.float64),
+            positions,
+        )
+
+    async def _get_documents(
+        self, doc_ids: List[int]
+    ) -> Dict[int, Tuple[str, str, str, Optional[bytes]]]:
+        """Map document ids to their (url, title, content, passage index)"""
+        if self.segment is not None:
+            return await asyncio.to_thread(self._read_segment_documents, doc_ids)
+
+        rows = await self.db.execute(
+            select(
+                Document.id,
+                Document.url,
+                Document.title,
+                Document.content,
+                DocumentPassages.data,
+            )
+            .outerjoin(DocumentPassages, DocumentPassages.document_id == Document.id)
+            .where(Document.id.in_(doc_ids))
+        )
+        return {doc_id: tuple(fields) for doc_id, *fields in rows.tuples()}
+
+    def _read_segment_documents(
+        self, doc_ids: List[int]
+    ) -> Dict[int, Tuple[str, str, str, Optional[bytes]]]:
+        passages = self.segment.passages(doc_ids)
+        return {
+            doc_id: (*fields, passages.get(doc_id))
+            for doc_id, fields in self.segment.documents(doc_ids).items()
+        }
 
+    async def _get_link_scores(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Return sorted document ids and their log-scaled PageRank, if weighted
+        and computed"""
+        if not self.pagerank_weight or self.db is None:
+            return None
+        stats = await self.db.get(Statistics, PAGERANK_STATISTICS_ID)
+        if not stats:
+            return None
+
+        key = str(self.db.bind.url)
+        cached = _link_score_cache.get(key)
+        if cached and cached[0] == stats.timestamp:
+            return cached[1]
+
+        rows = (
+            await self.db.execute(
+                select(DocumentRank.document_id, DocumentRank.pagerank).order_by(
+                    DocumentRank.document_id
+                )
+            )
+        ).all()
+        ranks = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        # Stored scores are unnormalized; scale so the average document gets 1
+        total = ranks[:, 1].sum()
+        link_scores = (
+            ranks[:, 0].astype(np.int64),
+            np.log1p(len(ranks) * ranks[:, 1] / total if total else ranks[:, 1]),
+        )
+        _link_score_cache[key] = (stats.timestamp, link_scores)
+        return link_scores
+
+    def _link_list(
+        self, lists: List[PostingList], ids: np.ndarray, link_scores: np.ndarray
+    ) -> PostingList:
+        """Weighted link scores of the documents matching any query term"""
+        docs = np.unique(np.concatenate([p.doc_ids for p in lists]))
+        pos = np.minimum(np.searchsorted(ids, docs), max(len(ids) - 1, 0))
+        scores = np.zeros(len(docs))
+        if len(ids):
+            hit = ids[pos] == docs
+            scores[hit] = self.pagerank_weight * link_scores[pos[hit]]
+        return PostingList(docs, scores)
+
+    def _score(
+        self,
+        term_ids: np.ndarray,
+        tf: np.ndarray,
+        doc_length: np.ndarray,
+        df: Dict[int, int],
+        total_docs: int,
+        avg_length: float,
+    ) -> np.ndarray:
+        """BM25 contribution of every posting"""
+        known_terms = np.array(sorted(df), dtype=np.int64)
+        known_df = np.array([df[term_id] for term_id in known_terms], dtype=np.float64)
+        df_by_term = known_df[np.searchsorted(known_terms, term_ids)]
+        idf = np.log1p((total_docs - df_by_term + 0.5) / (df_by_term + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * doc_length / max(avg_length, 1.0))
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    @staticmethod
+    def _split_by_term(
+        term_ids: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray
+    ) -> List[PostingList]:
+        """Split postings sorted by (term, document) into one list per term"""
+        starts = np.flatnonzero(np.diff(term_ids)) + 1
         return [
-            entry.position
-            for entry in self.db.query(InvertedIndex)
-            .filter(
-                InvertedIndex.term_id == term_record.id,
-                InvertedIndex.document_id == doc_id,
+            PostingList(docs, scores)
+            for docs, scores in zip(
+                np.split(doc_ids, starts), np.split(weights, starts)
             )
-            .all()
         ]
 
+    def _positional_query(
+        self, query: ParsedQuery, keys: Dict[str, int]
+    ) -> Optional[Tuple[List[List[int]], List[Tuple[int, int]]]]:
+        """Return the query's phrases and consecutive term pairs as term ids,
+        or None if ranking needs no positions"""
+        phrases = [[keys[term] for term in phrase] for phrase in query.phrases]
+        pairs = []
+        if self.proximity_weight:
+            indexed = [keys[term] for term in query.terms if term in keys]
+            pairs = list(zip(indexed, indexed[1:]))
+        return (phrases, pairs) if phrases or pairs else None
+
+    @staticmethod
+    def _has_phrase_terms(query: ParsedQuery, keys: Dict[str, int]) -> bool:
+        return all(term in keys for phrase in query.phrases for term in phrase)
+
+    async def _rank_index(
+        self, query: ParsedQuery, k: int
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, int]]:
+        """Return the top k documents, their scores and the total, if any match"""
+        terms = await self._get_terms(list(query.terms))
+        total_docs, avg_length = await self._get_corpus_stats()
+        keys = {term: term_id for term, (term_id, _) in terms.items()}
+        if not terms or not total_docs or not self._has_phrase_terms(query, keys):
+            return None
+        df = dict(terms.values())
+        positional = self._positional_query(query, keys)
+
+        doc_ids, term_ids, tf, doc_length, positions = await self._get_postings(
+            list(df), positional is not None
+        )
+        if not len(doc_ids):
+            return None
+
+        link_scores = await self._get_link_scores()
+        postings = (
+            doc_ids,
+            term_ids,
+            tf,
+            doc_length,
+            positions,
+            df,
+            total_docs,
+            avg_length,
+        )
+        return await asyncio.to_thread(self._rank, postings, link_scores, k, positional)
+
+    async def _rank_shards(
+        self, query: ParsedQuery, k: int
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, int]]:
+        """Rank every shard in parallel and merge their top k lists"""
+        keys, df = self.segment.lookup(list(query.terms))
+        total_docs = self.segment.num_documents
+        if not df or not total_docs:
+            return None
+
+        shards = []
+        for shard, shard_keys in zip(self.segment.shards, keys):
+            term_keys = {term: key for key, term in shard_keys.items()}
+            # A shard missing a phrase term has no document with the phrase
+            if shard_keys and self._has_phrase_terms(query, term_keys):
+                shards.append((shard, shard_keys, term_keys))
+        if not shards:
+            return None
+
+        # Shards score with index-wide statistics, so their scores compare
+        link_scores = await self._get_link_scores()
+        ranked = await asyncio.gather(
+            *(
+                asyncio.to_thread(
+                    self._rank_shard,
+                    shard,
+                    {key: df[term] for key, term in shard_keys.items()},
+                    total_docs,
+                    self.segment.average_length,
+                    link_scores,
+                    k,
+                    self._positional_query(query, term_keys),
+                )
+                for shard, shard_keys, term_keys in shards
+            )
+        )
+        docs, scores, totals = zip(*ranked)
+        # Shards hold disjoint documents, so their totals add up
+        docs, scores = top_k(np.concatenate(docs), np.concatenate(scores), k)
+        return docs, scores, sum(totals)
+
+    def _rank_shard(
+        self,
+        shard: SegmentSnapshot,
+        df: Dict[int, int],
+        total_docs: int,
+        avg_length: float,
+        link_scores: Optional[Tuple[np.ndarray, np.ndarray]],
+        k: int,
+        positional: Optional[Tuple[List[List[int]], List[Tuple[int, int]]]],
+    ) -> Tuple[np.ndarray, np.ndarray, int]:
+        postings = self._read_segment_postings(shard, list(df), positional is not None)
+        return self._rank(
+            (*postings, df, total_docs, avg_length), link_scores, k, positional
+        )
+
+    def _rank(
+        self,
+        postings: Tuple,
+        link_scores: Optional[Tuple[np.ndarray, np.ndarray]],
+        k: int,
+        positional: Optional[Tuple[List[List[int]], List[Tuple[int, int]]]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Score postings and return the top k documents, scores and total"""
+        doc_ids, term_ids, tf, doc_length, positions, df, total_docs, avg_length = (
+            postings
+        )
+        weights = self._score(term_ids, tf, doc_length, df, total_docs, avg_length)
+        lists = self._split_by_term(term_ids, doc_ids, weights)
+
+        matches = None
+        if positional is not None:
+            matches, proximity = self._match_positions(
+                term_ids, doc_ids, tf, positions, *positional
+            )
+            if proximity is not None:
+                lists.append(proximity)
+            if matches is not None:
+                phrase_lists = []
+                for p in lists:
+                    keep = np.isin(p.doc_ids, matches, assume_unique=True)
+                    if keep.any():
+                        phrase_lists.append(
+                            PostingList(p.doc_ids[keep], p.scores[keep])
+                        )
+                lists = phrase_lists
+                if not lists:
+                    return np.empty(0, dtype=np.int64), np.empty(0), 0
+        if link_scores is not None:
+            lists.append(self._link_list(lists, *link_scores))
+
+        docs, scores = accumulate(lists)
+        total = len(docs)
+        docs, scores = top_k(docs, scores, k)
+        return docs, scores, total
+
+    def _match_positions(
+        self,
+        term_ids: np.ndarray,
+        doc_ids: np.ndarray,
+        tf: np.ndarray,
+        positions: TermPositions,
+        phrases: List[List[int]],
+        pairs: List[Tuple[int, int]],
+    ) -> Tuple[Optional[np.ndarray], Optional[PostingList]]:
+        """Find the documents containing every phrase, if there are phrases,
+        and the proximity scores of the documents"""
+        starts = np.flatnonzero(np.diff(term_ids)) + 1
+        bounds = np.concatenate(([0], starts, [len(term_ids)]))
+        terms = {
+            int(term_ids[start]): PositionalPostings(
+                doc_ids[start:end],
+                tf[start:end].astype(np.int64),
+                positions[int(term_ids[start])],
+            )
+            for start, end in zip(bounds[:-1], bounds[1:])
+        }
+
+        matches = None
+        for phrase in phrases:
+            if not all(term_id in terms for term_id in phrase):
+                return np.empty(0, dtype=np.int64), None
+            docs = phrase_documents([terms[term_id] for term_id in phrase])
+            matches = (
+                docs
+                if matches is None
+                else np.intersect1d(matches, docs, assume_unique=True)
+            )
+
+        pair_lists = []
+        for first, second in pairs:
+            if first in terms and second in terms:
+                docs, distances = min_distances(terms[first], terms[second])
+                if len(docs):
+                    pair_lists.append(
+                        PostingList(docs, self.proximity_weight / distances)
+                    )
+        proximity = PostingList(*accumulate(pair_lists)) if pair_lists else None
+        return matches, proximity
+
+    def _build_results(
+        self,
+        page_ids: List[int],
+        page_scores: np.ndarray,
+        documents: Dict[int, Tuple[str, str, str, Optional[bytes]]],
+        query_terms: List[str],
+    ) -> List[Dict[str, Any]]:
+        results = []
+        for doc_id, score in zip(page_ids, page_scores):
+            if doc_id not in documents:
+                continue
+            url, title, content, passages = documents[doc_id]
+            if passages:
+                snippet = passage_snippet(content or "", passages, query_terms)
+            else:
+                # Indexed before passage indexes were stored
+                snippet = self._get_snippet(content or "", query_terms)
+            results.append(
+                {"url": url, "title": title, "snippet": snippet, "score": float(score)}
+            )
+        return results
+
     def _get_snippet(
         self, text: str, query_terms: List[str], max_length: int = 200
     ) -> str:
@@ -64,63 +483,47 @@ class SearchService:
 
         return snippet
 
-    def search(self, query: str, page: int = 1, per_page: int = 10) -> Dict[str, Any]:
-        query_terms = tokenize(query)
-        if not query_terms:
-            return {
-                "query": query,
-                "total_results": 0,
-                "page": page,
-                "per_page": per_page,
-                "total_pages": 0,
-                "results": [],
-            }
-
-        all_docs = set()
-        for term in query_terms:
-            docs = self._get_documents_with_term(term)
-            all_docs.update(docs)
-
-        results = []
-        total_docs = self.db.query(Document).count() or 1
+    async def search(
+        self, query: str, page: int = 1, per_page: int = 10
+    ) -> Dict[str, Any]:
+        """Return one page of results ranked by BM25.
 
-        for doc in all_docs:
-            score = 0
-            for term in query_terms:
-                positions = self._get_term_positions(term, doc.id)
-                tf = (
-                    len(positions) / len(tokenize(doc.text_content or ""))
-                    if doc.text_content
-                    else 0
-                )
-
-                df = self._get_document_frequency(term)
-                idf = np.log(total_docs / (df + 1))
-
-                score += tf * idf
-
-            if score > 0:
-                snippet = self._get_snippet(doc.text_content or "", query_terms)
-                results.append(
-                    {
-                        "url": doc.url,
-                        "title": doc.title,
-                        "snippet": snippet,
-                        "score": float(score),
-                    }
-                )
-
-        results.sort(key=lambda x: x["score"], reverse=True)
-
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        paginated_results = results[start_idx:end_idx]
-
-        return {
+        Args:
+            query: Search query, with phrases in double quotes
+            page: 1-based page number
+            per_page: Results per page
+        """
+        parsed = parse_query(query)
+        query_terms = list(parsed.terms)
+        response = {
             "query": query,
-            "total_results": len(results),
+            "total_results": 0,
             "page": page,
             "per_page": per_page,
-            "total_pages": (len(results) + per_page - 1) // per_page,
-            "results": paginated_results,
+            "total_pages": 0,
+            "results": [],
         }
+        if not query_terms:
+            return response
+
+        if isinstance(self.segment, ShardedSnapshot):
+            ranked = await self._rank_shards(parsed, page * per_page)
+        else:
+            ranked = await self._rank_index(parsed, page * per_page)
+        if ranked is None:
+            return response
+        docs, scores, total = ranked
+
+        start_idx = (page - 1) * per_page
+        page_ids = [int(doc_id) for doc_id in docs[start_idx:]]
+        page_scores = scores[start_idx:]
+
+        documents = await self._get_documents(page_ids)
+        results = await asyncio.to_thread(
+            self._build_results, page_ids, page_scores, documents, query_terms
+        )
+
+        response["total_results"] = total
+        response["total_pages"] = (total + per_page - 1) // per_page
+        response["results"] = results
+        return response
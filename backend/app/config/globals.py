@@ -30,6 +30,9 @@ _current_crawler: Optional[Any] = None
 
 _seed_urls: List[str] = []
 
+# Incremented whenever the searchable index may have changed
+_index_generation: int = 0
+
 
 def get_current_db() -> str:
     """Get the current database name"""
@@ -40,6 +43,7 @@ def set_current_db(db_name: str) -> None:
     """Set the current database name"""
     global _current_db_name
     _current_db_name = db_name
+    bump_index_generation()
     logger.info(f"Current database set to: {db_name}")
 
 
@@ -126,3 +130,14 @@ def set_seed_urls(urls: List[str]) -> None:
     global _seed_urls
     _seed_urls = urls
     logger.info(f"Seed URLs updated: {urls}")
+
+
+def get_index_generation() -> int:
+    """Get the generation of the searchable index"""
+    return _index_generation
+
+
+def bump_index_generation() -> None:
+    """Record that the searchable index changed, invalidating cached results"""
+    global _index_generation
+    _index_generation += 1
@@ -3,7 +3,7 @@ Application settings using Pydantic v2.
 """
 
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 import os
 
 
@@ -35,6 +35,46 @@ class Settings(BaseModel):
     CRAWLER_MAX_DEPTH: int = Field(default=3)
     CRAWLER_MAX_PAGES: int = Field(default=100)
     CRAWLER_DELAY: float = Field(default=1.0)
+    CRAWLER_WORKERS: int = Field(default=16)
+    CRAWLER_MAX_CONNECTIONS: int = Field(default=32)
+    CRAWLER_PARSER_BACKEND: str = Field(default="bs4")
+    CRAWLER_PARSER_PROCESSES: int = Field(default=os.cpu_count() or 1)
+    CRAWLER_FRONTIER_BATCH_SIZE: int = Field(default=1000)
+    CRAWLER_WRITE_BATCH_SIZE: int = Field(default=50)
+    CRAWLER_WRITE_INTERVAL: float = Field(default=2.0)
+    CRAWLER_SEEN_FILTER: bool = Field(default=False)
+    CRAWLER_SEEN_FILTER_CAPACITY: int = Field(default=1000000)
+    CRAWLER_SEEN_FILTER_ERROR_RATE: float = Field(default=0.001)
+
+    # Serve searches from the exported index segment when there is one
+    SEARCH_FROM_SEGMENT: bool = Field(default=False)
+    # Index crawled pages into merged segment files instead of SQLite
+    INDEX_SEGMENTS: bool = Field(default=False)
+    INDEX_MERGE_FACTOR: int = Field(default=10)
+    # Hash-partition the segmented index across this many shards when above 1
+    INDEX_SHARDS: int = Field(default=1)
+
+    PAGERANK_DAMPING: float = Field(default=0.85)
+    PAGERANK_TOLERANCE: float = Field(default=1e-6)
+    PAGERANK_MAX_ITERATIONS: int = Field(default=100)
+    # Seconds between incremental PageRank updates while crawling, 0 to disable
+    CRAWLER_PAGERANK_INTERVAL: float = Field(default=0.0)
+    # Weight of log(1 + N * PageRank) added to BM25 scores, 0 to disable
+    SEARCH_PAGERANK_WEIGHT: float = Field(default=0.5)
+    # Score added per pair of consecutive query terms, divided by how far
+    # apart they occur, 0 to disable
+    SEARCH_PROXIMITY_WEIGHT: float = Field(default=1.0)
+
+    # Cached search responses, dropped whenever the index changes
+    SEARCH_CACHE_ENTRIES: int = Field(default=1024)
+    SEARCH_CACHE_MAX_BYTES: int = Field(default=32 * 1024 * 1024)
+    SEARCH_CACHE_TTL: float = Field(default=300.0)
+
+    # Search server processes, see app.search_server
+    SEARCH_WORKERS: int = Field(default=os.cpu_count() or 1)
+    SEARCH_SERVER_PORT: int = Field(default=8001)
+    # Forward /api/search to a search server at this URL instead of searching here
+    SEARCH_SERVER_URL: Optional[str] = Field(default=None)
 
 
 settings = Settings()
@@ -5,10 +5,12 @@ Database connection management
 import logging
 import os
 import shutil
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.declarative import declarative_base
-from typing import Optional, AsyncGenerator
+from typing import Dict, List, Optional, AsyncGenerator, Union
 from datetime import datetime
 from contextlib import asynccontextmanager
 from ..config.globals import (
@@ -26,8 +28,22 @@ from .models import (
     InvertedIndex,
     CrawlerState,
 )  # Import Base and models
+from .segmented_index import SegmentedIndex, get_segmented_index
+from .sharded_index import ShardedIndex, close_sharded_indexes, get_sharded_index
 from fastapi import UploadFile
 
+# Columns added to tables that existing database files already have.
+# create_all only creates missing tables, so these are added with ALTER TABLE.
+_ADDED_COLUMNS: Dict[str, Dict[str, str]] = {
+    "inverted_index": {"positions": "BLOB"},
+}
+
+# Unique indexes added to tables that existing database files already have,
+# by table. Rows duplicating an earlier one are deleted before creating them.
+_ADDED_UNIQUE_INDEXES: Dict[str, List[str]] = {
+    "document_relationships": ["idx_document_relationships_link"],
+}
+
 # Global engine and session factory
 _engine: Optional[create_async_engine] = None
 _session_factory: Optional[async_sessionmaker] = None
@@ -40,8 +56,51 @@ def get_db_path(db_name: str = settings.DEFAULT_DB_NAME) -> str:
     return os.path.join(settings.DB_DIR, f"{db_name}.sqlite")
 
 
-async def setup_engine(db_name: str = get_current_db()) -> None:
-    """Set up the SQLAlchemy engine for the specified database"""
+def get_seen_filter_path(db_name: Optional[str] = None) -> str:
+    """Get the path of the seen-URL filter stored next to a database file"""
+    os.makedirs(settings.DB_DIR, exist_ok=True)
+    return os.path.join(settings.DB_DIR, f"{db_name or get_current_db()}.seen")
+
+
+def get_segment_path(db_name: Optional[str] = None) -> str:
+    """Get the directory of the index segment exported from a database"""
+    os.makedirs(settings.DB_DIR, exist_ok=True)
+    return os.path.join(settings.DB_DIR, f"{db_name or get_current_db()}.segment")
+
+
+def get_segments_path(db_name: Optional[str] = None) -> str:
+    """Get the directory of the segmented index kept for a database"""
+    os.makedirs(settings.DB_DIR, exist_ok=True)
+    return os.path.join(settings.DB_DIR, f"{db_name or get_current_db()}.segments")
+
+
+def get_shards_path(db_name: Optional[str] = None) -> str:
+    """Get the directory of the sharded index kept for a database"""
+    os.makedirs(settings.DB_DIR, exist_ok=True)
+    return os.path.join(settings.DB_DIR, f"{db_name or get_current_db()}.shards")
+
+
+def get_crawl_index(
+    db_name: Optional[str] = None,
+) -> Union[SegmentedIndex, ShardedIndex]:
+    """Get the index that crawled pages are written to with INDEX_SEGMENTS"""
+    if settings.INDEX_SHARDS > 1:
+        return get_sharded_index(
+            get_shards_path(db_name), settings.INDEX_SHARDS, settings.INDEX_MERGE_FACTOR
+        )
+    return get_segmented_index(get_segments_path(db_name), settings.INDEX_MERGE_FACTOR)
+
+
+async def setup_engine(
+    db_name: str = get_current_db(), read_only: bool = False
+) -> None:
+    """Set up the SQLAlchemy engine for the specified database
+
+    Args:
+        db_name: Name of the database
+        read_only: Open the file read-only, so processes serving searches
+            cannot write to a database the crawler is writing
+    """
     global _engine
     if _engine is not None:
         await _engine.dispose()
@@ -49,6 +108,8 @@ async def setup_engine(db_name: str = get_current_db()) -> None:
     os.makedirs(settings.DB_DIR, exist_ok=True)
     db_path = get_db_path(db_name)
     db_url = f"sqlite+aiosqlite:///{db_path}"
+    if read_only:
+        db_url = f"sqlite+aiosqlite:///file:{db_path}?mode=ro&uri=true"
 
     _engine = create_async_engine(
         db_url, echo=True, connect_args={"check_same_thread": False}
@@ -71,6 +132,8 @@ async def setup_connections(db_name: str = get_current_db()) -> None:
     """Set up both engine and session factory for the specified database"""
     await setup_engine(db_name)
     await setup_session_factory(db_name)
+    # Adds tables introduced since the database file was created
+    await create_tables(_engine)
     set_current_db(db_name)
     logger.info(f"Set up connections for database: {db_name}")
 
@@ -106,13 +169,61 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 
 
 async def create_tables(engine) -> None:
-    """Create all tables in the database"""
+    """Create all tables in the database and add columns missing from
+    tables created by older versions"""
     logger.info("Creating database tables...")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        added = await conn.run_sync(_add_missing_columns)
+        indexes = await conn.run_sync(_add_missing_indexes)
+    for table, columns in added.items():
+        logger.info(f"Added columns to {table}: {', '.join(columns)}")
+    for table, names in indexes.items():
+        logger.info(f"Added indexes to {table}: {', '.join(names)}")
     logger.info("Tables created successfully")
 
 
+def _add_missing_columns(conn: Connection) -> Dict[str, List[str]]:
+    """Add the columns of _ADDED_COLUMNS that a table lacks. Idempotent.
+
+    Returns:
+        The columns added to each table
+    """
+    inspector = inspect(conn)
+    added: Dict[str, List[str]] = {}
+    for table, columns in _ADDED_COLUMNS.items():
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for name, definition in columns.items():
+            if name not in existing:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table} ADD COLUMN {name} {definition}"
+                )
+                added.setdefault(table, []).append(name)
+    return added
+
+
+def _add_missing_indexes(conn: Connection) -> Dict[str, List[str]]:
+    """Add the indexes of _ADDED_UNIQUE_INDEXES that a table lacks. Idempotent.
+
+    Returns:
+        The indexes added to each table
+    """
+    inspector = inspect(conn)
+    added: Dict[str, List[str]] = {}
+    for table, names in _ADDED_UNIQUE_INDEXES.items():
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        for index in Base.metadata.tables[table].indexes:
+            if index.name in names and index.name not in existing:
+                columns = ", ".join(column.name for column in index.columns)
+                conn.exec_driver_sql(
+                    f"DELETE FROM {table} WHERE rowid NOT IN "
+                    f"(SELECT MIN(rowid) FROM {table} GROUP BY {columns})"
+                )
+                index.create(conn)
+                added.setdefault(table, []).append(index.name)
+    return added
+
+
 async def init_db(db_name: str = get_current_db()) -> None:
     """Initialize a new database with all required tables"""
     logger.info(f"Initializing database {db_name}")
@@ -143,6 +254,7 @@ async def close_connections() -> None:
         await _engine.dispose()
         _engine = None
     _session_factory = None
+    close_sharded_indexes()
     logger.info("Closed all database connections")
 
 
@@ -0,0 +1,355 @@
+"""
+Write-behind persistence for crawl results.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .frontier import PersistentFrontier
+from .indexer import index_documents
+from .models import Document, DocumentPassages, DocumentRelationship
+from .segmented_index import SegmentDocument, SegmentedIndex
+
+# Stays well under SQLite's bound-parameter limit
+_IN_CHUNK_SIZE = 500
+
+
+@dataclass
+class CrawledPage:
+    url: str
+    title: str
+    content: str
+    outlinks: List[str]
+    term_frequencies: Dict[str, int]
+    passages: bytes = b""
+    term_positions: Optional[Dict[str, List[int]]] = None
+    crawled_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+@dataclass
+class FailedPage:
+    url: str
+    error_message: str
+    crawled_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+@dataclass
+class FlushResult:
+    crawled: int = 0
+    failed: int = 0
+    new_urls: List[str] = field(default_factory=list)
+    last_url: Optional[str] = None
+    documents: List[SegmentDocument] = field(default_factory=list)
+
+
+class CrawlWriter:
+    """Buffers crawled pages and failures and persists them in batches.
+
+    A flush upserts every buffered document, adds it to the inverted index,
+    queues unseen outlinks in the frontier, inserts their stub documents,
+    links each page to every outlink that has a document, and marks
+    failures, using bulk statements per kind of row instead of per-page
+    round trips.
+
+    With a segmented index, pages are not added to the SQLite inverted
+    index. Once the flush is committed, publish writes them as a new index
+    segment instead.
+
+    If the flush's transaction fails, rollback puts its results back in the
+    buffer and undoes the frontier's record of the URLs it queued, so the
+    next flush writes them again.
+    """
+
+    def __init__(
+        self,
+        frontier: PersistentFrontier,
+        batch_size: int = 50,
+        flush_interval: float = 2.0,
+        index: Optional[SegmentedIndex] = None,
+    ):
+        """Initialize writer.
+
+        Args:
+            frontier: Frontier that receives discovered URLs
+            batch_size: Buffered results that trigger a flush
+            flush_interval: Seconds after which a non-empty buffer is flushed
+            index: Segmented index that receives crawled pages
+        """
+        self.frontier = frontier
+        self.index = index
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pages: List[CrawledPage] = []
+        self._failures: List[FailedPage] = []
+        self._last_flush = time.monotonic()
+        # Results and queued URLs of the last flush, until it is confirmed
+        self._unconfirmed: Tuple[List[CrawledPage], List[FailedPage]] = ([], [])
+        self._queued: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._pages) + len(self._failures)
+
+    @property
+    def should_flush(self) -> bool:
+        if not self:
+            return False
+        return (
+            len(self) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        )
+
+    def add_page(
+        self,
+        url: str,
+        title: str,
+        content: str,
+        outlinks: Iterable[str],
+        term_frequencies: Dict[str, int],
+        passages: bytes = b"",
+        term_positions: Optional[Dict[str, List[int]]] = None,
+    ) -> None:
+        """Buffer a successfully crawled page.
+
+        Args:
+            url: Page URL
+            title: Page title
+            content: Page text
+            outlinks: Normalized URLs linked from the page
+            term_frequencies: Frequency of each token in the page text
+            passages: Passage index of the page text, if built
+            term_positions: Positions of each token in the page text, if
+                captured for phrase queries
+        """
+        self._pages.append(
+            CrawledPage(
+                url,
+                title,
+                content,
+                list(outlinks),
+                term_frequencies,
+                passages,
+                term_positions,
+            )
+        )
+
+    def add_failure(self, url: str, error_message: str) -> None:
+        """Buffer a page that failed to crawl.
+
+        Args:
+            url: Page URL
+            error_message: Reason for the failure
+        """
+        self._failures.append(FailedPage(url, error_message))
+
+    async def flush(self, db: AsyncSession) -> FlushResult:
+        """Write buffered results in bulk. The caller commits, then calls
+        confirm, or calls rollback if the transaction fails.
+
+        Args:
+            db: Database session
+
+        Returns:
+            FlushResult: Counts and URLs written by this flush
+        """
+        pages, self._pages = self._pages, []
+        failures, self._failures = self._failures, []
+        self._unconfirmed = (pages, failures)
+        self._queued = []
+        self._last_flush = time.monotonic()
+
+        try:
+            return await self._write(db, pages, failures)
+        except Exception:
+            self.rollback()
+            raise
+
+    def confirm(self) -> None:
+        """Forget the results of the last flush once it is committed."""
+        self._unconfirmed = ([], [])
+        self._queued = []
+
+    def rollback(self) -> None:
+        """Buffer the results of the last flush again after its transaction
+        failed, ahead of results added since."""
+        pages, failures = self._unconfirmed
+        self._pages[:0] = pages
+        self._failures[:0] = failures
+        self.frontier.forget(self._queued)
+        self.confirm()
+
+    async def _write(
+        self, db: AsyncSession, pages: List[CrawledPage], failures: List[FailedPage]
+    ) -> FlushResult:
+        result = FlushResult(crawled=len(pages), failed=len(failures))
+        if pages:
+            result.new_urls, ids = await self._write_pages(db, pages)
+            result.last_url = pages[-1].url
+            if self.index is not None:
+                result.documents = [
+                    SegmentDocument(
+                        ids[page.url],
+                        page.url,
+                        page.title,
+                        page.content,
+                        page.term_frequencies,
+                        page.passages,
+                        page.term_positions,
+                    )
+                    for page in pages
+                ]
+        if failures:
+            await self._write_failures(db, failures)
+            result.last_url = failures[-1].url
+
+        await self.frontier.complete(
+            db, [p.url for p in pages] + [f.url for f in failures]
+        )
+        return result
+
+    async def publish(self, result: FlushResult) -> None:
+        """Add the pages of a committed flush to the segmented index.
+
+        Args:
+            result: Result of the flush
+        """
+        if self.index is None or not result.documents:
+            return
+        await asyncio.to_thread(self.index.add_documents, result.documents)
+        self.index.schedule_merges()
+
+    async def _write_pages(
+        self, db: AsyncSession, pages: List[CrawledPage]
+    ) -> Tuple[List[str], Dict[str, int]]:
+        stmt = insert(Document)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["url"],
+                set_={
+                    "title": stmt.excluded.title,
+                    "content": stmt.excluded.content,
+                    "last_crawled_at": stmt.excluded.last_crawled_at,
+                    "is_crawled": True,
+                    "crawl_failed": False,
+                    "error_message": None,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            ),
+            [
+                {
+                    "url": page.url,
+                    "title": page.title,
+                    "content": page.content,
+                    "last_crawled_at": page.crawled_at,
+                    "is_crawled": True,
+                    "crawl_failed": False,
+                    "error_message": None,
+                    "updated_at": page.crawled_at,
+                }
+                for page in pages
+            ],
+        )
+
+        ids = await self._document_ids(db, [page.url for page in pages])
+        passages = [
+            {"document_id": ids[page.url], "data": page.passages}
+            for page in pages
+            if page.passages
+        ]
+        if passages:
+            stmt = insert(DocumentPassages)
+            await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["document_id"],
+                    set_={"data": stmt.excluded.data},
+                ),
+                passages,
+            )
+        if self.index is None:
+            await index_documents(
+                db,
+                {ids[page.url]: page.term_frequencies for page in pages},
+                {
+                    ids[page.url]: page.term_positions
+                    for page in pages
+                    if page.term_positions is not None
+                },
+            )
+
+        self._queued = await self.frontier.push(
+            db, (link for page in pages for link in page.outlinks)
+        )
+        new_urls = list(self._queued)
+        if new_urls:
+            now = datetime.now(timezone.utc)
+            await db.execute(
+                insert(Document).on_conflict_do_nothing(index_elements=["url"]),
+                [
+                    {
+                        "url": url,
+                        "title": url,
+                        "content": "",
+                        "discovered_at": now,
+                        "is_crawled": False,
+                        "crawl_failed": False,
+                    }
+                    for url in new_urls
+                ],
+            )
+
+        # Every page links to each document it points at, crawled or queued,
+        # so link analysis sees all incoming links and not just the first
+        targets = list(dict.fromkeys(link for page in pages for link in page.outlinks))
+        ids.update(await self._document_ids(db, targets))
+        links = [
+            {"source_document_id": ids[page.url], "target_document_id": ids[link]}
+            for page in pages
+            for link in dict.fromkeys(page.outlinks)
+            if link in ids and link != page.url
+        ]
+        if links:
+            await db.execute(
+                insert(DocumentRelationship).on_conflict_do_nothing(
+                    index_elements=["source_document_id", "target_document_id"]
+                ),
+                links,
+            )
+        return new_urls, ids
+
+    async def _write_failures(
+        self, db: AsyncSession, failures: List[FailedPage]
+    ) -> None:
+        # Only documents that already exist are marked, as before batching
+        documents = Document.__table__
+        await db.execute(
+            update(documents)
+            .where(documents.c.url == bindparam("b_url"))
+            .values(
+                crawl_failed=True,
+                error_message=bindparam("b_error_message"),
+                last_crawled_at=bindparam("b_crawled_at"),
+            ),
+            [
+                {
+                    "b_url": failure.url,
+                    "b_error_message": failure.error_message,
+                    "b_crawled_at": failure.crawled_at,
+                }
+                for failure in failures
+            ],
+        )
+
+    async def _document_ids(self, db: AsyncSession, urls: List[str]) -> Dict[str, int]:
+        ids = {}
+        for i in range(0, len(urls), _IN_CHUNK_SIZE):
+            rows = await db.execute(
+                select(Document.url, Document.id).where(
+                    Document.url.in_(urls[i : i + _IN_CHUNK_SIZE])
+                )
+            )
+            ids.update(rows.tuples().all())
+        return ids
@@ -0,0 +1,265 @@
+"""
+Disk-backed crawl frontier.
+"""
+
+import os
+from typing import Iterable, List, Optional
+from sqlalchemy import select, update, func, delete, literal
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..utils.bloom_filter import ScalableBloomFilter
+from ..utils.frontier import Frontier
+from .connection import get_seen_filter_path
+from .models import Document, FrontierEntry
+
+
+class PersistentFrontier(Frontier):
+    """Frontier whose queue lives in the frontier table.
+
+    Every discovered URL is appended to the table, whose unique URL column
+    doubles as the exact seen index. Only a batch of pending URLs is held in
+    the in-memory host queues at a time; it is refilled from the table in
+    id order using a cursor, so resuming a crawl reads a single batch instead
+    of rescanning the documents table.
+
+    Given a seen_filter, the in-memory seen index is a Bloom filter instead of
+    a set, and positive hits are confirmed against the table.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = 1.0,
+        batch_size: int = 1000,
+        seen_filter: Optional[ScalableBloomFilter] = None,
+    ):
+        """Initialize frontier.
+
+        Args:
+            requests_per_second: Maximum requests per second for each host
+            batch_size: Number of URLs paged into memory at a time
+            seen_filter: Probabilistic seen index to use instead of a set
+        """
+        super().__init__(requests_per_second=requests_per_second)
+        if seen_filter is not None:
+            self.seen = seen_filter
+        self.batch_size = batch_size
+        self._cursor = 0
+        self._pending_on_disk = 0
+
+    @property
+    def is_exact(self) -> bool:
+        return not isinstance(self.seen, ScalableBloomFilter)
+
+    def __len__(self) -> int:
+        return len(self.queue) + self._pending_on_disk
+
+    async def open(self, db: AsyncSession) -> int:
+        """Resume from the frontier table and load the first batch.
+
+        Databases crawled before the frontier table existed are seeded from
+        the documents table once.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of pending URLs
+        """
+        self._cursor = 0
+        if (await db.execute(select(FrontierEntry.id).limit(1))).first() is None:
+            await self.seed_from_documents(db)
+
+        self._pending_on_disk = (
+            await db.execute(
+                select(func.count(FrontierEntry.id)).where(
+                    FrontierEntry.is_done == False
+                )
+            )
+        ).scalar_one()
+        await self.refill(db)
+        return len(self)
+
+    async def seed_from_documents(self, db: AsyncSession) -> None:
+        """Copy every known document URL into the frontier table.
+
+        Args:
+            db: Database session
+        """
+        await db.execute(
+            insert(FrontierEntry)
+            .from_select(
+                ["url", "is_done", "enqueued_at"],
+                select(
+                    Document.url,
+                    Document.is_crawled | Document.crawl_failed,
+                    Document.discovered_at,
+                ).order_by(Document.id),
+            )
+            .on_conflict_do_nothing(index_elements=["url"])
+        )
+        await db.commit()
+
+    async def push(self, db: AsyncSession, urls: Iterable[str]) -> List[str]:
+        """Append URLs that have not been seen before to the frontier table.
+
+        Args:
+            db: Database session
+            urls: Candidate URLs
+
+        Returns:
+            List of URLs that were queued
+        """
+        candidates = []
+        maybe_seen = []
+        for url in dict.fromkeys(urls):
+            if url not in self.seen:
+                candidates.append(url)
+            elif not self.is_exact:
+                maybe_seen.append(url)
+
+        if maybe_seen:
+            # Filter hits may be false positives; the table has the final say
+            existing = await db.execute(
+                select(FrontierEntry.url).where(FrontierEntry.url.in_(maybe_seen))
+            )
+            existing = set(existing.scalars())
+            candidates.extend(url for url in maybe_seen if url not in existing)
+
+        if not candidates:
+            return []
+
+        self.seen.update(candidates)
+        result = await db.execute(
+            insert(FrontierEntry)
+            .on_conflict_do_nothing(index_elements=["url"])
+            .returning(FrontierEntry.url),
+            [{"url": url} for url in candidates],
+        )
+        added = list(result.scalars())
+        self._pending_on_disk += len(added)
+        return added
+
+    def forget(self, urls: Iterable[str]) -> None:
+        """Undo the bookkeeping of a push whose transaction was rolled back.
+
+        A Bloom filter cannot remove URLs; its stale hits are confirmed
+        against the table like any other.
+
+        Args:
+            urls: URLs returned by the push
+        """
+        urls = list(urls)
+        self._pending_on_disk = max(0, self._pending_on_disk - len(urls))
+        if self.is_exact:
+            self.seen.difference_update(urls)
+
+    async def refill(self, db: AsyncSession) -> int:
+        """Page the next batch of pending URLs into memory when it runs low.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of URLs loaded
+        """
+        if self._pending_on_disk <= 0 or len(self.queue) > self.batch_size // 2:
+            return 0
+
+        rows = (
+            await db.execute(
+                select(FrontierEntry.id, FrontierEntry.url)
+                .where(FrontierEntry.is_done == False)
+                .where(FrontierEntry.id > self._cursor)
+                .order_by(FrontierEntry.id)
+                .limit(self.batch_size)
+            )
+        ).all()
+
+        for row in rows:
+            self.seen.add(row.url)
+            self.queue.put(row.url)
+        if rows:
+            self._cursor = rows[-1].id
+            self._pending_on_disk -= len(rows)
+        else:
+            self._pending_on_disk = 0
+        return len(rows)
+
+    async def complete(self, db: AsyncSession, urls: Iterable[str]) -> None:
+        """Mark crawled or failed URLs as done so they are not resumed.
+
+        Args:
+            db: Database session
+            urls: URLs that were processed
+        """
+        urls = list(urls)
+        if urls:
+            await db.execute(
+                update(FrontierEntry)
+                .where(FrontierEntry.url.in_(urls))
+                .values(is_done=True)
+            )
+
+    @staticmethod
+    async def has_pending(db: AsyncSession) -> bool:
+        """Check whether the frontier table has URLs left to crawl.
+
+        Args:
+            db: Database session
+        """
+        pending = await db.execute(
+            select(literal(1)).where(FrontierEntry.is_done == False).limit(1)
+        )
+        if pending.first() is not None:
+            return True
+
+        # Databases crawled before the frontier table existed
+        if (await db.execute(select(FrontierEntry.id).limit(1))).first() is None:
+            uncrawled = await db.execute(
+                select(Document.id)
+                .where(Document.is_crawled == False)
+                .where(Document.crawl_failed == False)
+                .limit(1)
+            )
+            return uncrawled.first() is not None
+        return False
+
+    def save_seen_filter(self) -> None:
+        """Persist the seen filter next to the current database file."""
+        if not self.is_exact:
+            self.seen.save(get_seen_filter_path())
+
+    @staticmethod
+    def load_seen_filter(
+        initial_capacity: int, error_rate: float
+    ) -> ScalableBloomFilter:
+        """Load the current database's seen filter, or create an empty one.
+
+        A missing filter only costs extra inserts: the table still rejects
+        URLs it has already seen.
+
+        Args:
+            initial_capacity: Capacity of the first filter slice
+            error_rate: Target false-positive rate
+
+        Returns:
+            ScalableBloomFilter: Seen filter
+        """
+        path = get_seen_filter_path()
+        if os.path.exists(path):
+            return ScalableBloomFilter.load(path)
+        return ScalableBloomFilter(
+            initial_capacity=initial_capacity, error_rate=error_rate
+        )
+
+    @staticmethod
+    async def clear(db: AsyncSession) -> None:
+        """Remove every URL from the frontier table and the seen filter.
+
+        Args:
+            db: Database session
+        """
+        await db.execute(delete(FrontierEntry))
+        path = get_seen_filter_path()
+        if os.path.exists(path):
+            os.remove(path)
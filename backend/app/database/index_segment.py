@@ -0,0 +1,551 @@
+"""
+Immutable on-disk index segments for read-only search serving.
+
+export_segment writes a snapshot of the index to a directory:
+
+    terms.bin     term dictionary sorted by UTF-8 bytes, with the document
+                  frequency and postings and positions byte ranges of each term
+    postings.bin  postings_codec blobs of (document, tf, document length)
+    positions.bin gap-encoded positions of each term's postings, in the
+                  postings_codec format
+    docs.bin      url, title, content, passage index (see utils.snippets),
+                  length, distinct terms and norm of each indexed document
+    segment.json  manifest with the corpus statistics, generation and file
+                  sizes
+
+Each export writes its data files under names tagged with a new generation
+(postings.3.bin) and then replaces segment.json, the commit marker, in one
+rename. Readers see either the old generation or the new one, never a mix.
+
+terms.bin and docs.bin hold their variable-length bytes first, then their
+fixed-width arrays, then a trailer locating the arrays, so both are written
+in a single pass. IndexSegment maps the files read-only and reads them in
+place through memoryview and np.frombuffer: opening a segment parses
+nothing, and every process serving it shares the same page cache.
+"""
+
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..utils.postings_codec import (
+    decode_positions,
+    decode_postings,
+    encode_positions,
+    encode_postings,
+    missing_positions,
+)
+from .indexer import DocumentStatistics
+from .models import Document, DocumentPassages, DocumentStats, Term
+from .postings_store import load_postings, split_by_term
+
+FORMAT_VERSION = 6
+MANIFEST_FILE = "segment.json"
+TERMS_FILE = "terms.bin"
+POSTINGS_FILE = "postings.bin"
+POSITIONS_FILE = "positions.bin"
+DOCS_FILE = "docs.bin"
+_DATA_FILES = (TERMS_FILE, POSTINGS_FILE, POSITIONS_FILE, DOCS_FILE)
+
+_TERMS_MAGIC = b"TRM1"
+_DOCS_MAGIC = b"DOC1"
+# Magic, number of entries, offset of the fixed-width arrays
+_TRAILER = struct.Struct("<4sIQ")
+
+# Stays well under SQLite's bound-parameter limit
+_IN_CHUNK_SIZE = 500
+_DOC_CHUNK_SIZE = 1000
+
+# url, title, content and passage index
+_DOC_FIELDS = 4
+
+_open_segments: Dict[str, Tuple[int, "IndexSegment"]] = {}
+
+
+class SegmentWriter:
+    """Writes a segment from terms in byte order and documents in id order.
+
+    Data files are written under the next generation's names, which no
+    manifest refers to yet, and finish publishes them by replacing the
+    manifest, so readers of an existing segment in the same directory never
+    see a partial one.
+    """
+
+    def __init__(self, directory: str):
+        """Start a segment.
+
+        Args:
+            directory: Segment directory, created if missing
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._previous_generation = _read_generation(directory)
+        self.generation = (self._previous_generation or 0) + 1
+        self._postings_file = open(self._path(POSTINGS_FILE), "wb")
+        self._positions_file = open(self._path(POSITIONS_FILE), "wb")
+        self._docs_file = open(self._path(DOCS_FILE), "wb")
+        self._terms: List[bytes] = []
+        self._document_frequency: List[int] = []
+        self._postings_offsets = [0]
+        self._positions_offsets = [0]
+        self._doc_ids: List[int] = []
+        self._field_offsets = [0]
+        self._document_stats: List[DocumentStatistics] = []
+
+    def add_term(
+        self,
+        term: bytes,
+        doc_ids: np.ndarray,
+        frequencies: np.ndarray,
+        lengths: np.ndarray,
+        positions: Optional[np.ndarray] = None,
+    ) -> None:
+        """Append a term's postings, sorted by document id.
+
+        Args:
+            term: UTF-8 term, greater than every term added before
+            doc_ids: Documents containing the term
+            frequencies: Term frequency in each document
+            lengths: Length of each document
+            positions: Positions of the term in each document, concatenated,
+                or None if not captured for any document
+        """
+        blob = encode_postings(doc_ids, frequencies, lengths)
+        self._postings_file.write(blob)
+        self._terms.append(term)
+        self._document_frequency.append(len(doc_ids))
+        self._postings_offsets.append(self._postings_offsets[-1] + len(blob))
+
+        blob = (
+            encode_positions(positions, frequencies)
+            if positions is not None
+            else missing_positions(int(np.sum(frequencies)))
+        )
+        self._positions_file.write(blob)
+        self._positions_offsets.append(self._positions_offsets[-1] + len(blob))
+
+    def add_document(
+        self,
+        doc_id: int,
+        url: str,
+        title: str,
+        content: str,
+        stats: DocumentStatistics,
+        passages: bytes = b"",
+    ) -> None:
+        """Append a document with an id greater than every one added before"""
+        self._doc_ids.append(doc_id)
+        self._document_stats.append(stats)
+        offsets = _write_strings(
+            self._docs_file,
+            [(field or "").encode("utf-8") for field in (url, title, content)]
+            + [passages or b""],
+        )
+        base = self._field_offsets[-1]
+        self._field_offsets.extend(base + offset for offset in offsets[1:])
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, _generation_file(name, self.generation))
+
+    def finish(self) -> Dict[str, Any]:
+        """Write the term dictionary and manifest and publish the segment.
+
+        Returns:
+            Segment manifest
+        """
+        self._postings_file.close()
+        self._positions_file.close()
+        lengths, unique_terms, norms = (
+            zip(*self._document_stats) if self._document_stats else ((), (), ())
+        )
+        _write_arrays(
+            self._docs_file,
+            _DOCS_MAGIC,
+            len(self._doc_ids),
+            [
+                np.asarray(self._doc_ids, dtype="<i8"),
+                np.asarray(self._field_offsets, dtype="<u8"),
+                np.asarray(lengths, dtype="<u4"),
+                np.asarray(unique_terms, dtype="<u4"),
+                np.asarray(norms, dtype="<f4"),
+            ],
+        )
+        self._docs_file.close()
+
+        with open(self._path(TERMS_FILE), "wb") as f:
+            term_offsets = _write_strings(f, self._terms)
+            _write_arrays(
+                f,
+                _TERMS_MAGIC,
+                len(self._terms),
+                [
+                    np.asarray(term_offsets, dtype="<u8"),
+                    np.asarray(self._postings_offsets, dtype="<u8"),
+                    np.asarray(self._positions_offsets, dtype="<u8"),
+                    np.asarray(self._document_frequency, dtype="<u4"),
+                ],
+            )
+
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "documents": len(self._doc_ids),
+            "total_terms": int(sum(lengths)),
+            "terms": len(self._terms),
+            "generation": self.generation,
+            "file_sizes": {
+                name: os.path.getsize(self._path(name)) for name in _DATA_FILES
+            },
+        }
+        tmp_path = os.path.join(self.directory, f"{MANIFEST_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        # Replacing the manifest publishes the new generation in one step.
+        # The previous generation's files stay until the next export, for
+        # readers that loaded the old manifest just before the swap; open
+        # segments keep their mappings of removed files.
+        os.replace(tmp_path, os.path.join(self.directory, MANIFEST_FILE))
+        keep = {MANIFEST_FILE}
+        for generation in (self.generation, self._previous_generation):
+            if generation is not None:
+                keep.update(_generation_file(name, generation) for name in _DATA_FILES)
+        for name in os.listdir(self.directory):
+            if name not in keep:
+                os.remove(os.path.join(self.directory, name))
+        return manifest
+
+
+async def export_segment(db: AsyncSession, directory: str) -> Dict[str, Any]:
+    """Write the current index as a segment, replacing any existing one.
+
+    Args:
+        db: Database session
+        directory: Segment directory, created if missing
+
+    Returns:
+        Segment manifest
+    """
+    writer = SegmentWriter(directory)
+
+    rows = await db.execute(select(Term.term, Term.id))
+    terms = sorted((term.encode("utf-8"), term_id) for term, term_id in rows.tuples())
+    for i in range(0, len(terms), _IN_CHUNK_SIZE):
+        chunk = terms[i : i + _IN_CHUNK_SIZE]
+        *postings, positions = await load_postings(
+            db, [term_id for _, term_id in chunk], with_positions=True
+        )
+        columns_by_term = dict(split_by_term(*postings))
+        # Terms whose documents were all removed have no postings and are skipped
+        for term, term_id in chunk:
+            if term_id in columns_by_term:
+                writer.add_term(term, *columns_by_term[term_id], positions[term_id])
+
+    last_id = 0
+    while True:
+        rows = (
+            await db.execute(
+                select(
+                    Document.id,
+                    Document.url,
+                    Document.title,
+                    Document.content,
+                    DocumentStats.length,
+                    DocumentStats.unique_terms,
+                    DocumentStats.norm,
+                    DocumentPassages.data,
+                )
+                .join(DocumentStats, DocumentStats.document_id == Document.id)
+                .outerjoin(
+                    DocumentPassages, DocumentPassages.document_id == Document.id
+                )
+                .where(Document.id > last_id)
+                .order_by(Document.id)
+                .limit(_DOC_CHUNK_SIZE)
+            )
+        ).all()
+        if not rows:
+            break
+        for doc_id, url, title, content, *stats, passages in rows:
+            writer.add_document(
+                doc_id, url, title, content, DocumentStatistics(*stats), passages
+            )
+        last_id = rows[-1][0]
+
+    return writer.finish()
+
+
+def get_segment(directory: str) -> Optional["IndexSegment"]:
+    """Return the open segment in a directory, reopening it after an export.
+
+    Args:
+        directory: Segment directory
+
+    Returns:
+        The segment, or None if none was exported
+    """
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        _open_segments.pop(directory, None)
+        return None
+
+    cached = _open_segments.get(directory)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    # A replaced segment is unmapped once searches using it release it
+    segment = IndexSegment(directory)
+    _open_segments[directory] = (mtime, segment)
+    return segment
+
+
+def remove_segment(directory: str) -> None:
+    """Delete a segment directory if it exists"""
+    _open_segments.pop(directory, None)
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+class IndexSegment:
+    """Read-only view of an exported index segment."""
+
+    def __init__(self, directory: str):
+        """Map the segment files.
+
+        Args:
+            directory: Segment directory
+        """
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index segment format: {directory}")
+
+        self._maps: List[mmap.mmap] = []
+        terms = self._map(TERMS_FILE)
+        self._postings = self._map(POSTINGS_FILE)
+        self._positions = self._map(POSITIONS_FILE)
+        docs = self._map(DOCS_FILE)
+
+        self.num_terms, pos = self._read_trailer(terms, _TERMS_MAGIC)
+        self._term_offsets, pos = _array(terms, "<u8", self.num_terms + 1, pos)
+        self._postings_offsets, pos = _array(terms, "<u8", self.num_terms + 1, pos)
+        self._positions_offsets, pos = _array(terms, "<u8", self.num_terms + 1, pos)
+        self._document_frequency, _ = _array(terms, "<u4", self.num_terms, pos)
+        self._terms = terms
+
+        num_docs, pos = self._read_trailer(docs, _DOCS_MAGIC)
+        self._doc_ids, pos = _array(docs, "<i8", num_docs, pos)
+        self._field_offsets, pos = _array(docs, "<u8", _DOC_FIELDS * num_docs + 1, pos)
+        self._lengths, pos = _array(docs, "<u4", num_docs, pos)
+        self._unique_terms, pos = _array(docs, "<u4", num_docs, pos)
+        self._norms, _ = _array(docs, "<f4", num_docs, pos)
+        self._docs = docs
+
+    @property
+    def num_documents(self) -> int:
+        return self.manifest["documents"]
+
+    @property
+    def average_length(self) -> float:
+        if not self.num_documents:
+            return 0.0
+        return self.manifest["total_terms"] / self.num_documents
+
+    def lookup(self, term: str) -> Optional[int]:
+        """Return the index of a term in the dictionary, or None"""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.num_terms and self._term(lo) == key:
+            return lo
+        return None
+
+    def document_frequency(self, term_index: int) -> int:
+        return int(self._document_frequency[term_index])
+
+    def postings(self, term_index: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Decode a term's postings from the mapped file.
+
+        Args:
+            term_index: Index returned by lookup
+
+        Returns:
+            Tuple of document id, term frequency and document length arrays
+        """
+        start, end = self._postings_offsets[term_index : term_index + 2]
+        return decode_postings(self._postings[start:end])
+
+    def positional_postings(
+        self, term_index: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Decode a term's postings and the positions of each.
+
+        Args:
+            term_index: Index returned by lookup
+
+        Returns:
+            Tuple of document id, term frequency and document length arrays,
+            and the concatenated positions of each posting, MISSING_POSITION
+            for postings indexed without positions
+        """
+        doc_ids, frequencies, lengths = self.postings(term_index)
+        start, end = self._positions_offsets[term_index : term_index + 2]
+        positions = decode_positions(self._positions[start:end], frequencies)
+        return doc_ids, frequencies, lengths, positions
+
+    def documents(self, doc_ids: List[int]) -> Dict[int, Tuple[str, str, str]]:
+        """Map document ids found in the segment to (url, title, content)"""
+        positions = np.searchsorted(self._doc_ids, doc_ids)
+        documents = {}
+        for doc_id, pos in zip(doc_ids, positions):
+            if pos < len(self._doc_ids) and self._doc_ids[pos] == doc_id:
+                documents[doc_id] = tuple(
+                    self._field(_DOC_FIELDS * int(pos) + i) for i in range(3)
+                )
+        return documents
+
+    def passages(self, doc_ids: List[int]) -> Dict[int, bytes]:
+        """Map document ids found in the segment to their passage index"""
+        positions = np.searchsorted(self._doc_ids, doc_ids)
+        passages = {}
+        for doc_id, pos in zip(doc_ids, positions):
+            if pos < len(self._doc_ids) and self._doc_ids[pos] == doc_id:
+                passages[doc_id] = self._bytes(_DOC_FIELDS * int(pos) + 3)
+        return passages
+
+    def iter_terms(self) -> Iterator[Tuple[bytes, int]]:
+        """Yield each term with its index, in byte order"""
+        for index in range(self.num_terms):
+            yield self._term(index), index
+
+    def document_statistics(
+        self, doc_ids: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the length, distinct terms and norm of documents in the segment"""
+        positions = np.searchsorted(self._doc_ids, doc_ids)
+        return (
+            self._lengths[positions],
+            self._unique_terms[positions],
+            self._norms[positions],
+        )
+
+    def iter_documents(
+        self,
+    ) -> Iterator[Tuple[int, str, str, str, DocumentStatistics, bytes]]:
+        """Yield (id, url, title, content, statistics, passages) of each
+        document, in id order"""
+        for pos, doc_id in enumerate(self._doc_ids.tolist()):
+            yield (
+                doc_id,
+                *(self._field(_DOC_FIELDS * pos + i) for i in range(3)),
+                DocumentStatistics(
+                    int(self._lengths[pos]),
+                    int(self._unique_terms[pos]),
+                    float(self._norms[pos]),
+                ),
+                self._bytes(_DOC_FIELDS * pos + 3),
+            )
+
+    def close(self) -> None:
+        """Unmap the files. Arrays returned by postings stay valid."""
+        self._terms = self._postings = self._positions = self._docs = None
+        self._term_offsets = self._postings_offsets = self._positions_offsets = None
+        self._document_frequency = self._doc_ids = self._field_offsets = None
+        self._lengths = self._unique_terms = self._norms = None
+        for m in self._maps:
+            m.close()
+        self._maps = []
+
+    def __enter__(self) -> "IndexSegment":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _map(self, name: str) -> memoryview:
+        path = os.path.join(
+            self.directory, _generation_file(name, self.manifest["generation"])
+        )
+        size = os.path.getsize(path)
+        if size != self.manifest["file_sizes"][name]:
+            raise ValueError(f"Index segment file does not match manifest: {path}")
+        if size == 0:
+            # mmap cannot map empty files
+            return memoryview(b"")
+        with open(path, "rb") as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(m)
+        return memoryview(m)
+
+    @staticmethod
+    def _read_trailer(buf: memoryview, magic: bytes) -> Tuple[int, int]:
+        found, count, arrays_offset = _TRAILER.unpack_from(
+            buf, len(buf) - _TRAILER.size
+        )
+        if found != magic:
+            raise ValueError(f"Corrupt index segment file, expected {magic!r}")
+        return count, arrays_offset
+
+    def _term(self, index: int) -> bytes:
+        start, end = self._term_offsets[index : index + 2]
+        return bytes(self._terms[start:end])
+
+    def _field(self, index: int) -> str:
+        return str(self._bytes(index), "utf-8")
+
+    def _bytes(self, index: int) -> bytes:
+        start, end = self._field_offsets[index : index + 2]
+        return bytes(self._docs[start:end])
+
+
+def _array(buf: memoryview, dtype: str, count: int, offset: int):
+    array = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+    return array, offset + array.nbytes
+
+
+def _generation_file(name: str, generation: Optional[int]) -> str:
+    """Return the name of a data file in a generation, postings.3.bin"""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{generation}{ext}"
+
+
+def _read_generation(directory: str) -> Optional[int]:
+    """Return the generation of the segment in a directory, if any"""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            return json.load(f).get("generation")
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_strings(f, values: List[bytes]) -> List[int]:
+    """Write byte strings and return their offsets relative to the first"""
+    offsets = [0]
+    for value in values:
+        f.write(value)
+        offsets.append(offsets[-1] + len(value))
+    return offsets
+
+
+def _write_arrays(f, magic: bytes, count: int, arrays: List[np.ndarray]) -> None:
+    """Append 8-byte aligned arrays and the trailer locating them"""
+    f.write(b"\0" * (-f.tell() % 8))
+    arrays_offset = f.tell()
+    for array in arrays:
+        f.write(array.tobytes())
+    f.write(_TRAILER.pack(magic, count, arrays_offset))
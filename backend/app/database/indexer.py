@@ -0,0 +1,237 @@
+"""
+Incremental inverted-index maintenance.
+"""
+
+import math
+from collections import Counter
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence
+from sqlalchemy import delete, func, insert as core_insert, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..utils.postings_codec import encode_positions
+from .models import (
+    Document,
+    DocumentStats,
+    InvertedIndex,
+    Statistics,
+    Term,
+    TermStats,
+)
+
+# Single Statistics row holding index-wide totals for ranking
+INDEX_STATISTICS_ID = 1
+
+# Stays well under SQLite's bound-parameter limit
+_IN_CHUNK_SIZE = 500
+
+
+class DocumentStatistics(NamedTuple):
+    length: int
+    unique_terms: int
+    norm: float
+
+
+def document_statistics(term_frequencies: Mapping[str, int]) -> DocumentStatistics:
+    """Compute the per-document values stored at index time.
+
+    The norm is that of the document's 1 + log(tf) weights, which unlike
+    tf-idf weights does not change as other documents are indexed.
+
+    Args:
+        term_frequencies: Frequency of each term in the document
+
+    Returns:
+        DocumentStatistics: Length, number of distinct terms and norm
+    """
+    return DocumentStatistics(
+        length=sum(term_frequencies.values()),
+        unique_terms=len(term_frequencies),
+        norm=math.sqrt(
+            sum((1 + math.log(tf)) ** 2 for tf in term_frequencies.values() if tf > 0)
+        ),
+    )
+
+
+async def index_documents(
+    db: AsyncSession,
+    documents: Mapping[int, Mapping[str, int]],
+    positions: Optional[Mapping[int, Mapping[str, Sequence[int]]]] = None,
+) -> int:
+    """Add documents to the inverted index in bulk. The caller commits.
+
+    Terms are upserted once per batch, postings are inserted with a single
+    executemany, and each term's document frequency in TermStats is adjusted
+    by the batch's delta instead of being recounted from the postings. Each
+    document's length goes to DocumentStats, and the number of indexed
+    documents and their total length to the Statistics row with id
+    INDEX_STATISTICS_ID. Documents that were indexed before are replaced,
+    unless their postings have since been compacted into term_postings.
+
+    Postings of documents given positions store them gap-encoded, which
+    phrase queries and proximity ranking need.
+
+    Args:
+        db: Database session
+        documents: Term frequencies of each document, keyed by document id
+        positions: Positions of terms in each document, keyed by document
+            id; every position list is as long as the term's frequency
+
+    Returns:
+        Number of postings written
+    """
+    if not documents:
+        return 0
+
+    df_delta = Counter()
+    await _remove_postings(db, list(documents), df_delta)
+
+    terms = sorted({term for tf in documents.values() for term in tf})
+    term_ids = await _upsert_terms(db, terms)
+
+    total_docs = (
+        await db.execute(
+            select(func.count(Document.id)).where(Document.is_crawled == True)
+        )
+    ).scalar_one() or 1
+    stats = await _term_stats(db, list(term_ids.values()))
+
+    postings = []
+    for doc_id, term_frequencies in documents.items():
+        total_terms = sum(term_frequencies.values()) or 1
+        term_positions = (positions or {}).get(doc_id) or {}
+        for term, frequency in term_frequencies.items():
+            term_id = term_ids[term]
+            df_delta[term_id] += 1
+            df = max(1, stats.get(term_id, 0) + df_delta[term_id])
+            postings.append(
+                {
+                    "term_id": term_id,
+                    "document_id": doc_id,
+                    "term_frequency": frequency,
+                    "tf_idf": frequency / total_terms * (1 + total_docs / df),
+                    "positions": (
+                        encode_positions(term_positions[term], [frequency])
+                        if term in term_positions
+                        else None
+                    ),
+                }
+            )
+
+    if postings:
+        await db.execute(core_insert(InvertedIndex), postings)
+    await _apply_df_delta(db, df_delta)
+    await _update_document_stats(db, documents)
+    return len(postings)
+
+
+async def _update_document_stats(
+    db: AsyncSession, documents: Mapping[int, Mapping[str, int]]
+) -> None:
+    stats = {doc_id: document_statistics(tf) for doc_id, tf in documents.items()}
+    doc_ids = list(stats)
+
+    old_lengths = {}
+    for i in range(0, len(doc_ids), _IN_CHUNK_SIZE):
+        rows = await db.execute(
+            select(DocumentStats.document_id, DocumentStats.length).where(
+                DocumentStats.document_id.in_(doc_ids[i : i + _IN_CHUNK_SIZE])
+            )
+        )
+        old_lengths.update(rows.tuples().all())
+
+    stmt = insert(DocumentStats)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["document_id"],
+            set_={
+                "length": stmt.excluded.length,
+                "unique_terms": stmt.excluded.unique_terms,
+                "norm": stmt.excluded.norm,
+            },
+        ),
+        [{"document_id": doc_id, **s._asdict()} for doc_id, s in stats.items()],
+    )
+
+    stmt = insert(Statistics).values(
+        id=INDEX_STATISTICS_ID,
+        documents_crawled=len(stats) - len(old_lengths),
+        total_terms=sum(s.length for s in stats.values()) - sum(old_lengths.values()),
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={
+                "documents_crawled": Statistics.documents_crawled
+                + stmt.excluded.documents_crawled,
+                "total_terms": Statistics.total_terms + stmt.excluded.total_terms,
+                "timestamp": stmt.excluded.timestamp,
+            },
+        )
+    )
+
+
+async def _remove_postings(
+    db: AsyncSession, doc_ids: List[int], df_delta: Counter
+) -> None:
+    for i in range(0, len(doc_ids), _IN_CHUNK_SIZE):
+        chunk = doc_ids[i : i + _IN_CHUNK_SIZE]
+        rows = await db.execute(
+            select(InvertedIndex.term_id).where(InvertedIndex.document_id.in_(chunk))
+        )
+        for term_id in rows.scalars():
+            df_delta[term_id] -= 1
+        await db.execute(
+            delete(InvertedIndex).where(InvertedIndex.document_id.in_(chunk))
+        )
+
+
+async def _upsert_terms(db: AsyncSession, terms: List[str]) -> Dict[str, int]:
+    if not terms:
+        return {}
+    await db.execute(
+        insert(Term).on_conflict_do_nothing(index_elements=["term"]),
+        [{"term": term, "document_frequency": 0} for term in terms],
+    )
+    term_ids = {}
+    for i in range(0, len(terms), _IN_CHUNK_SIZE):
+        rows = await db.execute(
+            select(Term.term, Term.id).where(
+                Term.term.in_(terms[i : i + _IN_CHUNK_SIZE])
+            )
+        )
+        term_ids.update(rows.tuples().all())
+    return term_ids
+
+
+async def _term_stats(db: AsyncSession, term_ids: List[int]) -> Dict[int, int]:
+    stats = {}
+    for i in range(0, len(term_ids), _IN_CHUNK_SIZE):
+        rows = await db.execute(
+            select(TermStats.term_id, TermStats.document_frequency).where(
+                TermStats.term_id.in_(term_ids[i : i + _IN_CHUNK_SIZE])
+            )
+        )
+        stats.update(rows.tuples().all())
+    return stats
+
+
+async def _apply_df_delta(db: AsyncSession, df_delta: Counter) -> None:
+    changes = [
+        {"term_id": term_id, "document_frequency": delta}
+        for term_id, delta in df_delta.items()
+        if delta
+    ]
+    if not changes:
+        return
+
+    stmt = insert(TermStats)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["term_id"],
+            set_={
+                "document_frequency": TermStats.document_frequency
+                + stmt.excluded.document_frequency
+            },
+        ),
+        changes,
+    )
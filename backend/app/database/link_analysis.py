@@ -0,0 +1,203 @@
+"""
+Offline link analysis over the crawl graph.
+"""
+
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from sqlalchemy import delete, insert as core_insert, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..utils.pagerank import pagerank, update_pagerank
+from .models import Document, DocumentRank, DocumentRelationship, Statistics
+
+# Statistics row recording when PageRank was last computed
+PAGERANK_STATISTICS_ID = 2
+
+
+class LinkGraph:
+    """Link graph kept in memory between PageRank updates.
+
+    refresh loads only the documents and links added since it last ran,
+    which holds everything while a crawl only appends to both tables.
+    """
+
+    def __init__(self):
+        self.doc_ids = np.empty(0, dtype=np.int64)
+        self.sources = np.empty(0, dtype=np.int64)
+        self.targets = np.empty(0, dtype=np.int64)
+        # Unnormalized PageRank of doc_ids after the last update, if any
+        self.scores: Optional[np.ndarray] = None
+        self._last_link_id = 0
+
+    async def refresh(self, db: AsyncSession) -> Tuple[int, int]:
+        """Load new documents and links.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of new documents and new links
+        """
+        last_doc_id = int(self.doc_ids[-1]) if len(self.doc_ids) else 0
+        doc_ids = (
+            (
+                await db.execute(
+                    select(Document.id)
+                    .where(Document.id > last_doc_id)
+                    .order_by(Document.id)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        links = np.array(
+            (
+                await db.execute(
+                    select(
+                        DocumentRelationship.id,
+                        DocumentRelationship.source_document_id,
+                        DocumentRelationship.target_document_id,
+                    )
+                    .where(DocumentRelationship.id > self._last_link_id)
+                    .order_by(DocumentRelationship.id)
+                )
+            ).all(),
+            dtype=np.int64,
+        ).reshape(-1, 3)
+
+        self.doc_ids = np.concatenate([self.doc_ids, doc_ids]).astype(np.int64)
+        self.sources = np.concatenate([self.sources, links[:, 1]])
+        self.targets = np.concatenate([self.targets, links[:, 2]])
+        if len(links):
+            self._last_link_id = int(links[-1, 0])
+        return len(doc_ids), len(links)
+
+
+async def compute_pagerank(
+    db: AsyncSession,
+    damping: float = 0.85,
+    tolerance: float = 1e-6,
+    max_iterations: int = 100,
+    incremental: bool = False,
+    graph: Optional[LinkGraph] = None,
+) -> Dict[str, Any]:
+    """Compute PageRank over document_relationships and store it.
+
+    Every document is a node, including stubs that were discovered but not
+    crawled, so rank flowing into them is accounted for. Scores are stored
+    unnormalized (see update_pagerank): dividing by their sum gives PageRank.
+    The Statistics row PAGERANK_STATISTICS_ID is stamped so searchers know
+    to reload them.
+
+    An incremental update starts from the previous scores and pushes only
+    the changes caused by new links and documents, and writes only the
+    scores that changed.
+
+    Args:
+        db: Database session
+        damping: Probability of following a link instead of jumping
+        tolerance: Convergence threshold
+        max_iterations: Iteration limit of a full computation
+        incremental: Update the previous scores instead of starting over
+        graph: Graph kept from an earlier call, so only new rows are loaded
+
+    Returns:
+        Number of documents, links, iterations and scores written
+    """
+    graph = graph or LinkGraph()
+    await graph.refresh(db)
+
+    previous = None
+    if incremental:
+        previous = graph.scores
+        if previous is None:
+            previous = await _load_scores(db, graph.doc_ids)
+    if previous is not None and len(previous) < len(graph.doc_ids):
+        previous = np.concatenate(
+            [previous, np.zeros(len(graph.doc_ids) - len(previous))]
+        )
+
+    # Node numbers are positions in the sorted document ids
+    sources = np.searchsorted(graph.doc_ids, graph.sources)
+    targets = np.searchsorted(graph.doc_ids, graph.targets)
+    if previous is not None:
+        scores, iterations, changed = await asyncio.to_thread(
+            update_pagerank,
+            sources,
+            targets,
+            len(graph.doc_ids),
+            previous,
+            damping=damping,
+            tolerance=tolerance,
+        )
+        doc_ids, written = graph.doc_ids[changed], scores[changed]
+        stmt = insert(DocumentRank)
+        if len(doc_ids):
+            await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["document_id"],
+                    set_={"pagerank": stmt.excluded.pagerank},
+                ),
+                _rank_rows(doc_ids, written),
+            )
+    else:
+        scores, iterations = await asyncio.to_thread(
+            pagerank,
+            sources,
+            targets,
+            len(graph.doc_ids),
+            damping=damping,
+            tolerance=tolerance,
+            max_iterations=max_iterations,
+            normalize=False,
+        )
+        doc_ids = graph.doc_ids
+        await db.execute(delete(DocumentRank))
+        if len(doc_ids):
+            await db.execute(core_insert(DocumentRank), _rank_rows(doc_ids, scores))
+    graph.scores = scores
+
+    stmt = insert(Statistics).values(
+        id=PAGERANK_STATISTICS_ID, documents_crawled=len(graph.doc_ids)
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={
+                "documents_crawled": stmt.excluded.documents_crawled,
+                "timestamp": stmt.excluded.timestamp,
+            },
+        )
+    )
+    await db.commit()
+
+    return {
+        "documents": len(graph.doc_ids),
+        "links": len(graph.sources),
+        "iterations": iterations,
+        "updated": len(doc_ids),
+    }
+
+
+async def _load_scores(db: AsyncSession, doc_ids: np.ndarray) -> Optional[np.ndarray]:
+    """Stored scores aligned with doc_ids, or None if there are none"""
+    rows = (
+        await db.execute(select(DocumentRank.document_id, DocumentRank.pagerank))
+    ).all()
+    if not rows:
+        return None
+    ranks = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    scores = np.zeros(len(doc_ids))
+    pos = np.searchsorted(doc_ids, ranks[:, 0].astype(np.int64))
+    known = pos < len(doc_ids)
+    known[known] = doc_ids[pos[known]] == ranks[known, 0]
+    scores[pos[known]] = ranks[known, 1]
+    return scores
+
+
+def _rank_rows(doc_ids: np.ndarray, scores: np.ndarray):
+    return [
+        {"document_id": doc_id, "pagerank": score}
+        for doc_id, score in zip(doc_ids.tolist(), scores.tolist())
+    ]
@@ -2,7 +2,7 @@
 Database models for the UCI Search Engine.
 """
 
-from typing import List
+from typing import List, Optional
 from sqlalchemy import (
     ForeignKey,
     Column,
@@ -13,6 +13,7 @@ from sqlalchemy import (
     Boolean,
     Text,
     Index,
+    LargeBinary,
 )
 from sqlalchemy.orm import relationship, Mapped, mapped_column, DeclarativeBase
 from datetime import datetime, timezone
@@ -121,6 +122,32 @@ class Statistics(Base):
     total_terms: Mapped[int] = mapped_column(default=0)
 
 
+class DocumentStats(Base):
+    """Model for per-document index statistics used in ranking"""
+
+    __tablename__ = "document_stats"
+
+    document_id: Mapped[int] = mapped_column(
+        ForeignKey("documents.id"), primary_key=True
+    )
+    length: Mapped[int] = mapped_column(default=0)
+    unique_terms: Mapped[int] = mapped_column(default=0)
+    # Euclidean norm of the document's log-scaled term-frequency vector
+    norm: Mapped[float] = mapped_column(default=0.0)
+
+
+class DocumentRank(Base):
+    """Model for link-analysis scores computed over the crawl graph"""
+
+    __tablename__ = "document_ranks"
+
+    document_id: Mapped[int] = mapped_column(
+        ForeignKey("documents.id"), primary_key=True
+    )
+    # Unnormalized: divide by the sum over all documents to get PageRank
+    pagerank: Mapped[float] = mapped_column(default=0.0)
+
+
 class DocumentRelationship(Base):
     __tablename__ = "document_relationships"
 
@@ -138,6 +165,16 @@ class DocumentRelationship(Base):
         foreign_keys=[target_document_id],
     )
 
+    # One row per link, however many times the source is crawled
+    __table_args__ = (
+        Index(
+            "idx_document_relationships_link",
+            "source_document_id",
+            "target_document_id",
+            unique=True,
+        ),
+    )
+
 
 class CrawlStatistics(Base):
     __tablename__ = "crawl_statistics"
@@ -179,6 +216,46 @@ class CrawlerState(Base):
     )
 
 
+class FrontierEntry(Base):
+    """Model for the persistent crawl frontier, an append-only URL queue"""
+
+    __tablename__ = "frontier"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    url: Mapped[str] = mapped_column(unique=True)
+    is_done: Mapped[bool] = mapped_column(default=False)
+    enqueued_at: Mapped[datetime] = mapped_column(
+        default=lambda: datetime.now(timezone.utc)
+    )
+
+    # Indexes
+    __table_args__ = (Index("idx_frontier_pending", "is_done", "id"),)
+
+
+class TermPostings(Base):
+    """Model for the compacted postings of a term, one compressed blob each"""
+
+    __tablename__ = "term_postings"
+
+    term_id: Mapped[int] = mapped_column(ForeignKey("terms.id"), primary_key=True)
+    document_count: Mapped[int] = mapped_column(default=0)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    # Gap-encoded positions of every posting, or None if compacted before
+    # positions were stored
+    positions: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+
+
+class DocumentPassages(Base):
+    """Model for the passage index of a document, used to build snippets"""
+
+    __tablename__ = "document_passages"
+
+    document_id: Mapped[int] = mapped_column(
+        ForeignKey("documents.id"), primary_key=True
+    )
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+
+
 class InvertedIndex(Base):
     """Model for storing the inverted index"""
 
@@ -189,9 +266,14 @@ class InvertedIndex(Base):
     document_id: Mapped[int] = mapped_column(ForeignKey("documents.id"))
     term_frequency: Mapped[int] = mapped_column()
     tf_idf: Mapped[float] = mapped_column()
+    # Gap-encoded positions of the term in the document, if captured
+    positions: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
 
     term: Mapped["Term"] = relationship(back_populates="inverted_index_entries")
     document: Mapped["Document"] = relationship(back_populates="inverted_index_entries")
 
     # Indexes
-    __table_args__ = (Index("idx_inverted_index_term_doc", "term_id", "document_id"),)
+    __table_args__ = (
+        Index("idx_inverted_index_term_doc", "term_id", "document_id"),
+        Index("idx_inverted_index_doc", "document_id"),
+    )
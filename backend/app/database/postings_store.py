@@ -0,0 +1,256 @@
+"""
+Compacted postings storage.
+
+New postings are written by the indexer as inverted_index rows. Compaction
+moves them into one compressed term_postings blob per term and deletes the
+rows, so a finished crawl's index takes a fraction of the space and a term's
+postings are read with a single row lookup. Readers merge both sources.
+
+Blobs also store each posting's document length, which is fixed once a
+document is indexed, so BM25 can score them without joining document_stats.
+
+Positions are compacted alongside into a second blob per term, holding the
+gap-encoded positions of every posting in document order. Postings indexed
+without positions, in rows or in blobs compacted before positions existed,
+read as MISSING_POSITION, so only they are left out of phrase matching.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import delete, distinct, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..utils.positional import take_positions
+from ..utils.postings_codec import (
+    decode_positions,
+    decode_postings,
+    encode_positions,
+    encode_postings,
+    missing_positions,
+)
+from .models import DocumentStats, InvertedIndex, TermPostings
+
+# Stays well under SQLite's bound-parameter limit
+_IN_CHUNK_SIZE = 500
+
+# Positions of each term's postings, concatenated in document order
+TermPositions = Dict[int, np.ndarray]
+
+
+async def compact_postings(db: AsyncSession) -> int:
+    """Move every inverted_index row into the term_postings blobs.
+
+    Terms are processed in chunks and each chunk is committed, so a large
+    index is compacted without holding all postings in memory.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Number of terms whose blobs were rewritten
+    """
+    term_ids = (
+        (
+            await db.execute(
+                select(distinct(InvertedIndex.term_id)).order_by(InvertedIndex.term_id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    for i in range(0, len(term_ids), _IN_CHUNK_SIZE):
+        chunk = term_ids[i : i + _IN_CHUNK_SIZE]
+        row_postings, row_positions = await _load_rows(db, chunk, True)
+        blobs = await _load_blobs(db, chunk, True)
+
+        values = []
+        for term_id, columns in split_by_term(*row_postings):
+            positions = row_positions[term_id]
+            if term_id in blobs:
+                data, old_positions = blobs[term_id]
+                old_columns = decode_postings(data)
+                # Rows are newer than the blob for any document in both
+                keep = ~np.isin(old_columns[0], columns[0])
+                old_positions = _decode_blob_positions(old_positions, old_columns[1])
+                positions = np.concatenate(
+                    [
+                        take_positions(
+                            old_positions, old_columns[1], np.flatnonzero(keep)
+                        ),
+                        positions,
+                    ]
+                )
+                columns = [
+                    np.concatenate([old[keep], new])
+                    for old, new in zip(old_columns, columns)
+                ]
+                order = np.argsort(columns[0], kind="stable")
+                positions = take_positions(positions, columns[1], order)
+                columns = [column[order] for column in columns]
+            values.append(
+                {
+                    "term_id": term_id,
+                    "document_count": len(columns[0]),
+                    "data": encode_postings(*columns),
+                    "positions": encode_positions(positions, columns[1]),
+                }
+            )
+
+        stmt = insert(TermPostings)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["term_id"],
+                set_={
+                    "document_count": stmt.excluded.document_count,
+                    "data": stmt.excluded.data,
+                    "positions": stmt.excluded.positions,
+                },
+            ),
+            values,
+        )
+        await db.execute(delete(InvertedIndex).where(InvertedIndex.term_id.in_(chunk)))
+        await db.commit()
+
+    return len(term_ids)
+
+
+async def load_postings(
+    db: AsyncSession, term_ids: List[int], with_positions: bool = False
+) -> Tuple:
+    """Load the postings of some terms from rows and blobs.
+
+    Args:
+        db: Database session
+        term_ids: Terms to load
+        with_positions: Also load the positions of every posting
+
+    Returns:
+        Tuple of term id, document id, frequency and document length arrays,
+        sorted by term and then document, followed by the TermPositions of
+        the terms if with_positions is set
+    """
+    rows, row_positions = await _load_rows(db, term_ids, with_positions)
+    blobs = await _load_blobs(db, term_ids, with_positions)
+    if blobs:
+        # Decoding is CPU-bound, so it stays off the event loop
+        rows, row_positions = await asyncio.to_thread(
+            _merge_blobs, rows, blobs, row_positions
+        )
+    return (*rows, row_positions) if with_positions else rows
+
+
+def _merge_blobs(
+    rows: Tuple[np.ndarray, ...],
+    blobs: Dict[int, Tuple[bytes, Optional[bytes]]],
+    row_positions: Optional[TermPositions],
+) -> Tuple[Tuple[np.ndarray, ...], Optional[TermPositions]]:
+    parts = [rows]
+    decoded = {}
+    for term_id, (blob, _) in blobs.items():
+        doc_ids, frequencies, lengths = decoded[term_id] = decode_postings(blob)
+        parts.append((np.full(len(doc_ids), term_id), doc_ids, frequencies, lengths))
+
+    terms, docs, frequencies, lengths = (
+        np.concatenate(arrays) for arrays in zip(*parts)
+    )
+    order = np.lexsort((docs, terms))
+    postings = terms[order], docs[order], frequencies[order], lengths[order]
+    if row_positions is None:
+        return postings, None
+
+    # Each term's postings in the same order as the lexsort above
+    term_parts = defaultdict(list)
+    for term_id, (docs, frequencies, _) in split_by_term(*rows):
+        term_parts[term_id].append((docs, frequencies, row_positions[term_id]))
+    for term_id, (docs, frequencies, _) in decoded.items():
+        positions = _decode_blob_positions(blobs[term_id][1], frequencies)
+        term_parts[term_id].append((docs, frequencies, positions))
+
+    positions = {}
+    for term_id, parts in term_parts.items():
+        docs, frequencies, term_positions = (np.concatenate(c) for c in zip(*parts))
+        positions[term_id] = take_positions(
+            term_positions, frequencies, np.argsort(docs, kind="stable")
+        )
+    return postings, positions
+
+
+async def _load_rows(
+    db: AsyncSession, term_ids: List[int], with_positions: bool = False
+) -> Tuple[Tuple[np.ndarray, ...], Optional[TermPositions]]:
+    columns = [
+        InvertedIndex.term_id,
+        InvertedIndex.document_id,
+        InvertedIndex.term_frequency,
+        DocumentStats.length,
+    ]
+    if with_positions:
+        columns.append(InvertedIndex.positions)
+    rows = (
+        await db.execute(
+            select(*columns)
+            .join(
+                DocumentStats,
+                DocumentStats.document_id == InvertedIndex.document_id,
+            )
+            .where(InvertedIndex.term_id.in_(term_ids))
+            # Served in this order by the (term_id, document_id) index
+            .order_by(InvertedIndex.term_id, InvertedIndex.document_id)
+        )
+    ).all()
+    postings = np.array([row[:4] for row in rows], dtype=np.int64).reshape(-1, 4)
+    postings = postings[:, 0], postings[:, 1], postings[:, 2], postings[:, 3]
+    if not with_positions:
+        return postings, None
+
+    # Every row's list holds term frequency positions, so a term's lists
+    # decode together
+    encoded: Dict[int, List[bytes]] = defaultdict(list)
+    for term_id, _, frequency, _, data in rows:
+        encoded[term_id].append(
+            data if data is not None else missing_positions(frequency)
+        )
+    positions = {
+        term_id: decode_positions(b"".join(encoded[term_id]), frequencies)
+        for term_id, (_, frequencies, _) in split_by_term(*postings)
+    }
+    return postings, positions
+
+
+def _decode_blob_positions(
+    data: Optional[bytes], frequencies: np.ndarray
+) -> np.ndarray:
+    """Decode a positions blob; blobs compacted before positions existed are
+    NULL"""
+    if data is None:
+        data = missing_positions(int(frequencies.sum()))
+    return decode_positions(data, frequencies)
+
+
+async def _load_blobs(
+    db: AsyncSession, term_ids: List[int], with_positions: bool = False
+) -> Dict[int, Tuple[bytes, Optional[bytes]]]:
+    """Map terms to their postings blob and, if requested, positions blob"""
+    columns = [TermPostings.term_id, TermPostings.data]
+    if with_positions:
+        columns.append(TermPostings.positions)
+    rows = await db.execute(select(*columns).where(TermPostings.term_id.in_(term_ids)))
+    return {
+        row[0]: (row[1], row[2] if with_positions else None) for row in rows.tuples()
+    }
+
+
+def split_by_term(
+    terms: np.ndarray, *columns: np.ndarray
+) -> Iterator[Tuple[int, List[np.ndarray]]]:
+    """Split postings sorted by term into (term id, columns) groups"""
+    if not len(terms):
+        return
+    starts = np.flatnonzero(np.diff(terms)) + 1
+    heads = terms[np.concatenate(([0], starts))]
+    groups = zip(*(np.split(column, starts) for column in columns))
+    for term_id, group in zip(heads, groups):
+        yield int(term_id), list(group)
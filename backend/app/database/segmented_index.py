@@ -0,0 +1,371 @@
+"""
+Log-structured index of immutable segments for concurrent crawl and search.
+
+Each committed crawl batch becomes a small segment in the IndexSegment
+format, written without touching SQLite. A background merge combines
+segments with a tiered policy: segments are grouped by size into tiers that
+grow by merge_factor, and once a tier holds merge_factor segments they are
+merged into one segment of the next tier, so every document is rewritten
+about log(N) times.
+
+The live segments are listed in segments.json, which is replaced atomically
+whenever a segment is added or a merge finishes. A search takes a
+SegmentSnapshot of the live segments and reads only those, so it sees a
+consistent index while new segments are flushed and merged. Merged-away
+segment files are deleted right away; open snapshots keep reading them
+through their mappings.
+
+Documents are indexed once per crawl: fresh and recrawl modes clear the
+index, so segments never hold two versions of a document.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+from ..config.globals import logger
+from ..utils.positional import take_positions
+from ..utils.postings_codec import MISSING_POSITION
+from .index_segment import IndexSegment, SegmentWriter, remove_segment
+from .indexer import document_statistics
+
+MANIFEST_FILE = "segments.json"
+
+_open_indexes: Dict[str, "SegmentedIndex"] = {}
+
+
+class SegmentDocument(NamedTuple):
+    doc_id: int
+    url: str
+    title: str
+    content: str
+    term_frequencies: Dict[str, int]
+    passages: bytes = b""
+    term_positions: Optional[Dict[str, List[int]]] = None
+
+
+class SegmentSnapshot:
+    """Fixed set of segments searched as one index.
+
+    Offers the read interface of IndexSegment, so SearchService can use
+    either. Term keys returned by lookup are only valid for this snapshot.
+    """
+
+    def __init__(self, segments: List[IndexSegment]):
+        self.segments = segments
+        self.num_documents = sum(s.num_documents for s in segments)
+        self._total_terms = sum(s.manifest["total_terms"] for s in segments)
+        self._keys: Dict[str, int] = {}
+        self._locations: List[List[Tuple[IndexSegment, int]]] = []
+
+    @property
+    def average_length(self) -> float:
+        if not self.num_documents:
+            return 0.0
+        return self._total_terms / self.num_documents
+
+    def lookup(self, term: str) -> Optional[int]:
+        """Return a key for a term found in any segment, or None"""
+        if term not in self._keys:
+            locations = []
+            for segment in self.segments:
+                index = segment.lookup(term)
+                if index is not None:
+                    locations.append((segment, index))
+            if not locations:
+                return None
+            self._keys[term] = len(self._locations)
+            self._locations.append(locations)
+        return self._keys[term]
+
+    def document_frequency(self, key: int) -> int:
+        return sum(
+            segment.document_frequency(index) for segment, index in self._locations[key]
+        )
+
+    def postings(self, key: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Merge a term's postings from every segment, sorted by document id"""
+        columns = [segment.postings(index) for segment, index in self._locations[key]]
+        if len(columns) == 1:
+            return columns[0]
+        doc_ids, frequencies, lengths = (np.concatenate(c) for c in zip(*columns))
+        order = np.argsort(doc_ids, kind="stable")
+        return doc_ids[order], frequencies[order], lengths[order]
+
+    def positional_postings(
+        self, key: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Merge a term's postings and their positions from every segment"""
+        return _merge_positional(
+            [
+                segment.positional_postings(index)
+                for segment, index in self._locations[key]
+            ]
+        )
+
+    def documents(self, doc_ids: List[int]) -> Dict[int, Tuple[str, str, str]]:
+        """Map document ids found in any segment to (url, title, content)"""
+        documents = {}
+        for segment in self.segments:
+            documents.update(segment.documents(doc_ids))
+        return documents
+
+    def passages(self, doc_ids: List[int]) -> Dict[int, bytes]:
+        """Map document ids found in any segment to their passage index"""
+        passages = {}
+        for segment in self.segments:
+            passages.update(segment.passages(doc_ids))
+        return passages
+
+
+class SegmentedIndex:
+    """Directory of immutable index segments merged in the background."""
+
+    def __init__(self, directory: str, merge_factor: int = 10):
+        """Open or create a segmented index.
+
+        Args:
+            directory: Directory holding the segments and their manifest
+            merge_factor: Number of same-tier segments merged at once
+        """
+        if merge_factor < 2:
+            raise ValueError("merge_factor must be at least 2")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.merge_factor = merge_factor
+        # Segments are written and merged in threads off the event loop
+        self._lock = threading.Lock()
+        self._segments: Dict[str, IndexSegment] = {}
+        self._next_id = 1
+        self._manifest_mtime: Optional[int] = None
+        self._merge_task: Optional[asyncio.Task] = None
+        self._reload()
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    @property
+    def segment_names(self) -> List[str]:
+        with self._lock:
+            return list(self._segments)
+
+    def snapshot(self) -> SegmentSnapshot:
+        """Return a consistent view of the live segments"""
+        with self._lock:
+            self._reload()
+            return SegmentSnapshot(list(self._segments.values()))
+
+    def add_documents(self, documents: List[SegmentDocument]) -> Optional[str]:
+        """Write documents as a new segment and make it live.
+
+        Args:
+            documents: Documents that are not in the index yet
+
+        Returns:
+            Name of the new segment, or None if there was nothing to write
+        """
+        if not documents:
+            return None
+
+        postings: Dict[str, List[Tuple[int, int, List[int]]]] = defaultdict(list)
+        stats = {}
+        for doc in documents:
+            stats[doc.doc_id] = document_statistics(doc.term_frequencies)
+            term_positions = doc.term_positions or {}
+            for term, frequency in doc.term_frequencies.items():
+                positions = term_positions.get(term, [MISSING_POSITION] * frequency)
+                postings[term].append((doc.doc_id, frequency, positions))
+
+        name = self._new_name()
+        writer = SegmentWriter(os.path.join(self.directory, name))
+        for term in sorted(postings, key=lambda t: t.encode("utf-8")):
+            entries = sorted(postings[term], key=lambda entry: entry[0])
+            doc_ids = np.array([doc_id for doc_id, _, _ in entries], dtype=np.int64)
+            frequencies = np.array([f for _, f, _ in entries], dtype=np.int64)
+            positions = np.concatenate([p for _, _, p in entries])
+            writer.add_term(
+                term.encode("utf-8"),
+                doc_ids,
+                frequencies,
+                np.array([stats[doc_id].length for doc_id in doc_ids.tolist()]),
+                positions,
+            )
+        for doc in sorted(documents, key=lambda d: d.doc_id):
+            writer.add_document(
+                doc.doc_id,
+                doc.url,
+                doc.title,
+                doc.content,
+                stats[doc.doc_id],
+                doc.passages,
+            )
+        writer.finish()
+
+        self._publish(added=name, removed=[])
+        return name
+
+    def merge_candidates(self) -> List[str]:
+        """Pick the segments of the smallest tier that is full, if any"""
+        with self._lock:
+            sizes = {name: s.num_documents for name, s in self._segments.items()}
+        tiers = defaultdict(list)
+        for name, size in sizes.items():
+            tiers[_tier(size, self.merge_factor)].append(name)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][: self.merge_factor]
+        return []
+
+    def merge(self, names: List[str]) -> str:
+        """Merge live segments into a new one that replaces them.
+
+        Args:
+            names: Segments to merge
+
+        Returns:
+            Name of the merged segment
+        """
+        with self._lock:
+            segments = [self._segments[name] for name in names]
+
+        name = self._new_name()
+        writer = SegmentWriter(os.path.join(self.directory, name))
+        terms = heapq.merge(
+            *(_tag_terms(segment, pos) for pos, segment in enumerate(segments))
+        )
+        for term, group in itertools.groupby(terms, key=lambda entry: entry[0]):
+            writer.add_term(
+                term,
+                *_merge_positional(
+                    [
+                        segments[pos].positional_postings(index)
+                        for _, pos, index in group
+                    ]
+                ),
+            )
+        for document in heapq.merge(*(s.iter_documents() for s in segments)):
+            writer.add_document(*document)
+        writer.finish()
+
+        self._publish(added=name, removed=names)
+        return name
+
+    def schedule_merges(self) -> None:
+        """Start merging in the background unless a merge is already running"""
+        if self._merge_task is None or self._merge_task.done():
+            self._merge_task = asyncio.create_task(self._merge_loop())
+
+    async def wait_for_merges(self) -> None:
+        """Wait until the background merges have finished"""
+        if self._merge_task is not None:
+            await asyncio.gather(self._merge_task, return_exceptions=True)
+
+    def clear(self) -> None:
+        """Delete every segment"""
+        with self._lock:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if os.path.isdir(path):
+                    remove_segment(path)
+                else:
+                    os.remove(path)
+            self._segments = {}
+            self._next_id = 1
+            self._manifest_mtime = None
+
+    async def _merge_loop(self) -> None:
+        while True:
+            names = self.merge_candidates()
+            if not names:
+                return
+            try:
+                merged = await asyncio.to_thread(self.merge, names)
+            except Exception as e:
+                logger.error(f"Error merging index segments: {str(e)}")
+                return
+            logger.info(f"Merged {len(names)} index segments into {merged}")
+
+    def _new_name(self) -> str:
+        with self._lock:
+            name = f"segment_{self._next_id:08d}"
+            self._next_id += 1
+        return name
+
+    def _publish(self, added: str, removed: List[str]) -> None:
+        segment = IndexSegment(os.path.join(self.directory, added))
+        with self._lock:
+            for name in removed:
+                del self._segments[name]
+            self._segments[added] = segment
+            manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+            with open(f"{manifest_path}.tmp", "w") as f:
+                json.dump(
+                    {"next_id": self._next_id, "segments": list(self._segments)}, f
+                )
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+            self._manifest_mtime = os.stat(manifest_path).st_mtime_ns
+        for name in removed:
+            remove_segment(os.path.join(self.directory, name))
+
+    def _reload(self) -> None:
+        """Pick up segments published by another process. Holds the lock."""
+        manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+            if mtime == self._manifest_mtime:
+                return
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            segments = {
+                name: self._segments.get(name)
+                or IndexSegment(os.path.join(self.directory, name))
+                for name in manifest["segments"]
+            }
+        except FileNotFoundError:
+            # Not created yet, or a merge removed a segment while reading;
+            # the current view stays until the next snapshot
+            return
+        self._segments = segments
+        self._next_id = max(self._next_id, manifest["next_id"])
+        self._manifest_mtime = mtime
+
+
+def _tier(size: int, merge_factor: int) -> int:
+    """Return floor(log(size, merge_factor)), computed exactly in integers"""
+    tier = 0
+    while size >= merge_factor:
+        size //= merge_factor
+        tier += 1
+    return tier
+
+
+def _merge_positional(
+    columns: List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Merge one term's positional postings from several segments"""
+    if len(columns) == 1:
+        return columns[0]
+    doc_ids, frequencies, lengths, positions = (
+        np.concatenate(c) for c in zip(*columns)
+    )
+    order = np.argsort(doc_ids, kind="stable")
+    positions = take_positions(positions, frequencies, order)
+    return doc_ids[order], frequencies[order], lengths[order], positions
+
+
+def _tag_terms(segment: IndexSegment, pos: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (term, pos, term index) so merged terms remember their segment"""
+    for term, index in segment.iter_terms():
+        yield term, pos, index
+
+
+def get_segmented_index(directory: str, merge_factor: int = 10) -> SegmentedIndex:
+    """Return the segmented index in a directory, opening it once per process"""
+    if directory not in _open_indexes:
+        _open_indexes[directory] = SegmentedIndex(directory, merge_factor)
+    return _open_indexes[directory]
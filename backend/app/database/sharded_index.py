@@ -0,0 +1,197 @@
+"""
+Document-partitioned index over several segmented indexes.
+
+Documents are assigned to one of num_shards shards by document id, and each
+shard is an independent SegmentedIndex with its own segments and merges, so
+index size and merge work are spread over several directories. A search
+fans out to every shard in parallel and merges the per-shard top k lists;
+see SearchService. For scores to match an unsharded index, every shard is
+scored with index-wide document frequencies and lengths, which
+ShardedSnapshot gathers before the shards are searched.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from .segmented_index import SegmentDocument, SegmentedIndex, SegmentSnapshot
+
+# Records the number of shards documents were partitioned into
+SHARDS_FILE = "shards.json"
+
+_open_indexes: Dict[str, "ShardedIndex"] = {}
+
+
+def shard_of(doc_id: int, num_shards: int) -> int:
+    """Return the shard a document belongs to"""
+    return doc_id % num_shards
+
+
+def shard_path(directory: str, shard: int) -> str:
+    """Return the directory of one shard"""
+    return os.path.join(directory, f"shard_{shard:03d}")
+
+
+class ShardedSnapshot:
+    """Consistent view of every shard, searched with scatter-gather."""
+
+    def __init__(self, shards: List[SegmentSnapshot]):
+        self.shards = shards
+        self.num_documents = sum(shard.num_documents for shard in shards)
+        self._total_terms = sum(
+            shard.average_length * shard.num_documents for shard in shards
+        )
+
+    @property
+    def average_length(self) -> float:
+        if not self.num_documents:
+            return 0.0
+        return self._total_terms / self.num_documents
+
+    def lookup(self, terms: List[str]) -> Tuple[List[Dict[int, str]], Dict[str, int]]:
+        """Find query terms in every shard.
+
+        Args:
+            terms: Query terms
+
+        Returns:
+            For each shard, its keys of the terms it holds, and the
+            index-wide document frequency of each term
+        """
+        keys = []
+        df: Dict[str, int] = {}
+        for shard in self.shards:
+            shard_keys = {}
+            for term in terms:
+                key = shard.lookup(term)
+                if key is not None:
+                    shard_keys[key] = term
+                    df[term] = df.get(term, 0) + shard.document_frequency(key)
+            keys.append(shard_keys)
+        return keys, df
+
+    def documents(self, doc_ids: List[int]) -> Dict[int, Tuple[str, str, str]]:
+        """Map document ids to (url, title, content), reading each from its shard"""
+        documents = {}
+        for shard, ids in self._by_shard(doc_ids).items():
+            documents.update(self.shards[shard].documents(ids))
+        return documents
+
+    def passages(self, doc_ids: List[int]) -> Dict[int, bytes]:
+        """Map document ids to their passage index, reading each from its shard"""
+        passages = {}
+        for shard, ids in self._by_shard(doc_ids).items():
+            passages.update(self.shards[shard].passages(ids))
+        return passages
+
+    def _by_shard(self, doc_ids: List[int]) -> Dict[int, List[int]]:
+        by_shard: Dict[int, List[int]] = {}
+        for doc_id in doc_ids:
+            by_shard.setdefault(shard_of(doc_id, len(self.shards)), []).append(doc_id)
+        return by_shard
+
+
+class ShardedIndex:
+    """Segmented indexes that documents are hash-partitioned across."""
+
+    def __init__(self, directory: str, num_shards: int, merge_factor: int = 10):
+        """Open or create a sharded index.
+
+        Args:
+            directory: Directory holding one subdirectory per shard
+            num_shards: Number of shards, fixed once documents are indexed
+            merge_factor: Number of same-tier segments merged at once
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        os.makedirs(directory, exist_ok=True)
+        shards_file = os.path.join(directory, SHARDS_FILE)
+        if os.path.exists(shards_file):
+            with open(shards_file) as f:
+                existing = json.load(f)["num_shards"]
+            # Documents would be looked up in the wrong shards
+            if existing != num_shards:
+                raise ValueError(
+                    f"Index has {existing} shards, cannot open it with {num_shards}"
+                )
+        else:
+            with open(shards_file, "w") as f:
+                json.dump({"num_shards": num_shards}, f)
+        self.directory = directory
+        self.shards = [
+            SegmentedIndex(shard_path(directory, shard), merge_factor)
+            for shard in range(num_shards)
+        ]
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_shards, thread_name_prefix="shard"
+        )
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def snapshot(self) -> ShardedSnapshot:
+        """Return a consistent view of every shard"""
+        return ShardedSnapshot([shard.snapshot() for shard in self.shards])
+
+    def add_documents(self, documents: List[SegmentDocument]) -> List[Optional[str]]:
+        """Write each shard's share of the documents as a new segment.
+
+        Args:
+            documents: Documents that are not in the index yet
+
+        Returns:
+            Name of each shard's new segment, or None where it got none
+        """
+        parts: List[List[SegmentDocument]] = [[] for _ in self.shards]
+        for doc in documents:
+            parts[shard_of(doc.doc_id, len(self.shards))].append(doc)
+        return list(
+            self._executor.map(
+                lambda shard, part: shard.add_documents(part), self.shards, parts
+            )
+        )
+
+    def schedule_merges(self) -> None:
+        """Start each shard's background merges"""
+        for shard in self.shards:
+            shard.schedule_merges()
+
+    async def wait_for_merges(self) -> None:
+        """Wait until every shard's merges have finished"""
+        await asyncio.gather(*(shard.wait_for_merges() for shard in self.shards))
+
+    def clear(self) -> None:
+        """Delete every shard's segments"""
+        for shard in self.shards:
+            shard.clear()
+
+    def close(self) -> None:
+        """Stop the threads that write shards, after their current writes"""
+        self._executor.shutdown(wait=True)
+
+
+def get_sharded_index(
+    directory: str, num_shards: int, merge_factor: int = 10
+) -> ShardedIndex:
+    """Return the sharded index in a directory, opening it once per process"""
+    if directory not in _open_indexes:
+        _open_indexes[directory] = ShardedIndex(directory, num_shards, merge_factor)
+    return _open_indexes[directory]
+
+
+def remove_sharded_index(directory: str) -> None:
+    """Delete a sharded index and its directory if it exists"""
+    index = _open_indexes.pop(directory, None)
+    if index is not None:
+        index.clear()
+        index.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def close_sharded_indexes() -> None:
+    """Close every sharded index opened by get_sharded_index"""
+    while _open_indexes:
+        _, index = _open_indexes.popitem()
+        index.close()
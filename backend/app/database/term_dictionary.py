@@ -0,0 +1,85 @@
+"""
+Process-wide term dictionary shared by searches.
+
+Maps term strings to their id and document frequency without a database
+query once a term has been looked up. Each database engine has its own
+dictionary, which is tied to a version of the index statistics and dropped
+as soon as indexing changes them, so it never serves stale frequencies.
+"""
+
+import weakref
+from typing import Dict, Hashable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from .models import Term, TermStats
+
+# Upper bound on remembered terms, including ones that are not indexed
+MAX_CACHED_TERMS = 1 << 20
+
+_dictionaries: "weakref.WeakKeyDictionary[AsyncEngine, TermDictionary]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class TermDictionary:
+    """Lazily filled map of term -> (term id, document frequency)."""
+
+    def __init__(self, max_terms: int = MAX_CACHED_TERMS):
+        self.max_terms = max_terms
+        self._version: Optional[Hashable] = None
+        # None marks a term known not to be indexed
+        self._terms: Dict[str, Optional[Tuple[int, int]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    async def lookup(
+        self, db: AsyncSession, terms: List[str], version: Hashable
+    ) -> Dict[str, Tuple[int, int]]:
+        """Find the id and document frequency of indexed terms.
+
+        Terms not looked up before are fetched with a single query.
+
+        Args:
+            db: Database session
+            terms: Terms to look up
+            version: Identifies the index state; a new version empties the
+                dictionary
+
+        Returns:
+            Map of each indexed term to (term id, document frequency)
+        """
+        if version != self._version:
+            self._terms = {}
+            self._version = version
+
+        entries = {term: self._terms[term] for term in terms if term in self._terms}
+        missing = [term for term in terms if term not in entries]
+        self.hits += len(entries)
+        self.misses += len(missing)
+        if missing:
+            rows = await db.execute(
+                select(Term.term, Term.id, TermStats.document_frequency)
+                .join(TermStats, TermStats.term_id == Term.id)
+                .where(Term.term.in_(missing))
+                .where(TermStats.document_frequency > 0)
+            )
+            found = {term: (term_id, df) for term, term_id, df in rows.tuples()}
+            # Another search may have seen a newer index meanwhile
+            if version == self._version:
+                if len(self._terms) + len(missing) > self.max_terms:
+                    self._terms = {}
+                for term in missing:
+                    self._terms[term] = found.get(term)
+            entries.update(found)
+
+        return {term: entry for term, entry in entries.items() if entry is not None}
+
+
+def get_term_dictionary(engine: AsyncEngine) -> TermDictionary:
+    """Return the term dictionary of a database engine"""
+    if engine not in _dictionaries:
+        _dictionaries[engine] = TermDictionary()
+    return _dictionaries[engine]
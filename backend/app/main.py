@@ -5,7 +5,7 @@ Main application module
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .api.routes import router
+from .api.routes import close_search_client, open_search_client, router
 from .config.globals import (
     logger,
     get_available_databases,
@@ -67,9 +67,12 @@ async def lifespan(app: FastAPI):
         set_available_databases(available_dbs)
         logger.info(f"Available databases updated: {available_dbs}")
 
+    await open_search_client()
+
     logger.info("Application startup complete.")
     yield
     logger.info("Shutting down application...")
+    await close_search_client()
     await close_connections()
     logger.info("Application shutdown complete.")
 
@@ -0,0 +1,171 @@
+"""
+Search-only application served by several worker processes.
+
+The main application runs the crawler and search on one event loop, so
+searches use a single core. This application serves only /api/search from
+read-only connections, and can run as many processes as there are cores:
+
+    python -m app.search_server --workers 8 --db db-default
+
+The workers share one listening socket, so the kernel spreads connections
+across them. Each opens the SQLite file read-only, or maps the same index
+segment files, so they share the operating system's page cache, while the
+crawler keeps writing from the main application. Setting
+SEARCH_SERVER_URL makes the main application forward its searches here.
+
+Workers cannot see the crawler's in-process index generation, so they
+compare the modification times of the index files before each search and
+drop their cached responses when any of them changes.
+
+Forwarded searches name the main application's current database. Workers
+answer 409 for any other, so after a switch the main application searches
+in process instead of getting results from the database served here.
+
+Read-only workers cannot migrate the database, so main brings it up to the
+current schema once before starting them.
+"""
+
+import argparse
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query
+from sqlalchemy.ext.asyncio import create_async_engine
+from .api.routes import search_cache, search_index
+from .config.globals import (
+    bump_index_generation,
+    get_current_db,
+    logger,
+    set_current_db,
+)
+from .config.settings import settings
+from .database import index_segment
+from .database.segmented_index import MANIFEST_FILE
+from .database.sharded_index import shard_path
+from .database.connection import (
+    close_connections,
+    create_tables,
+    get_db_path,
+    get_segment_path,
+    get_segments_path,
+    get_shards_path,
+    setup_engine,
+    setup_session_factory,
+)
+
+# Passes the database chosen on the command line to the worker processes
+DB_ENV_VAR = "SEARCH_SERVER_DB"
+
+_index_files: Tuple[str, ...] = ()
+_fingerprint: Optional[Tuple[int, ...]] = None
+
+
+def index_files(db_name: str) -> Tuple[str, ...]:
+    """Files whose modification means the searchable index may have changed"""
+    db_path = get_db_path(db_name)
+    shards = [
+        os.path.join(shard_path(get_shards_path(db_name), shard), MANIFEST_FILE)
+        for shard in range(settings.INDEX_SHARDS)
+    ]
+    return (
+        db_path,
+        f"{db_path}-wal",
+        os.path.join(get_segments_path(db_name), MANIFEST_FILE),
+        os.path.join(get_segment_path(db_name), index_segment.MANIFEST_FILE),
+        *shards,
+    )
+
+
+def check_index_files() -> None:
+    """Start a new index generation if any index file changed"""
+    global _fingerprint
+    fingerprint = tuple(_mtime(path) for path in _index_files)
+    if fingerprint != _fingerprint:
+        _fingerprint = fingerprint
+        bump_index_generation()
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the database read-only for the lifetime of the worker"""
+    global _index_files
+    db_name = os.environ.get(DB_ENV_VAR, settings.DEFAULT_DB_NAME)
+    if not os.path.exists(get_db_path(db_name)):
+        raise RuntimeError(f"Database not found: {db_name}")
+    await setup_engine(db_name, read_only=True)
+    await setup_session_factory(db_name)
+    set_current_db(db_name)
+    _index_files = index_files(db_name)
+    logger.info(f"Search worker {os.getpid()} serving database: {db_name}")
+    yield
+    await close_connections()
+
+
+app = FastAPI(title="UCI Search Engine search server", lifespan=lifespan)
+
+
+@app.get("/api/search")
+async def search(
+    query: str = Query(..., description="Search query"),
+    page: int = Query(1, description="Page number", ge=1),
+    per_page: int = Query(10, description="Results per page", ge=1, le=50),
+    db: Optional[str] = Query(None, description="Database the caller searches"),
+):
+    """Search the crawled content."""
+    if db is not None and db != get_current_db():
+        raise HTTPException(
+            status_code=409, detail=f"Search server serves database {get_current_db()}"
+        )
+    check_index_files()
+    return await search_index(query, page, per_page)
+
+
+@app.get("/api/search/cache")
+async def get_search_cache_statistics():
+    """Get this worker's search cache counters"""
+    return {"pid": os.getpid(), **search_cache.statistics()}
+
+
+async def migrate_database(db_name: str) -> None:
+    """Add the tables and columns an older database file lacks"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{get_db_path(db_name)}")
+    try:
+        await create_tables(engine)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve searches from several processes"
+    )
+    parser.add_argument("--db", default=settings.DEFAULT_DB_NAME)
+    parser.add_argument("--host", default=settings.API_HOST)
+    parser.add_argument("--port", type=int, default=settings.SEARCH_SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SEARCH_WORKERS)
+    args = parser.parse_args()
+    if not os.path.exists(get_db_path(args.db)):
+        parser.error(f"Database not found: {args.db}")
+
+    asyncio.run(migrate_database(args.db))
+    os.environ[DB_ENV_VAR] = args.db
+    uvicorn.run(
+        "app.search_server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
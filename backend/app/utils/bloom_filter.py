@@ -0,0 +1,180 @@
+import hashlib
+import math
+import os
+import struct
+from typing import List, Tuple
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    Membership checks may return false positives at roughly the configured
+    error rate once capacity items have been added, but never false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """Initialize filter.
+
+        Args:
+            capacity: Number of items the filter is sized for
+            error_rate: Target false-positive rate at capacity
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(
+            8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[index >> 3] & (1 << (index & 7)) for index in self._indexes(item)
+        )
+
+    def add(self, item: str) -> bool:
+        """Add an item to the filter.
+
+        Args:
+            item: Item to add
+
+        Returns:
+            True if the item was not already (possibly) present
+        """
+        added = False
+        for index in self._indexes(item):
+            mask = 1 << (index & 7)
+            if not self.bits[index >> 3] & mask:
+                self.bits[index >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def _indexes(self, item: str) -> List[int]:
+        # Double hashing: k indexes from the two halves of one digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+
+class ScalableBloomFilter:
+    """Bloom filter that grows by adding larger, stricter slices.
+
+    Each new slice doubles the capacity and halves the error rate of the
+    previous one, so the compound false-positive rate stays below the
+    configured rate however many items are added.
+    """
+
+    _MAGIC = b"SBF1"
+    _HEADER = struct.Struct("<4sQdI")
+    _SLICE = struct.Struct("<QdQ")
+
+    def __init__(self, initial_capacity: int = 100000, error_rate: float = 0.001):
+        """Initialize filter.
+
+        Args:
+            initial_capacity: Capacity of the first slice
+            error_rate: Target compound false-positive rate
+        """
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.slices: List[BloomFilter] = []
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.slices)
+
+    def __contains__(self, item: str) -> bool:
+        return any(item in s for s in self.slices)
+
+    def add(self, item: str) -> bool:
+        """Add an item to the filter.
+
+        Args:
+            item: Item to add
+
+        Returns:
+            True if the item was not already (possibly) present
+        """
+        if item in self:
+            return False
+        if not self.slices or self.slices[-1].is_full:
+            self.slices.append(self._new_slice())
+        return self.slices[-1].add(item)
+
+    def update(self, items) -> None:
+        """Add several items to the filter.
+
+        Args:
+            items: Items to add
+        """
+        for item in items:
+            self.add(item)
+
+    @property
+    def size_in_bytes(self) -> int:
+        return sum(len(s.bits) for s in self.slices)
+
+    def _new_slice(self) -> BloomFilter:
+        capacity, error_rate = self._slice_params(len(self.slices))
+        return BloomFilter(capacity, error_rate)
+
+    def _slice_params(self, i: int) -> Tuple[int, float]:
+        return self.initial_capacity * 2**i, self.error_rate * 0.5 ** (i + 1)
+
+    def save(self, path: str) -> None:
+        """Write the filter to a file, replacing it atomically.
+
+        Args:
+            path: Destination file path
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(
+                self._HEADER.pack(
+                    self._MAGIC,
+                    self.initial_capacity,
+                    self.error_rate,
+                    len(self.slices),
+                )
+            )
+            for s in self.slices:
+                f.write(self._SLICE.pack(s.capacity, s.error_rate, s.count))
+                f.write(s.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ScalableBloomFilter":
+        """Read a filter written by save.
+
+        Args:
+            path: Source file path
+
+        Returns:
+            ScalableBloomFilter: Loaded filter
+        """
+        with open(path, "rb") as f:
+            magic, initial_capacity, error_rate, num_slices = cls._HEADER.unpack(
+                f.read(cls._HEADER.size)
+            )
+            if magic != cls._MAGIC:
+                raise ValueError(f"Not a seen-URL filter file: {path}")
+
+            bloom = cls(initial_capacity=initial_capacity, error_rate=error_rate)
+            for _ in range(num_slices):
+                capacity, slice_error_rate, count = cls._SLICE.unpack(
+                    f.read(cls._SLICE.size)
+                )
+                s = BloomFilter(capacity, slice_error_rate)
+                s.bits = bytearray(f.read(len(s.bits)))
+                s.count = count
+                bloom.slices.append(s)
+        return bloom
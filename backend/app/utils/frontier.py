@@ -0,0 +1,78 @@
+from typing import Iterable, Iterator, List, Optional, Set
+from .rate_limiter import HostScheduler
+
+
+class Frontier:
+    """Crawl frontier with constant-time queueing and duplicate checks.
+
+    URLs are queued per host in a HostScheduler, and every URL ever admitted
+    is recorded in a hash set, so membership checks never scan the queue.
+    """
+
+    def __init__(self, requests_per_second: float = 1.0):
+        """Initialize frontier.
+
+        Args:
+            requests_per_second: Maximum requests per second for each host
+        """
+        self.queue = HostScheduler(requests_per_second=requests_per_second)
+        self.seen: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.queue)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.seen
+
+    def add(self, url: str) -> bool:
+        """Queue a URL unless it has been seen before.
+
+        Args:
+            url: URL to queue
+
+        Returns:
+            True if the URL was queued
+        """
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        self.queue.put(url)
+        return True
+
+    def add_many(self, urls: Iterable[str]) -> List[str]:
+        """Queue the URLs that have not been seen before.
+
+        Args:
+            urls: URLs to queue
+
+        Returns:
+            List of URLs that were queued
+        """
+        return [url for url in urls if self.add(url)]
+
+    def mark_seen(self, url: str) -> None:
+        """Record a URL as seen without queueing it.
+
+        Args:
+            url: URL that is already crawled or failed
+        """
+        self.seen.add(url)
+
+    async def get(self) -> Optional[str]:
+        """Wait for the next URL whose host may be fetched now.
+
+        Returns:
+            URL to fetch, or None once nothing is queued or in flight
+        """
+        return await self.queue.get()
+
+    def release(self, url: str) -> None:
+        """Mark the fetch of a URL returned by get as finished.
+
+        Args:
+            url: URL previously returned by get
+        """
+        self.queue.release(url)
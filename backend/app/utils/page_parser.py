@@ -0,0 +1,159 @@
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+from bs4 import BeautifulSoup
+from .snippets import build_passage_index
+from .tokenizer import get_token_positions, tokenize
+
+UCI_DOMAINS = [
+    "uci.edu",
+    "ics.uci.edu",
+    "cs.uci.edu",
+    "informatics.uci.edu",
+    "stat.uci.edu",
+]
+
+
+class ParsedPage(NamedTuple):
+    """Compact result of parsing a page, cheap to send between processes."""
+
+    title: str
+    text: str
+    outlinks: List[str]
+    term_frequencies: Dict[str, int]
+    term_positions: Dict[str, List[int]]
+    passages: bytes
+
+
+def normalize_url(url: str) -> str:
+    """Normalize URL by removing fragments, query parameters and trailing slashes.
+
+    Args:
+        url: URL to normalize
+
+    Returns:
+        str: Normalized URL
+    """
+    parsed = urlparse(url)
+    normalized = f"{parsed.scheme}://{parsed.netloc}{parsed.path}".rstrip("/").lower()
+
+    if parsed.query and (
+        any(parsed.path.endswith(ext) for ext in [".php", ".aspx", ".jsp"])
+        or any(param in parsed.query for param in ["id", "article", "page", "p"])
+    ):
+        normalized += f"?{parsed.query}"
+
+    return normalized
+
+
+def is_valid_uci_url(url: str) -> bool:
+    """Check whether a URL belongs to one of the crawled UCI domains.
+
+    Args:
+        url: URL to check
+
+    Returns:
+        bool: True if the URL may be crawled
+    """
+    parsed = urlparse(url)
+    return any(domain in parsed.netloc for domain in UCI_DOMAINS)
+
+
+def collapse_whitespace(text: str) -> str:
+    """Join the non-blank phrases of a page's text with single spaces.
+
+    Args:
+        text: Raw page text
+
+    Returns:
+        str: Cleaned text
+    """
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return " ".join(chunk for chunk in chunks if chunk)
+
+
+def extract_text_content(soup: BeautifulSoup) -> str:
+    """Get the visible text of a page with whitespace collapsed.
+
+    Args:
+        soup: Parsed page
+
+    Returns:
+        str: Cleaned text
+    """
+    for script in soup(["script", "style"]):
+        script.decompose()
+    return collapse_whitespace(soup.get_text())
+
+
+def _extract_bs4(html: str) -> Tuple[Optional[str], str, List[str]]:
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.string if soup.title else None
+    hrefs = [link["href"] for link in soup.find_all("a", href=True)]
+    return title, extract_text_content(soup), hrefs
+
+
+def _extract_lxml(html: str) -> Tuple[Optional[str], str, List[str]]:
+    try:
+        import lxml.html
+    except ImportError:
+        raise ImportError(
+            "The lxml parser backend requires lxml. Install it with: pip install lxml"
+        )
+
+    if not html.strip():
+        return None, "", []
+    # Encoding declarations are only allowed when parsing bytes
+    doc = lxml.html.document_fromstring(html.encode("utf-8"))
+    title = doc.findtext(".//title")
+    hrefs = [str(href) for href in doc.xpath("//a/@href")]
+    for element in doc.xpath("//script|//style"):
+        element.drop_tree()
+    return title, collapse_whitespace(doc.text_content()), hrefs
+
+
+PARSER_BACKENDS: Dict[str, Callable[[str], Tuple[Optional[str], str, List[str]]]] = {
+    "bs4": _extract_bs4,
+    "lxml": _extract_lxml,
+}
+
+
+def parse_page(url: str, html: str, backend: str = "bs4") -> ParsedPage:
+    """Parse a fetched page into its title, text and crawlable outlinks.
+
+    This is CPU-bound and runs in a worker process, so it only takes and
+    returns plain, picklable values.
+
+    Args:
+        url: URL the page was fetched from
+        html: Page HTML
+        backend: Name of the parser backend in PARSER_BACKENDS
+
+    Returns:
+        ParsedPage: Title, cleaned text, normalized UCI outlinks, the
+        frequency and positions of each token in the text and its passage
+        index
+    """
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(
+            f"Unknown parser backend {backend!r}, expected one of {list(PARSER_BACKENDS)}"
+        )
+    title, text, hrefs = PARSER_BACKENDS[backend](html)
+
+    outlinks = {}
+    for href in hrefs:
+        if href.startswith("#") or href.startswith("mailto:"):
+            continue
+        normalized_url = normalize_url(urljoin(url, href))
+        if normalized_url != url and is_valid_uci_url(normalized_url):
+            outlinks[normalized_url] = None
+
+    term_positions = get_token_positions(tokenize(text))
+    return ParsedPage(
+        title=(title or "").strip() or url,
+        text=text,
+        outlinks=list(outlinks),
+        term_frequencies={term: len(p) for term, p in term_positions.items()},
+        term_positions=term_positions,
+        passages=build_passage_index(text),
+    )
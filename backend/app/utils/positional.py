@@ -0,0 +1,137 @@
+"""
+Phrase matching and term proximity over positional postings.
+
+A term's positional postings are its document ids and term frequencies,
+sorted by document, with each posting's positions concatenated in the same
+order. Both operations first intersect the terms' document ids, expand only
+the surviving postings into (document, position) keys, and then work on
+sorted int64 keys, so they never look at document text.
+
+Postings indexed without positions hold negative positions, which match no
+phrase and add no proximity, while the term's other postings still do.
+"""
+
+from typing import List, NamedTuple, Tuple
+import numpy as np
+
+# Positions fit in the low bits of a (document, position) key
+_POSITION_BITS = 32
+
+
+class PositionalPostings(NamedTuple):
+    """Postings of one term with the positions of each."""
+
+    doc_ids: np.ndarray
+    frequencies: np.ndarray
+    positions: np.ndarray
+
+
+def take_positions(
+    positions: np.ndarray, counts: np.ndarray, postings: np.ndarray
+) -> np.ndarray:
+    """Select and reorder the position lists of some postings.
+
+    Args:
+        positions: Position lists of all postings, concatenated
+        counts: Number of positions of each posting
+        postings: Indexes of the postings to keep, in their new order
+
+    Returns:
+        np.ndarray: Position lists of the selected postings, concatenated
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    starts = (np.cumsum(counts) - counts)[postings]
+    counts = counts[postings]
+    # Offset of each output position within its posting's list
+    within = np.arange(int(counts.sum())) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+    return positions[np.repeat(starts, counts) + within]
+
+
+def restrict(postings: PositionalPostings, doc_ids: np.ndarray) -> PositionalPostings:
+    """Keep the postings of documents in a sorted array of document ids"""
+    keep = np.flatnonzero(np.isin(postings.doc_ids, doc_ids, assume_unique=True))
+    return PositionalPostings(
+        postings.doc_ids[keep],
+        postings.frequencies[keep],
+        take_positions(postings.positions, postings.frequencies, keep),
+    )
+
+
+def _keys(postings: PositionalPostings, shift: int = 0) -> np.ndarray:
+    """Sorted (document, position - shift) keys of every occurrence"""
+    docs = np.repeat(postings.doc_ids.astype(np.int64), postings.frequencies)
+    return (docs << _POSITION_BITS) + (postings.positions - shift)
+
+
+def _known_keys(postings: PositionalPostings) -> np.ndarray:
+    """Sorted keys of the occurrences whose positions are known"""
+    return _keys(postings)[postings.positions >= 0]
+
+
+def _common_documents(terms: List[PositionalPostings]) -> np.ndarray:
+    docs = terms[0].doc_ids
+    for term in terms[1:]:
+        docs = np.intersect1d(docs, term.doc_ids, assume_unique=True)
+    return docs
+
+
+def phrase_documents(terms: List[PositionalPostings]) -> np.ndarray:
+    """Find the documents containing the terms consecutively and in order.
+
+    Args:
+        terms: Positional postings of each phrase term, in phrase order
+
+    Returns:
+        np.ndarray: Sorted ids of the matching documents
+    """
+    docs = _common_documents(terms)
+    matches = None
+    for offset, term in enumerate(terms):
+        if not len(docs):
+            break
+        term = restrict(term, docs)
+        # Where the phrase would start if this occurrence is its offset-th term
+        starts = _keys(term, offset)[term.positions >= offset]
+        if matches is not None:
+            starts = np.intersect1d(matches, starts, assume_unique=True)
+        matches = starts
+        docs = np.unique(matches >> _POSITION_BITS)
+    return docs
+
+
+def min_distances(
+    first: PositionalPostings, second: PositionalPostings
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the closest occurrences of two different terms in each document.
+
+    Args:
+        first: Positional postings of one term
+        second: Positional postings of another term
+
+    Returns:
+        Tuple of the sorted ids of documents containing both terms at known
+        positions and the smallest distance between the terms' positions in
+        each
+    """
+    docs = _common_documents([first, second])
+    if not len(docs):
+        return docs, np.empty(0, dtype=np.int64)
+
+    first_keys = _known_keys(restrict(first, docs))
+    keys = np.concatenate([first_keys, _known_keys(restrict(second, docs))])
+    # True for occurrences of the second term
+    labels = np.arange(len(keys)) >= len(first_keys)
+    order = np.argsort(keys, kind="stable")
+    keys, labels = keys[order], labels[order]
+
+    # The closest pair is adjacent once both terms' occurrences are merged
+    doc_of = keys >> _POSITION_BITS
+    pairs = np.flatnonzero((labels[1:] != labels[:-1]) & (doc_of[1:] == doc_of[:-1]))
+    distances = keys[pairs + 1] - keys[pairs]
+    pair_docs = doc_of[pairs]
+    closest = np.full(len(docs), np.iinfo(np.int64).max)
+    np.minimum.at(closest, np.searchsorted(docs, pair_docs), distances)
+    found = closest < np.iinfo(np.int64).max
+    return docs[found], closest[found]
@@ -0,0 +1,228 @@
+"""
+Compressed binary format for the postings of one term.
+
+A blob holds a fixed-size header, a skip table and the varint-encoded
+blocks:
+
+    header      uint32 num_postings, uint32 num_blocks, uint32 num_columns
+    last_doc    uint32[num_blocks]        last document id of each block
+    offsets     uint32[num_blocks + 1]    byte offset of each block's payload
+    payload     per block: varint doc-id deltas, then each column as varints
+
+Columns are per-posting integers such as term frequency and document length.
+
+Document ids are delta-encoded against the previous posting, across block
+boundaries, so a whole blob decodes with one cumulative sum. The skip table
+lets readers stream or skip individual blocks without decoding the rest.
+
+Term positions are kept apart from the postings blob, as one varint list per
+posting: the first position plus one, then the gaps between consecutive
+positions. Each posting holds as many positions as its term frequency, so
+the lists need no lengths or offsets of their own. A posting indexed
+without positions is stored as zeros and decodes to MISSING_POSITION, so
+postings with and without positions share one list.
+"""
+
+import struct
+from typing import Iterator, Tuple
+import numpy as np
+
+BLOCK_SIZE = 128
+
+# Position of every occurrence in a posting indexed without positions
+MISSING_POSITION = -1
+
+_HEADER = struct.Struct("<III")
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """Encode non-negative integers as LEB128 varints.
+
+    Args:
+        values: Integers to encode
+
+    Returns:
+        bytes: Encoded values
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    num_bytes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        num_bytes += values >= (np.uint64(1) << np.uint64(shift))
+
+    ends = np.cumsum(num_bytes)
+    starts = ends - num_bytes
+    out = np.empty(int(ends[-1]) if len(values) else 0, dtype=np.uint8)
+    for i in range(int(num_bytes.max()) if len(values) else 0):
+        mask = num_bytes > i
+        chunk = (values[mask] >> np.uint64(7 * i)) & np.uint64(0x7F)
+        more = (num_bytes[mask] > i + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[mask] + i] = chunk | more
+    return out.tobytes()
+
+
+def decode_varints(data, count: int) -> np.ndarray:
+    """Decode the first count LEB128 varints of a buffer.
+
+    Args:
+        data: Buffer of encoded values
+        count: Number of values to decode
+
+    Returns:
+        np.ndarray: Decoded values as uint64
+    """
+    if count == 0:
+        return np.empty(0, dtype=np.uint64)
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buf < 0x80)[:count]
+    if len(ends) < count:
+        raise ValueError("Truncated varint data")
+
+    buf = buf[: ends[-1] + 1]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    # Position of each byte within its varint gives the shift of its 7 bits
+    position = np.arange(len(buf)) - np.repeat(starts, ends - starts + 1)
+    chunks = (buf & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.bitwise_or.reduceat(chunks, starts)
+
+
+def encode_postings(doc_ids: np.ndarray, *columns: np.ndarray) -> bytes:
+    """Encode a term's postings, sorted by document id, as a blob.
+
+    Args:
+        doc_ids: Strictly increasing document ids
+        columns: Per-posting non-negative integers, such as frequencies
+
+    Returns:
+        bytes: Encoded blob
+    """
+    doc_ids = np.asarray(doc_ids, dtype=np.uint64)
+    columns = [np.asarray(column, dtype=np.uint64) for column in columns]
+    deltas = np.diff(doc_ids, prepend=np.uint64(0))
+
+    starts = np.arange(0, len(doc_ids), BLOCK_SIZE)
+    ends = np.minimum(starts + BLOCK_SIZE, len(doc_ids))
+    payloads = [
+        b"".join(encode_varints(values[start:end]) for values in [deltas, *columns])
+        for start, end in zip(starts, ends)
+    ]
+    offsets = np.zeros(len(payloads) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(p) for p in payloads])
+
+    return b"".join(
+        [
+            _HEADER.pack(len(doc_ids), len(payloads), len(columns)),
+            doc_ids[ends - 1].astype("<u4").tobytes(),
+            offsets.tobytes(),
+            *payloads,
+        ]
+    )
+
+
+def _read_skip_table(blob) -> Tuple[int, int, np.ndarray, np.ndarray, memoryview]:
+    blob = memoryview(blob)
+    num_postings, num_blocks, num_columns = _HEADER.unpack_from(blob)
+    pos = _HEADER.size
+    last_doc = np.frombuffer(blob, dtype="<u4", count=num_blocks, offset=pos)
+    pos += 4 * num_blocks
+    offsets = np.frombuffer(blob, dtype="<u4", count=num_blocks + 1, offset=pos)
+    pos += 4 * (num_blocks + 1)
+    return num_postings, num_columns, last_doc, offsets, blob[pos:]
+
+
+def decode_postings(blob) -> Tuple[np.ndarray, ...]:
+    """Decode a whole blob.
+
+    Args:
+        blob: Encoded postings
+
+    Returns:
+        Tuple of document ids followed by each column, as int64 arrays
+    """
+    num_postings, num_columns, _, _, payload = _read_skip_table(blob)
+    width = num_columns + 1
+    values = decode_varints(payload, width * num_postings).astype(np.int64)
+
+    # Each block stores its deltas followed by each of its columns
+    index = np.arange(num_postings)
+    block = index // BLOCK_SIZE
+    block_start = width * block * BLOCK_SIZE + index % BLOCK_SIZE
+    block_len = np.minimum(BLOCK_SIZE, num_postings - block * BLOCK_SIZE)
+    doc_ids = np.cumsum(values[block_start])
+    return (doc_ids,) + tuple(
+        values[block_start + i * block_len] for i in range(1, width)
+    )
+
+
+def iter_blocks(blob) -> Iterator[Tuple[np.ndarray, ...]]:
+    """Decode a blob one block at a time.
+
+    Args:
+        blob: Encoded postings
+
+    Yields:
+        Tuple of document ids followed by each column, for each block
+    """
+    num_postings, num_columns, last_doc, offsets, payload = _read_skip_table(blob)
+    width = num_columns + 1
+    previous = 0
+    for i in range(len(last_doc)):
+        size = min(BLOCK_SIZE, num_postings - i * BLOCK_SIZE)
+        values = decode_varints(payload[offsets[i] : offsets[i + 1]], width * size)
+        values = values.astype(np.int64).reshape(width, size)
+        doc_ids = previous + np.cumsum(values[0])
+        previous = int(last_doc[i])
+        yield (doc_ids,) + tuple(values[1:])
+
+
+def encode_positions(positions: np.ndarray, counts: np.ndarray) -> bytes:
+    """Gap-encode the positions of consecutive postings.
+
+    Args:
+        positions: Each posting's increasing positions, concatenated, or
+            MISSING_POSITION for every occurrence in postings without any
+        counts: Number of positions of each posting, at least 1
+
+    Returns:
+        bytes: Encoded positions
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    gaps = np.diff(positions, prepend=0)
+    # Every posting's list starts from its absolute first position, shifted
+    # so that missing positions encode as zeros
+    starts = np.cumsum(counts) - counts
+    gaps[starts] = positions[starts] - MISSING_POSITION
+    return encode_varints(gaps)
+
+
+def missing_positions(count: int) -> bytes:
+    """Encode postings indexed without positions.
+
+    Args:
+        count: Total term frequency of the postings
+
+    Returns:
+        bytes: Encoded positions that decode to MISSING_POSITION
+    """
+    return bytes(count)
+
+
+def decode_positions(data, counts: np.ndarray) -> np.ndarray:
+    """Decode the positions of consecutive postings.
+
+    Args:
+        data: Buffer of encoded positions
+        counts: Number of positions of each posting, at least 1
+
+    Returns:
+        np.ndarray: Each posting's positions, concatenated, as int64
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    gaps = decode_varints(data, int(counts.sum())).astype(np.int64)
+    if not len(gaps):
+        return gaps
+    starts = np.cumsum(counts) - counts
+    gaps[starts] += MISSING_POSITION
+    running = np.cumsum(gaps)
+    # Remove the running sum of the postings before each list
+    return running - np.repeat(running[starts] - gaps[starts], counts)
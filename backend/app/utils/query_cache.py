@@ -0,0 +1,135 @@
+"""
+In-process cache of search responses.
+
+Entries are evicted least recently used first once the cache holds too many
+entries or too many bytes, and expire after a time to live. Every entry
+belongs to an index generation: looking up a newer generation drops the
+whole cache, so results are never served from an index that has changed
+since they were computed.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory held by a JSON-like value, in bytes"""
+    return len(json.dumps(value, default=str))
+
+
+class QueryCache:
+    """LRU cache with a size bound, TTL and generation-based invalidation."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 300.0,
+        sizeof: Callable[[Any], int] = estimate_size,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Create an empty cache.
+
+        Args:
+            max_entries: Entry limit, 0 to disable caching
+            max_bytes: Limit on the estimated size of all values
+            ttl: Seconds an entry stays valid, 0 for no expiry
+            sizeof: Estimates the size of a value in bytes
+            clock: Source of the current time in seconds
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._clock = clock
+        # key -> (value, size, expiry), least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._generation: Optional[int] = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, generation: int) -> Optional[Any]:
+        """Return the cached value of a key, or None.
+
+        Args:
+            key: Cache key
+            generation: Current index generation
+
+        Returns:
+            The value if cached for this generation and not expired
+        """
+        self._check_generation(generation)
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl and entry[2] <= self._clock():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, generation: int, value: Any) -> None:
+        """Cache a value computed from an index generation.
+
+        Args:
+            key: Cache key
+            generation: Index generation the value was computed from
+            value: Value to cache
+        """
+        if not self.max_entries:
+            return
+        self._check_generation(generation)
+        if generation != self._generation:
+            # Computed from an index that has changed since
+            return
+
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, size, self._clock() + self.ttl)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def statistics(self) -> Dict[str, Any]:
+        """Return counters and current usage"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "generation": self._generation,
+        }
+
+    def _check_generation(self, generation: int) -> None:
+        if self._generation is None or generation > self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self.clear()
+            self._generation = generation
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
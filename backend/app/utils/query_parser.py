@@ -0,0 +1,41 @@
+"""
+Search query parsing.
+
+Words in double quotes form a phrase that matching documents must contain
+with the words consecutive and in order. Every word, quoted or not, is
+also a query term ranked by BM25, so a phrase query ranks its matches the
+same way the unquoted query would. A quote without a closing quote is
+ignored.
+"""
+
+import re
+from typing import NamedTuple, Tuple
+from .tokenizer import tokenize
+
+_PHRASE = re.compile(r'"([^"]*)"')
+
+
+class ParsedQuery(NamedTuple):
+    """Distinct query terms in query order, and the phrases among them."""
+
+    terms: Tuple[str, ...]
+    phrases: Tuple[Tuple[str, ...], ...]
+
+
+def parse_query(query: str) -> ParsedQuery:
+    """Split a query into its terms and quoted phrases.
+
+    Phrases of a single term constrain nothing and are dropped, as are
+    repeated phrases.
+
+    Args:
+        query: Search query
+
+    Returns:
+        ParsedQuery: Terms and phrases, hashable so it can key a cache
+    """
+    phrases = (tuple(tokenize(phrase)) for phrase in _PHRASE.findall(query))
+    return ParsedQuery(
+        terms=tuple(dict.fromkeys(tokenize(query))),
+        phrases=tuple(dict.fromkeys(p for p in phrases if len(p) > 1)),
+    )
@@ -0,0 +1,33 @@
+from typing import List, NamedTuple, Tuple
+import numpy as np
+
+
+class PostingList(NamedTuple):
+    """Scored postings of one query term, sorted by document id."""
+
+    doc_ids: np.ndarray
+    scores: np.ndarray
+
+
+def top_k(
+    docs: np.ndarray, scores: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the k best (docs, scores), best first, ties by document id"""
+    candidates = np.arange(len(scores))
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    order = candidates[np.lexsort((docs[candidates], -scores[candidates]))]
+    return docs[order], scores[order]
+
+
+def accumulate(lists: List[PostingList]) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum the scores of every posting per document, returning (docs, scores)"""
+    doc_ids = np.concatenate([p.doc_ids for p in lists])
+    weights = np.concatenate([p.scores for p in lists])
+    # A dense accumulator avoids sorting postings unless ids are sparse
+    if doc_ids.max() < 4 * len(doc_ids):
+        scores = np.bincount(doc_ids, weights=weights)
+        docs = np.flatnonzero(scores)
+        return docs, scores[docs]
+    docs, inverse = np.unique(doc_ids, return_inverse=True)
+    return docs, np.bincount(inverse, weights=weights)
@@ -1,5 +1,8 @@
-from typing import Dict, Optional
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from collections import deque
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
+import heapq
 import time
 import asyncio
 
@@ -119,3 +122,139 @@ class RateLimiter:
             datetime: Timestamp of last request
         """
         return self.last_request_time.get(domain)
+
+
+class HostScheduler:
+    """Per-host URL queues dispatched in order of host ready time.
+
+    Each host has its own FIFO queue, and a min-heap holds the time at which
+    every idle host with queued URLs may be fetched again. `get` always hands
+    out a URL from the host that is ready soonest, so a slow or rate-limited
+    host never holds up the others. A host has at most one request in flight:
+    it leaves the heap when a URL is dispatched and returns on `release`.
+    """
+
+    def __init__(self, requests_per_second: float = 1.0):
+        """Initialize scheduler.
+
+        Args:
+            requests_per_second: Maximum requests per second for each host
+        """
+        self.min_interval = 1.0 / requests_per_second
+        self._queues: Dict[str, Deque[str]] = {}
+        self._ready: List[Tuple[float, str]] = []
+        self._scheduled: Set[str] = set()
+        self._busy: Set[str] = set()
+        self._next_time: Dict[str, float] = {}
+        self._size = 0
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[str]:
+        for queue in self._queues.values():
+            yield from queue
+
+    def __contains__(self, url: str) -> bool:
+        queue = self._queues.get(self._host(url))
+        return queue is not None and url in queue
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlparse(url).netloc
+
+    def _schedule(self, host: str) -> None:
+        if host in self._busy or host in self._scheduled or host not in self._queues:
+            return
+        heapq.heappush(self._ready, (self._next_time.get(host, 0.0), host))
+        self._scheduled.add(host)
+        self._wakeup.set()
+
+    def put(self, url: str) -> None:
+        """Queue a URL behind earlier URLs for the same host.
+
+        Args:
+            url: URL to queue
+        """
+        host = self._host(url)
+        self._queues.setdefault(host, deque()).append(url)
+        self._size += 1
+        self._schedule(host)
+
+    def extend(self, urls: Iterable[str]) -> None:
+        """Queue several URLs.
+
+        Args:
+            urls: URLs to queue
+        """
+        for url in urls:
+            self.put(url)
+
+    def get_nowait(self) -> Optional[str]:
+        """Dispatch a URL whose host may be fetched now.
+
+        Returns:
+            URL to fetch, or None if no host is ready
+        """
+        if not self._ready or self._ready[0][0] > time.monotonic():
+            return None
+
+        _, host = heapq.heappop(self._ready)
+        self._scheduled.discard(host)
+        queue = self._queues[host]
+        url = queue.popleft()
+        if not queue:
+            del self._queues[host]
+        self._size -= 1
+
+        self._busy.add(host)
+        self._next_time[host] = time.monotonic() + self.min_interval
+        return url
+
+    async def get(self) -> Optional[str]:
+        """Wait for a URL whose host may be fetched now.
+
+        Returns:
+            URL to fetch, or None once nothing is queued or in flight
+        """
+        while True:
+            url = self.get_nowait()
+            if url is not None:
+                return url
+
+            if self._ready:
+                timeout = self._ready[0][0] - time.monotonic()
+            elif self._busy:
+                timeout = None
+            else:
+                return None
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, url: str) -> None:
+        """Mark the fetch of a dispatched URL as finished.
+
+        Args:
+            url: URL previously returned by get
+        """
+        host = self._host(url)
+        self._busy.discard(host)
+        self._schedule(host)
+        # Waiters may be waiting on the last in-flight fetch to finish
+        self._wakeup.set()
+
+    def get_wait_time(self, host: str) -> float:
+        """Get time to wait before the host may be fetched again.
+
+        Args:
+            host: Host to check wait time for
+
+        Returns:
+            float: Seconds to wait
+        """
+        return max(0.0, self._next_time.get(host, 0.0) - time.monotonic())
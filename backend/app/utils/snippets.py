@@ -0,0 +1,137 @@
+"""
+Query-biased snippets from a precomputed passage index.
+
+At index time build_passage_index splits a document's text into passages at
+sentence boundaries, no longer than PASSAGE_LENGTH characters, and records
+a hash of each distinct term in each passage. At query time
+passage_snippet finds the passage holding the most query terms with a few
+vectorized lookups and slices it out of the stored text, so the text is
+never lowercased or searched.
+
+An index is a small blob:
+
+    header   uint32 num_passages, uint32 num_entries
+    starts   uint32[num_passages]    character offset of each passage
+    counts   uint16[num_passages]    distinct terms in each passage
+    hashes   uint16[num_entries]     term hashes, grouped by passage
+
+Hashes are 16 bits to keep the index small. A query term colliding with
+another term of the same passage only makes that passage look slightly
+better, so collisions cost snippet quality, never correctness.
+"""
+
+import re
+import struct
+import zlib
+from typing import List
+import numpy as np
+from .tokenizer import tokenize
+
+PASSAGE_LENGTH = 200
+
+_HEADER = struct.Struct("<II")
+# Sentence-ending punctuation followed by whitespace, or line breaks
+_BOUNDARY = re.compile(r"[.!?]+\s+|\n+")
+
+
+def term_hash(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8")) & 0xFFFF
+
+
+def passage_starts(text: str, max_length: int = PASSAGE_LENGTH) -> List[int]:
+    """Pack consecutive sentences into passages of at most max_length.
+
+    Sentences longer than max_length are broken at whitespace.
+
+    Args:
+        text: Document text
+        max_length: Longest passage in characters
+
+    Returns:
+        Character offset of each passage
+    """
+    if not text:
+        return []
+    boundaries = [m.end() for m in _BOUNDARY.finditer(text) if m.end() < len(text)]
+    starts = [0]
+    for start, end in zip([0] + boundaries, boundaries + [len(text)]):
+        if end - starts[-1] <= max_length:
+            # The sentence still fits in the current passage
+            continue
+        if start > starts[-1]:
+            starts.append(start)
+        while end - starts[-1] > max_length:
+            cut = text.rfind(" ", starts[-1] + 1, starts[-1] + max_length)
+            starts.append(cut if cut != -1 else starts[-1] + max_length)
+    return starts
+
+
+def build_passage_index(text: str, max_length: int = PASSAGE_LENGTH) -> bytes:
+    """Build the passage index of a document.
+
+    Args:
+        text: Document text, exactly as stored
+        max_length: Longest passage in characters
+
+    Returns:
+        bytes: Encoded index
+    """
+    starts = passage_starts(text, max_length)
+    hashes = []
+    counts = []
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        passage_hashes = {term_hash(term) for term in tokenize(text[start:end])}
+        counts.append(len(passage_hashes))
+        hashes.extend(sorted(passage_hashes))
+    return b"".join(
+        [
+            _HEADER.pack(len(starts), len(hashes)),
+            np.asarray(starts, dtype="<u4").tobytes(),
+            np.asarray(counts, dtype="<u2").tobytes(),
+            np.asarray(hashes, dtype="<u2").tobytes(),
+        ]
+    )
+
+
+def passage_snippet(
+    text: str, index: bytes, query_terms: List[str], max_length: int = PASSAGE_LENGTH
+) -> str:
+    """Return the passage containing the most query terms.
+
+    Ties go to the earliest passage, and without any matching passage the
+    snippet is the start of the text.
+
+    Args:
+        text: Document text the index was built from
+        index: Passage index of the text
+        query_terms: Tokenized query terms
+        max_length: Length of the snippet in characters
+
+    Returns:
+        str: Snippet, with "..." where the text was cut
+    """
+    num_passages, num_entries = _HEADER.unpack_from(index)
+    pos = _HEADER.size
+    starts = np.frombuffer(index, dtype="<u4", count=num_passages, offset=pos)
+    pos += starts.nbytes
+    counts = np.frombuffer(index, dtype="<u2", count=num_passages, offset=pos)
+    pos += counts.nbytes
+    hashes = np.frombuffer(index, dtype="<u2", count=num_entries, offset=pos)
+
+    start = 0
+    if num_passages:
+        query = np.array([term_hash(term) for term in query_terms], dtype="<u2")
+        entry_passage = np.repeat(np.arange(num_passages), counts)
+        matches = np.bincount(
+            entry_passage[np.isin(hashes, query)], minlength=num_passages
+        )
+        if matches.max() > 0:
+            start = int(starts[np.argmax(matches)])
+
+    end = min(len(text), start + max_length)
+    snippet = text[start:end].strip()
+    if start > 0:
+        snippet = "..." + snippet
+    if end < len(text):
+        snippet = snippet + "..."
+    return snippet
@@ -16,6 +16,13 @@ def get_token_frequencies(tokens: List[str]) -> Dict[str, int]:
     return freq
 
 
+def get_token_positions(tokens: List[str]) -> Dict[str, List[int]]:
+    positions = {}
+    for position, token in enumerate(tokens):
+        positions.setdefault(token, []).append(position)
+    return positions
+
+
 def process_text(text: str) -> Dict[str, int]:
     tokens = tokenize(text)
     return get_token_frequencies(tokens)
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark for the crawler's HTML parser backends.
+
+Measures pages/sec of parse_page for every backend over a corpus of saved
+pages. Save a corpus first, then benchmark it:
+
+    python -m benchmarks.parser_benchmark --save corpus https://www.ics.uci.edu ...
+    python -m benchmarks.parser_benchmark corpus
+"""
+
+import argparse
+import hashlib
+import os
+import time
+from typing import List, Tuple
+import httpx
+from app.utils.page_parser import PARSER_BACKENDS, parse_page
+
+# Saved pages record the URL they came from on their first line
+URL_PREFIX = "<!-- url: "
+
+
+def save_pages(corpus_dir: str, urls: List[str]) -> None:
+    """Fetch pages and store them in the corpus directory"""
+    os.makedirs(corpus_dir, exist_ok=True)
+    with httpx.Client(timeout=30.0, follow_redirects=True, verify=False) as client:
+        for url in urls:
+            try:
+                response = client.get(url)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                print(f"Skipping {url}: {e}")
+                continue
+
+            name = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+            with open(os.path.join(corpus_dir, f"{name}.html"), "w") as f:
+                f.write(f"{URL_PREFIX}{url} -->\n{response.text}")
+            print(f"Saved {url}")
+
+
+def load_pages(corpus_dir: str) -> List[Tuple[str, str]]:
+    """Load (url, html) pairs from the corpus directory"""
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(corpus_dir, name), errors="replace") as f:
+            html = f.read()
+        url = "https://www.ics.uci.edu/"
+        first_line, _, rest = html.partition("\n")
+        if first_line.startswith(URL_PREFIX):
+            url = first_line[len(URL_PREFIX) :].removesuffix(" -->")
+            html = rest
+        pages.append((url, html))
+    return pages
+
+
+def benchmark(pages: List[Tuple[str, str]], backend: str, rounds: int) -> float:
+    """Return pages parsed per second by a backend"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for url, html in pages:
+            parse_page(url, html, backend)
+    return len(pages) * rounds / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", help="Directory of saved .html pages")
+    parser.add_argument("--save", nargs="+", metavar="URL", help="Fetch pages first")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=list(PARSER_BACKENDS))
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.corpus, args.save)
+
+    pages = load_pages(args.corpus)
+    if not pages:
+        parser.error(f"No .html pages found in {args.corpus}")
+
+    size_mb = sum(len(html) for _, html in pages) / 1e6
+    print(f"Corpus: {len(pages)} pages, {size_mb:.1f} MB, {args.rounds} rounds")
+    for backend in args.backends:
+        try:
+            # Warm up imports and caches outside the timed loop
+            parse_page(*pages[0], backend)
+        except ImportError as e:
+            print(f"{backend:>6}: unavailable ({e})")
+            continue
+        print(f"{backend:>6}: {benchmark(pages, backend, args.rounds):8.1f} pages/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from app.database.indexer import index_documents
+from app.database.models import Base, Document
+from app.database.segmented_index import SegmentDocument
+from app.utils.tokenizer import get_token_positions, process_text, tokenize
+
+PAGES = {
+    "https://ics.uci.edu/crawler": "web crawler crawler politeness",
+    "https://ics.uci.edu/search": "search engine ranking with bm25 and a crawler",
+    "https://ics.uci.edu/other": "unrelated page about campus parking",
+    "https://ics.uci.edu/unicode": "café crawler résumé",
+    "https://ics.uci.edu/engine": "a search engine for the crawler",
+    "https://ics.uci.edu/politeness": "crawler politeness and robots",
+    "https://ics.uci.edu/parking": "parking permits for the engine lot",
+}
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, class_=AsyncSession)() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def corpus(db):
+    """Crawled documents of PAGES, in id order, not yet indexed"""
+    docs = [
+        Document(url=url, title=url.rsplit("/", 1)[1], content=text, is_crawled=True)
+        for url, text in PAGES.items()
+    ]
+    db.add_all(docs)
+    await db.flush()
+    corpus = [
+        SegmentDocument(
+            doc.id,
+            doc.url,
+            doc.title,
+            doc.content,
+            process_text(doc.content),
+            term_positions=get_token_positions(tokenize(doc.content)),
+        )
+        for doc in docs
+    ]
+    await db.commit()
+    return corpus
+
+
+@pytest_asyncio.fixture
+async def documents(db, corpus):
+    """Documents of PAGES, indexed in the database"""
+    await index_documents(
+        db,
+        {doc.doc_id: doc.term_frequencies for doc in corpus},
+        {doc.doc_id: doc.term_positions for doc in corpus},
+    )
+    await db.commit()
+    return corpus
@@ -0,0 +1,33 @@
+from app.utils.bloom_filter import ScalableBloomFilter
+
+
+def test_no_false_negatives_across_slices():
+    bloom = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+    urls = [f"https://ics.uci.edu/{i}" for i in range(1000)]
+
+    bloom.update(urls)
+
+    assert len(bloom.slices) > 1
+    assert all(url in bloom for url in urls)
+
+
+def test_false_positive_rate_stays_near_target():
+    bloom = ScalableBloomFilter(initial_capacity=1000, error_rate=0.01)
+    bloom.update(f"https://ics.uci.edu/{i}" for i in range(5000))
+
+    false_positives = sum(f"https://cs.uci.edu/{i}" in bloom for i in range(10000))
+
+    assert false_positives / 10000 < 0.02
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "db.seen")
+    bloom = ScalableBloomFilter(initial_capacity=10, error_rate=0.01)
+    bloom.update(f"https://ics.uci.edu/{i}" for i in range(50))
+
+    bloom.save(path)
+    loaded = ScalableBloomFilter.load(path)
+
+    assert len(loaded) == len(bloom)
+    assert len(loaded.slices) == len(bloom.slices)
+    assert all(f"https://ics.uci.edu/{i}" in loaded for i in range(50))
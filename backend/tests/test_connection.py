@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.api.search import SearchService
+from app.database.connection import create_tables
+from app.database.crawl_writer import CrawlWriter
+from app.database.frontier import PersistentFrontier
+from app.database.models import Base, Document, DocumentRelationship
+
+# Columns that databases created before they were added do not have
+OLD_SCHEMA_MISSING = {
+    "inverted_index": ["positions"],
+}
+
+
+async def make_old_schema(engine):
+    for table, names in OLD_SCHEMA_MISSING.items():
+        for name in names:
+            async with engine.begin() as conn:
+                await conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {name}")
+
+
+async def columns(engine, table):
+    async with engine.connect() as conn:
+        return await conn.run_sync(
+            lambda sync: {c["name"] for c in inspect(sync).get_columns(table)}
+        )
+
+
+@pytest.mark.asyncio
+async def test_create_tables_migrates_old_schema(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.sqlite'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await make_old_schema(engine)
+
+    await create_tables(engine)
+    # Running again on a migrated database changes nothing
+    await create_tables(engine)
+
+    for table, names in OLD_SCHEMA_MISSING.items():
+        assert set(names) <= await columns(engine, table)
+
+    async with async_sessionmaker(engine, class_=AsyncSession)() as db:
+        writer = CrawlWriter(PersistentFrontier(requests_per_second=100.0))
+        await writer.frontier.open(db)
+        writer.add_page(
+            "https://ics.uci.edu/a",
+            "A",
+            "web crawler",
+            [],
+            {"web": 1, "crawler": 1},
+            term_positions={"web": [0], "crawler": [1]},
+        )
+        await writer.flush(db)
+        await db.commit()
+
+        assert await db.scalar(select(Document.url)) == "https://ics.uci.edu/a"
+        response = await SearchService(db).search('"web crawler"')
+        assert response["total_results"] == 1
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_create_tables_deduplicates_links(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.sqlite'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.exec_driver_sql("DROP INDEX idx_document_relationships_link")
+        await conn.execute(
+            Document.__table__.insert(),
+            [
+                {"id": i, "url": url, "title": url, "content": ""}
+                for i, url in [(1, "a"), (2, "b")]
+            ],
+        )
+        # Older versions wrote a row each time a page was crawled
+        await conn.execute(
+            DocumentRelationship.__table__.insert(),
+            [{"source_document_id": 1, "target_document_id": 2}] * 3
+            + [{"source_document_id": 2, "target_document_id": 1}],
+        )
+
+    await create_tables(engine)
+    await create_tables(engine)
+
+    async with engine.connect() as conn:
+        links = await conn.execute(
+            select(
+                DocumentRelationship.source_document_id,
+                DocumentRelationship.target_document_id,
+            )
+        )
+        assert sorted(links.tuples()) == [(1, 2), (2, 1)]
+        indexes = await conn.run_sync(
+            lambda sync: inspect(sync).get_indexes("document_relationships")
+        )
+    assert any(
+        index["name"] == "idx_document_relationships_link" and index["unique"]
+        for index in indexes
+    )
+    await engine.dispose()
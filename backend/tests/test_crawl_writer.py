@@ -0,0 +1,235 @@
+import pytest
+from sqlalchemy import func, select
+from app.api.search import SearchService
+from app.database.crawl_writer import CrawlWriter
+from app.database.frontier import PersistentFrontier
+from app.database.models import (
+    Document,
+    DocumentPassages,
+    DocumentRelationship,
+    FrontierEntry,
+    InvertedIndex,
+)
+from app.database.segmented_index import SegmentedIndex
+from app.utils.page_parser import parse_page
+
+
+@pytest.fixture
+def writer():
+    frontier = PersistentFrontier(requests_per_second=100.0)
+    return CrawlWriter(frontier, batch_size=2, flush_interval=60.0)
+
+
+async def documents(db):
+    rows = await db.execute(select(Document).order_by(Document.id))
+    return {doc.url: doc for doc in rows.scalars()}
+
+
+def test_flush_triggers_on_batch_size(writer):
+    assert not writer.should_flush
+
+    writer.add_page("https://ics.uci.edu/a", "A", "", [], {})
+    assert not writer.should_flush
+
+    writer.add_failure("https://ics.uci.edu/b", "timeout")
+    assert writer.should_flush
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_pages_stubs_and_links(db, writer):
+    await writer.frontier.open(db)
+    await writer.frontier.push(db, ["https://ics.uci.edu/a", "https://ics.uci.edu/b"])
+    writer.add_page(
+        "https://ics.uci.edu/a", "A", "text", ["https://ics.uci.edu/c"], {"text": 1}
+    )
+    writer.add_page(
+        "https://ics.uci.edu/b",
+        "B",
+        "text",
+        ["https://ics.uci.edu/c", "https://ics.uci.edu/d"],
+        {"text": 1},
+    )
+
+    result = await writer.flush(db)
+    await db.commit()
+
+    assert result.crawled == 2
+    assert result.new_urls == ["https://ics.uci.edu/c", "https://ics.uci.edu/d"]
+    assert len(writer) == 0
+
+    docs = await documents(db)
+    assert docs["https://ics.uci.edu/a"].is_crawled
+    assert docs["https://ics.uci.edu/b"].title == "B"
+    assert not docs["https://ics.uci.edu/c"].is_crawled
+
+    links = await db.execute(
+        select(
+            DocumentRelationship.source_document_id,
+            DocumentRelationship.target_document_id,
+        )
+    )
+    assert set(links.tuples()) == {
+        (docs["https://ics.uci.edu/a"].id, docs["https://ics.uci.edu/c"].id),
+        (docs["https://ics.uci.edu/b"].id, docs["https://ics.uci.edu/c"].id),
+        (docs["https://ics.uci.edu/b"].id, docs["https://ics.uci.edu/d"].id),
+    }
+
+    pending = await db.execute(
+        select(FrontierEntry.url).where(FrontierEntry.is_done == False)
+    )
+    assert set(pending.scalars()) == {"https://ics.uci.edu/c", "https://ics.uci.edu/d"}
+
+
+@pytest.mark.asyncio
+async def test_flush_links_known_documents_once(db, writer):
+    await writer.frontier.open(db)
+    urls = ["https://ics.uci.edu/a", "https://ics.uci.edu/b"]
+    await writer.frontier.push(db, urls)
+    writer.add_page(urls[0], "A", "text", [urls[1]], {"text": 1})
+    writer.add_page(urls[1], "B", "text", [urls[0], urls[1]], {"text": 1})
+    await writer.flush(db)
+    await db.commit()
+
+    # A recrawl links the same pages again
+    writer.add_page(urls[0], "A", "text", [urls[1], urls[1]], {"text": 1})
+    result = await writer.flush(db)
+    await db.commit()
+
+    assert result.new_urls == []
+    docs = await documents(db)
+    links = await db.execute(
+        select(
+            DocumentRelationship.source_document_id,
+            DocumentRelationship.target_document_id,
+        )
+    )
+    # Links to documents already known are kept, and self-links are not
+    assert sorted(links.tuples()) == sorted(
+        [(docs[urls[0]].id, docs[urls[1]].id), (docs[urls[1]].id, docs[urls[0]].id)]
+    )
+
+
+@pytest.mark.asyncio
+async def test_flush_marks_existing_documents_failed(db, writer):
+    db.add(Document(url="https://ics.uci.edu/a", title="", content=""))
+    await db.commit()
+    writer.add_failure("https://ics.uci.edu/a", "timeout")
+    writer.add_failure("https://ics.uci.edu/missing", "timeout")
+
+    result = await writer.flush(db)
+    await db.commit()
+
+    docs = await documents(db)
+    assert result.failed == 2
+    assert docs["https://ics.uci.edu/a"].crawl_failed
+    assert docs["https://ics.uci.edu/a"].error_message == "timeout"
+    assert "https://ics.uci.edu/missing" not in docs
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_flush_is_retried(db, writer):
+    await writer.frontier.open(db)
+    writer.add_page(
+        "https://ics.uci.edu/a", "A", "text", ["https://ics.uci.edu/c"], {"text": 1}
+    )
+
+    await writer.flush(db)
+    # The transaction fails after the flush, e.g. on commit
+    await db.rollback()
+    writer.rollback()
+
+    assert len(writer) == 1
+    assert "https://ics.uci.edu/c" not in writer.frontier
+    assert len(writer.frontier) == 0
+
+    result = await writer.flush(db)
+    await db.commit()
+    writer.confirm()
+
+    assert result.new_urls == ["https://ics.uci.edu/c"]
+    assert len(writer.frontier) == 1
+    docs = await documents(db)
+    assert docs["https://ics.uci.edu/a"].is_crawled
+    assert "https://ics.uci.edu/c" in docs
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_results_buffered(db, writer, monkeypatch):
+    await writer.frontier.open(db)
+    writer.add_page(
+        "https://ics.uci.edu/a", "A", "text", ["https://ics.uci.edu/c"], {"text": 1}
+    )
+    writer.add_failure("https://ics.uci.edu/b", "timeout")
+
+    async def fail(db, urls):
+        raise RuntimeError("disk I/O error")
+
+    monkeypatch.setattr(writer.frontier, "complete", fail)
+    with pytest.raises(RuntimeError):
+        await writer.flush(db)
+    await db.rollback()
+
+    assert len(writer) == 2
+    assert "https://ics.uci.edu/c" not in writer.frontier
+    assert len(writer.frontier) == 0
+
+
+@pytest.mark.asyncio
+async def test_publish_writes_pages_to_segments(db, tmp_path):
+    index = SegmentedIndex(str(tmp_path))
+    writer = CrawlWriter(
+        PersistentFrontier(requests_per_second=100.0), batch_size=2, index=index
+    )
+    await writer.frontier.open(db)
+    writer.add_page("https://ics.uci.edu/a", "A", "uci text", [], {"uci": 1, "text": 1})
+
+    result = await writer.flush(db)
+    await db.commit()
+    await writer.publish(result)
+    await index.wait_for_merges()
+
+    assert await db.scalar(select(func.count()).select_from(InvertedIndex)) == 0
+    snapshot = index.snapshot()
+    doc_ids, _, _ = snapshot.postings(snapshot.lookup("uci"))
+    docs = await documents(db)
+    assert doc_ids.tolist() == [docs["https://ics.uci.edu/a"].id]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("segmented", [False, True])
+async def test_snippets_come_from_stored_passages(db, tmp_path, segmented):
+    html = (
+        "<html><head><title>Page</title></head><body>"
+        "<p>The campus has several libraries. " + "Filler sentence. " * 20 + "</p>"
+        "<p>The web crawler respects politeness delays.</p></body></html>"
+    )
+    page = parse_page("https://ics.uci.edu/a", html)
+    index = SegmentedIndex(str(tmp_path)) if segmented else None
+    writer = CrawlWriter(
+        PersistentFrontier(requests_per_second=100.0), batch_size=2, index=index
+    )
+    await writer.frontier.open(db)
+    writer.add_page(
+        "https://ics.uci.edu/a",
+        page.title,
+        page.text,
+        [],
+        page.term_frequencies,
+        page.passages,
+        page.term_positions,
+    )
+
+    result = await writer.flush(db)
+    await db.commit()
+    await writer.publish(result)
+
+    assert await db.scalar(select(func.count()).select_from(DocumentPassages)) == 1
+    service = (
+        SearchService(segment=index.snapshot()) if segmented else SearchService(db)
+    )
+    response = await service.search("crawler politeness")
+    [hit] = response["results"]
+    assert hit["snippet"].startswith("...The web crawler respects")
+    response = await service.search('"crawler respects politeness"')
+    assert response["total_results"] == 1
+    assert (await service.search('"politeness crawler"'))["total_results"] == 0
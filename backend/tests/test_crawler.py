@@ -0,0 +1,135 @@
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from app.api import crawler as crawler_module
+from app.api.crawler import CrawlerService
+from app.config.globals import is_crawler_running
+from app.config.settings import settings
+from app.database.crawl_writer import CrawlWriter
+from app.database.frontier import PersistentFrontier
+from app.database.models import Document, FrontierEntry
+from app.utils.bloom_filter import ScalableBloomFilter
+
+
+class AlwaysHit(ScalableBloomFilter):
+    def __contains__(self, item):
+        return True
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeClient:
+    """Serves pages from a dict instead of fetching them, recording the
+    start and end time of every fetch"""
+
+    def __init__(self, pages, latency=0.0):
+        self.pages = pages
+        self.latency = latency
+        self.fetches = defaultdict(list)
+
+    async def get(self, url):
+        start = time.monotonic()
+        await asyncio.sleep(self.latency)
+        self.fetches[urlparse(url).netloc].append((start, time.monotonic()))
+        return FakeResponse(self.pages.get(url, page()))
+
+    async def aclose(self):
+        pass
+
+
+def page(*links):
+    anchors = "".join(f'<a href="{link}">link</a>' for link in links)
+    return f"<html><head><title>Page</title></head><body>{anchors}</body></html>"
+
+
+@pytest_asyncio.fixture
+async def crawler(db, monkeypatch):
+    monkeypatch.setattr(settings, "CRAWLER_PARSER_PROCESSES", 0)
+    monkeypatch.setattr(settings, "INDEX_SEGMENTS", False)
+    monkeypatch.setattr(settings, "CRAWLER_WORKERS", 4)
+    monkeypatch.setattr(settings, "CRAWLER_DELAY", 0.05)
+
+    @asynccontextmanager
+    async def get_db():
+        yield db
+
+    monkeypatch.setattr(crawler_module, "get_db", get_db)
+    service = CrawlerService()
+    await service.client.aclose()
+    yield service
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_outlinks_filter_hits_reach_frontier_table(crawler, db):
+    crawler.frontier = PersistentFrontier(
+        requests_per_second=100.0, seen_filter=AlwaysHit()
+    )
+    crawler.writer = CrawlWriter(crawler.frontier)
+    await crawler.frontier.open(db)
+    crawler.client = FakeClient({"https://ics.uci.edu/": page("https://ics.uci.edu/a")})
+
+    await crawler._crawl_url("https://ics.uci.edu/")
+    await crawler._flush_writer(force=True)
+
+    queued = (await db.execute(select(FrontierEntry.url))).scalars().all()
+    assert "https://ics.uci.edu/a" in queued
+
+
+async def crawl(crawler, client, seeds):
+    crawler.client = client
+    await crawler.start(seeds)
+    await asyncio.wait_for(crawler._task, timeout=10)
+
+
+@pytest.mark.asyncio
+async def test_workers_drain_frontier_and_stop(crawler, db):
+    hosts = ["ics.uci.edu", "cs.uci.edu", "stat.uci.edu"]
+    urls = [f"https://{host}/{i}" for host in hosts for i in range(3)]
+    client = FakeClient({f"https://{host}/": page(*urls) for host in hosts})
+
+    await crawl(crawler, client, [f"https://{host}/" for host in hosts])
+
+    # Every worker returned on its own once the queue drained
+    assert not crawler._task.cancelled() and not is_crawler_running()
+    assert len(crawler.frontier) == 0
+    assert len(crawler.writer) == 0
+    assert sum(len(fetches) for fetches in client.fetches.values()) == 12
+    crawled = await db.execute(select(Document.url).where(Document.is_crawled))
+    assert set(crawled.scalars()) == set(urls) | {f"https://{h}/" for h in hosts}
+    pending = await db.execute(
+        select(FrontierEntry.url).where(FrontierEntry.is_done == False)
+    )
+    assert pending.first() is None
+
+
+@pytest.mark.asyncio
+async def test_workers_respect_per_host_delay(crawler):
+    hosts = ["ics.uci.edu", "cs.uci.edu"]
+    urls = [f"https://{host}/{i}" for host in hosts for i in range(4)]
+    client = FakeClient({}, latency=0.01)
+
+    await crawl(crawler, client, urls)
+
+    interval = settings.CRAWLER_DELAY
+    for host in hosts:
+        fetches = sorted(client.fetches[host])
+        assert len(fetches) == 4
+        for (start, end), (next_start, _) in zip(fetches, fetches[1:]):
+            # One request in flight per host, and requests spaced by the delay
+            assert next_start >= end
+            assert next_start - start >= interval * 0.99
+    # Hosts are fetched concurrently rather than one after the other
+    first_starts = [min(client.fetches[host])[0] for host in hosts]
+    assert abs(first_starts[0] - first_starts[1]) < interval
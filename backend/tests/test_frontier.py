@@ -0,0 +1,34 @@
+import pytest
+from app.utils.frontier import Frontier
+
+
+@pytest.fixture
+def frontier():
+    return Frontier(requests_per_second=100.0)
+
+
+def test_add_skips_seen_urls(frontier):
+    frontier.mark_seen("https://ics.uci.edu/crawled")
+
+    added = frontier.add_many(
+        [
+            "https://ics.uci.edu/a",
+            "https://ics.uci.edu/a",
+            "https://ics.uci.edu/crawled",
+        ]
+    )
+
+    assert added == ["https://ics.uci.edu/a"]
+    assert len(frontier) == 1
+    assert "https://ics.uci.edu/crawled" in frontier
+
+
+@pytest.mark.asyncio
+async def test_dispatched_urls_stay_seen(frontier):
+    frontier.add("https://ics.uci.edu/a")
+
+    url = await frontier.get()
+    frontier.release(url)
+
+    assert len(frontier) == 0
+    assert not frontier.add(url)
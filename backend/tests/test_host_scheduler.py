@@ -0,0 +1,61 @@
+import pytest
+import asyncio
+import time
+from app.utils.rate_limiter import HostScheduler
+
+
+@pytest.fixture
+def scheduler():
+    return HostScheduler(requests_per_second=10.0)
+
+
+def test_put_tracks_size_and_membership(scheduler):
+    scheduler.extend(["https://ics.uci.edu/a", "https://cs.uci.edu/b"])
+
+    assert len(scheduler) == 2
+    assert "https://ics.uci.edu/a" in scheduler
+    assert "https://ics.uci.edu/b" not in scheduler
+
+
+def test_one_request_in_flight_per_host(scheduler):
+    scheduler.extend(["https://ics.uci.edu/a", "https://ics.uci.edu/b"])
+
+    assert scheduler.get_nowait() == "https://ics.uci.edu/a"
+    assert scheduler.get_nowait() is None
+
+
+def test_ready_hosts_are_not_blocked_by_busy_host(scheduler):
+    scheduler.extend(
+        ["https://ics.uci.edu/a", "https://ics.uci.edu/b", "https://cs.uci.edu/c"]
+    )
+
+    first = scheduler.get_nowait()
+    second = scheduler.get_nowait()
+
+    assert {first, second} == {"https://ics.uci.edu/a", "https://cs.uci.edu/c"}
+
+
+@pytest.mark.asyncio
+async def test_get_waits_for_host_interval(scheduler):
+    scheduler.extend(["https://ics.uci.edu/a", "https://ics.uci.edu/b"])
+
+    first = await scheduler.get()
+    scheduler.release(first)
+    start = time.monotonic()
+    second = await scheduler.get()
+
+    assert second == "https://ics.uci.edu/b"
+    assert time.monotonic() - start >= 0.08
+
+
+@pytest.mark.asyncio
+async def test_get_returns_none_when_drained(scheduler):
+    scheduler.put("https://ics.uci.edu/a")
+    url = await scheduler.get()
+
+    waiter = asyncio.create_task(scheduler.get())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    scheduler.release(url)
+    assert await asyncio.wait_for(waiter, 1.0) is None
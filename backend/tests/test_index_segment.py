@@ -0,0 +1,115 @@
+import os
+import pytest
+import pytest_asyncio
+from app.api.search import SearchService
+from app.database.index_segment import (
+    IndexSegment,
+    MANIFEST_FILE,
+    export_segment,
+    get_segment,
+)
+from app.database.indexer import index_documents
+from app.database.postings_store import compact_postings
+
+
+@pytest_asyncio.fixture
+async def indexed_db(db, corpus):
+    # Part of the index is compacted and part is still in rows
+    for batch in (corpus[:2], corpus[2:]):
+        await compact_postings(db)
+        await index_documents(
+            db,
+            {doc.doc_id: doc.term_frequencies for doc in batch},
+            {doc.doc_id: doc.term_positions for doc in batch},
+        )
+        await db.commit()
+    return db
+
+
+@pytest.mark.asyncio
+async def test_segment_serves_the_same_results(indexed_db, corpus, tmp_path):
+    await export_segment(indexed_db, str(tmp_path))
+
+    with IndexSegment(str(tmp_path)) as segment:
+        assert segment.num_documents == len(corpus)
+        for query in [
+            "crawler",
+            "search crawler",
+            "café",
+            "nonexistent",
+            '"web crawler"',
+            '"crawler résumé" search',
+        ]:
+            expected = await SearchService(indexed_db, proximity_weight=1.0).search(
+                query
+            )
+            actual = await SearchService(segment=segment, proximity_weight=1.0).search(
+                query
+            )
+            assert actual == expected
+
+
+@pytest.mark.asyncio
+async def test_segment_lookup_and_postings(indexed_db, tmp_path):
+    await export_segment(indexed_db, str(tmp_path))
+    segment = IndexSegment(str(tmp_path))
+
+    term = segment.lookup("crawler")
+    doc_ids, frequencies, lengths = segment.postings(term)
+
+    assert segment.lookup("missing") is None
+    assert segment.document_frequency(term) == len(doc_ids) == 5
+    assert frequencies.tolist() == [2, 1, 1, 1, 1]
+    documents = segment.documents(doc_ids.tolist() + [10**6])
+    assert [url for url, _, _ in documents.values()] == [
+        "https://ics.uci.edu/crawler",
+        "https://ics.uci.edu/search",
+        "https://ics.uci.edu/unicode",
+        "https://ics.uci.edu/engine",
+        "https://ics.uci.edu/politeness",
+    ]
+    assert documents[int(doc_ids[2])][2] == "café crawler résumé"
+
+    segment_lengths, unique_terms, norms = segment.document_statistics(doc_ids)
+    assert segment_lengths.tolist() == lengths.tolist()
+    assert unique_terms.tolist() == [3, 8, 3, 6, 4]
+    assert norms[2] == pytest.approx(3**0.5)
+
+    segment.close()
+    # Decoded arrays do not reference the unmapped files
+    assert lengths.tolist() == [4, 8, 3, 6, 4]
+
+
+@pytest.mark.asyncio
+async def test_get_segment_reopens_after_export(indexed_db, tmp_path):
+    assert get_segment(str(tmp_path)) is None
+
+    await export_segment(indexed_db, str(tmp_path))
+    segment = get_segment(str(tmp_path))
+    assert get_segment(str(tmp_path)) is segment
+
+    manifest = tmp_path / MANIFEST_FILE
+    os.utime(manifest, ns=(0, 0))
+    assert get_segment(str(tmp_path)) is not segment
+
+
+@pytest.mark.asyncio
+async def test_reexport_publishes_a_new_generation(indexed_db, corpus, tmp_path):
+    await export_segment(indexed_db, str(tmp_path))
+    first = IndexSegment(str(tmp_path))
+    await export_segment(indexed_db, str(tmp_path))
+    await export_segment(indexed_db, str(tmp_path))
+
+    # The manifest is the only file replaced in place, and the previous
+    # generation is kept for readers that loaded the old manifest
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [MANIFEST_FILE]
+        + [
+            f"{name}.{generation}.bin"
+            for name in ("docs", "positions", "postings", "terms")
+            for generation in (2, 3)
+        ]
+    )
+    with first, IndexSegment(str(tmp_path)) as segment:
+        assert segment.manifest["generation"] == 3
+        assert first.num_documents == segment.num_documents == len(corpus)
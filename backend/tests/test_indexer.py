@@ -0,0 +1,84 @@
+import math
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from app.database.indexer import document_statistics, index_documents
+from app.database.models import (
+    Document,
+    DocumentStats,
+    InvertedIndex,
+    Term,
+    TermStats,
+)
+
+
+async def document_frequencies(db):
+    rows = await db.execute(
+        select(Term.term, TermStats.document_frequency).join(
+            TermStats, TermStats.term_id == Term.id
+        )
+    )
+    return dict(rows.tuples().all())
+
+
+@pytest_asyncio.fixture
+async def doc_ids(db):
+    docs = [
+        Document(url=f"https://ics.uci.edu/{i}", title="", content="", is_crawled=True)
+        for i in range(2)
+    ]
+    db.add_all(docs)
+    await db.flush()
+    ids = [doc.id for doc in docs]
+    await db.commit()
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_index_documents_writes_postings_and_df(db, doc_ids):
+    first, second = doc_ids
+
+    written = await index_documents(
+        db,
+        {first: {"uci": 2, "search": 1}, second: {"uci": 1, "crawler": 3}},
+    )
+    await db.commit()
+
+    assert written == 4
+    assert await document_frequencies(db) == {"uci": 2, "search": 1, "crawler": 1}
+
+    rows = await db.execute(
+        select(InvertedIndex.term_frequency)
+        .join(Term)
+        .where(Term.term == "crawler", InvertedIndex.document_id == second)
+    )
+    assert rows.scalar_one() == 3
+
+
+@pytest.mark.asyncio
+async def test_reindexing_replaces_postings(db, doc_ids):
+    first, second = doc_ids
+    await index_documents(db, {first: {"uci": 1, "search": 1}, second: {"uci": 1}})
+
+    await index_documents(db, {first: {"crawler": 1}})
+    await db.commit()
+
+    assert await document_frequencies(db) == {"uci": 1, "search": 0, "crawler": 1}
+    postings = await db.execute(
+        select(InvertedIndex).where(InvertedIndex.document_id == first)
+    )
+    assert len(postings.scalars().all()) == 1
+
+
+@pytest.mark.asyncio
+async def test_index_documents_stores_document_statistics(db, doc_ids):
+    first, _ = doc_ids
+
+    await index_documents(db, {first: {"uci": 2, "search": 1}})
+    await index_documents(db, {first: {"uci": 3}})
+    await db.commit()
+
+    stats = await db.get(DocumentStats, first)
+    assert (stats.length, stats.unique_terms) == (3, 1)
+    assert stats.norm == pytest.approx(1 + math.log(3))
+    assert document_statistics({"a": 1, "b": 1}).norm == pytest.approx(math.sqrt(2))
@@ -0,0 +1,124 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from app.api.search import SearchService
+from app.database.index_segment import IndexSegment, export_segment
+from app.database.indexer import index_documents
+from app.database.link_analysis import LinkGraph, compute_pagerank
+from app.database.models import Document, DocumentRank, DocumentRelationship
+from app.database.segmented_index import SegmentDocument
+from app.database.sharded_index import ShardedIndex
+
+
+@pytest_asyncio.fixture
+async def doc_ids(db):
+    docs = [
+        Document(url=f"https://ics.uci.edu/{name}", title=name, content=name)
+        for name in ("hub", "a", "b", "c")
+    ]
+    db.add_all(docs)
+    await db.flush()
+    hub, a, b, c = ids = [doc.id for doc in docs]
+    db.add_all(
+        DocumentRelationship(source_document_id=source, target_document_id=target)
+        for source, target in [(a, hub), (b, hub), (c, hub), (hub, a)]
+    )
+    # Both pages match the query equally well
+    await index_documents(db, {hub: {"uci": 1}, c: {"uci": 1}})
+    await db.commit()
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_compute_pagerank_stores_scores(db, doc_ids):
+    result = await compute_pagerank(db)
+
+    assert result["documents"] == 4
+    assert result["links"] == 4
+    rows = await db.execute(select(DocumentRank.document_id, DocumentRank.pagerank))
+    scores = dict(rows.tuples().all())
+    hub, a, b, c = doc_ids
+    assert scores[hub] > scores[a] > scores[b]
+
+
+async def _stored_pagerank(db):
+    rows = await db.execute(select(DocumentRank.document_id, DocumentRank.pagerank))
+    scores = dict(rows.tuples().all())
+    total = sum(scores.values())
+    return {doc_id: score / total for doc_id, score in scores.items()}
+
+
+@pytest.mark.asyncio
+async def test_incremental_pagerank_matches_full_computation(db, doc_ids):
+    hub, a, b, c = doc_ids
+    graph = LinkGraph()
+    await compute_pagerank(db, tolerance=1e-10, graph=graph)
+
+    # A new page linked only from b leaves the hub's side of the graph alone
+    new = Document(url="https://ics.uci.edu/new", title="new", content="new")
+    db.add(new)
+    await db.flush()
+    db.add(DocumentRelationship(source_document_id=b, target_document_id=new.id))
+    await db.commit()
+
+    result = await compute_pagerank(db, tolerance=1e-10, incremental=True, graph=graph)
+    incremental = await _stored_pagerank(db)
+    await compute_pagerank(db, tolerance=1e-10)
+    full = await _stored_pagerank(db)
+
+    assert result["documents"] == 5
+    assert result["links"] == 5
+    assert 0 < result["updated"] < 5
+    assert incremental == pytest.approx(full, abs=1e-6)
+
+
+@pytest.mark.asyncio
+async def test_incremental_pagerank_starts_from_stored_scores(db, doc_ids):
+    first = await compute_pagerank(db, tolerance=1e-10)
+    # Nothing changed, so the converged scores need no update
+    result = await compute_pagerank(db, incremental=True)
+
+    assert first["updated"] == 4
+    assert result["updated"] == 0
+
+
+@pytest.mark.asyncio
+async def test_search_blends_pagerank(db, doc_ids):
+    hub, _, _, c = doc_ids
+    await compute_pagerank(db)
+
+    plain = await SearchService(db).search("uci")
+    blended = await SearchService(db, pagerank_weight=1.0).search("uci")
+
+    assert plain["results"][0]["score"] == plain["results"][1]["score"]
+    assert blended["results"][0]["url"] == "https://ics.uci.edu/hub"
+    assert blended["results"][0]["score"] > blended["results"][1]["score"]
+
+
+@pytest.mark.asyncio
+async def test_segment_searches_blend_pagerank(db, doc_ids, tmp_path):
+    hub, _, _, c = doc_ids
+    await compute_pagerank(db)
+    expected = await SearchService(db, pagerank_weight=1.0).search("uci")
+
+    await export_segment(db, str(tmp_path / "segment"))
+    sharded = ShardedIndex(str(tmp_path / "shards"), 2)
+    sharded.add_documents(
+        [
+            SegmentDocument(doc_id, url, url, url, {"uci": 1})
+            for doc_id, url in [
+                (hub, "https://ics.uci.edu/hub"),
+                (c, "https://ics.uci.edu/c"),
+            ]
+        ]
+    )
+    with IndexSegment(str(tmp_path / "segment")) as segment:
+        for index in (segment, sharded.snapshot()):
+            response = await SearchService(
+                db, segment=index, pagerank_weight=1.0
+            ).search("uci")
+            assert [r["score"] for r in response["results"]] == [
+                r["score"] for r in expected["results"]
+            ]
+            assert response["results"][0]["url"] == "https://ics.uci.edu/hub"
+    sharded.close()
@@ -0,0 +1,66 @@
+import multiprocessing
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from app.utils.page_parser import PARSER_BACKENDS, parse_page, normalize_url
+from app.utils.tokenizer import tokenize
+
+SAMPLE_HTML = """
+<html>
+    <head><title>Test Page</title><script>var x = 1;</script></head>
+    <body>
+        <p>Hello   world</p>
+        <a href="/page1#top">Link 1</a>
+        <a href="https://cs.uci.edu/page2/">Link 2</a>
+        <a href="https://ics.uci.edu/page1">Duplicate</a>
+        <a href="https://example.com">External Link</a>
+        <a href="mailto:someone@uci.edu">Mail</a>
+    </body>
+</html>
+"""
+
+
+@pytest.mark.parametrize("backend", list(PARSER_BACKENDS))
+def test_parse_page_extracts_title_text_and_uci_links(backend):
+    pytest.importorskip(backend)
+    page = parse_page("https://ics.uci.edu/test", SAMPLE_HTML, backend)
+
+    assert page.title == "Test Page"
+    assert "Hello world" in page.text
+    assert "var x" not in page.text
+    assert page.term_frequencies["hello"] == 1
+    words = tokenize(page.text)
+    assert page.term_positions["world"] == [words.index("world")]
+    assert page.term_frequencies == {t: len(p) for t, p in page.term_positions.items()}
+    assert page.outlinks == ["https://ics.uci.edu/page1", "https://cs.uci.edu/page2"]
+
+
+@pytest.mark.parametrize("backend", list(PARSER_BACKENDS))
+def test_parse_page_falls_back_to_url_for_title(backend):
+    pytest.importorskip(backend)
+    page = parse_page(
+        "https://ics.uci.edu/test", "<html><title></title></html>", backend
+    )
+
+    assert page.title == "https://ics.uci.edu/test"
+
+
+def test_normalize_url_keeps_significant_queries():
+    assert normalize_url("https://ICS.uci.edu/a/?utm=x") == "https://ics.uci.edu/a"
+    assert (
+        normalize_url("https://ics.uci.edu/view.php?id=3")
+        == "https://ics.uci.edu/view.php?id=3"
+    )
+
+
+def test_parse_page_runs_in_process_pool():
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        page = pool.submit(parse_page, "https://ics.uci.edu/test", SAMPLE_HTML).result()
+
+    assert page.title == "Test Page"
+
+
+def test_parse_page_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        parse_page("https://ics.uci.edu/test", SAMPLE_HTML, "regex")
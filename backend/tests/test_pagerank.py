@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from app.utils.pagerank import pagerank, update_pagerank
+
+
+def test_cycle_ranks_nodes_equally():
+    scores, _ = pagerank(np.array([0, 1, 2]), np.array([1, 2, 0]), 3)
+
+    assert scores == pytest.approx([1 / 3] * 3)
+
+
+def test_linked_nodes_rank_higher():
+    # Every node links to 0, which links back to 1
+    scores, iterations = pagerank(np.array([1, 2, 3, 0]), np.array([0, 0, 0, 1]), 4)
+
+    assert scores.sum() == pytest.approx(1.0)
+    assert scores[0] > scores[1] > scores[2] == pytest.approx(scores[3])
+    assert iterations < 100
+
+
+def test_dangling_rank_is_spread_and_duplicates_ignored():
+    # Node 1 has no out-links; the repeated edge and self-link do not count
+    scores, _ = pagerank(np.array([0, 0, 0]), np.array([1, 1, 0]), 3)
+    expected, _ = pagerank(np.array([0]), np.array([1]), 3)
+
+    assert scores.sum() == pytest.approx(1.0)
+    assert scores == pytest.approx(expected)
+    assert scores[1] > scores[0] == pytest.approx(scores[2])
+
+
+def test_invalid_damping():
+    with pytest.raises(ValueError):
+        pagerank(np.array([0]), np.array([1]), 2, damping=1.0)
+
+
+def _random_graph(rng, num_nodes, num_edges):
+    return rng.integers(0, num_nodes, num_edges), rng.integers(0, num_nodes, num_edges)
+
+
+def test_unnormalized_scores_are_proportional():
+    rng = np.random.default_rng(0)
+    sources, targets = _random_graph(rng, 50, 120)
+    scores, _ = pagerank(sources, targets, 50, tolerance=1e-12)
+    unnormalized, _ = pagerank(sources, targets, 50, tolerance=1e-12, normalize=False)
+
+    assert unnormalized / unnormalized.sum() == pytest.approx(scores, abs=1e-10)
+
+
+def test_update_matches_recomputation_after_growth():
+    rng = np.random.default_rng(1)
+    sources, targets = _random_graph(rng, 200, 600)
+    previous, _ = pagerank(sources, targets, 200, tolerance=1e-12, normalize=False)
+
+    # Ten new nodes and some new links, a few between existing nodes
+    new_sources, new_targets = _random_graph(rng, 210, 40)
+    sources = np.concatenate([sources, new_sources])
+    targets = np.concatenate([targets, new_targets])
+    expected, _ = pagerank(sources, targets, 210, tolerance=1e-12)
+    scores, rounds, changed = update_pagerank(
+        sources, targets, 210, np.concatenate([previous, np.zeros(10)]), tolerance=1e-12
+    )
+
+    assert scores / scores.sum() == pytest.approx(expected, abs=1e-9)
+    assert 0 < rounds < 1000
+    assert changed[200:].all()
+
+
+def test_update_leaves_unaffected_nodes_alone():
+    # Two separate chains; only the second one gets a new link
+    sources, targets = np.array([0, 1, 3, 4]), np.array([1, 2, 4, 5])
+    previous, _ = pagerank(sources, targets, 6, tolerance=1e-12, normalize=False)
+    scores, _, changed = update_pagerank(
+        np.append(sources, 5), np.append(targets, 3), 6, previous, tolerance=1e-12
+    )
+
+    assert changed.tolist() == [False, False, False, True, True, True]
+    assert scores[:3] == pytest.approx(previous[:3])
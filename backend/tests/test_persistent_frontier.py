@@ -0,0 +1,76 @@
+import pytest
+from app.database.models import Document
+from app.database.frontier import PersistentFrontier
+from app.utils.bloom_filter import ScalableBloomFilter
+
+
+def new_frontier(batch_size=2):
+    return PersistentFrontier(requests_per_second=100.0, batch_size=batch_size)
+
+
+@pytest.mark.asyncio
+async def test_push_skips_urls_already_in_table(db):
+    frontier = new_frontier()
+    await frontier.open(db)
+    await frontier.push(db, ["https://ics.uci.edu/a"])
+    await db.commit()
+
+    # A fresh frontier has no in-memory seen set, so the table decides
+    resumed = new_frontier()
+    added = await resumed.push(db, ["https://ics.uci.edu/a", "https://ics.uci.edu/b"])
+
+    assert added == ["https://ics.uci.edu/b"]
+
+
+@pytest.mark.asyncio
+async def test_resume_pages_pending_urls_in_batches(db):
+    frontier = new_frontier()
+    await frontier.open(db)
+    await frontier.push(db, [f"https://ics.uci.edu/{i}" for i in range(5)])
+    await frontier.complete(db, ["https://ics.uci.edu/0"])
+    await db.commit()
+
+    resumed = new_frontier()
+    pending = await resumed.open(db)
+
+    assert pending == 4
+    assert list(resumed) == ["https://ics.uci.edu/1", "https://ics.uci.edu/2"]
+
+    # Dispatching drains the batch below half, so the next one is paged in
+    resumed.queue.get_nowait()
+    assert await resumed.refill(db) == 2
+    assert len(resumed) == 3
+
+
+@pytest.mark.asyncio
+async def test_open_seeds_from_documents_once(db):
+    db.add_all(
+        [
+            Document(
+                url="https://ics.uci.edu/done", title="", content="", is_crawled=True
+            ),
+            Document(url="https://ics.uci.edu/todo", title="", content=""),
+        ]
+    )
+    await db.commit()
+
+    assert await PersistentFrontier.has_pending(db)
+
+    frontier = new_frontier()
+    assert await frontier.open(db) == 1
+    assert list(frontier) == ["https://ics.uci.edu/todo"]
+
+
+@pytest.mark.asyncio
+async def test_filter_hits_are_confirmed_against_table(db):
+    class AlwaysHit(ScalableBloomFilter):
+        def __contains__(self, item):
+            return True
+
+    frontier = PersistentFrontier(requests_per_second=100.0, seen_filter=AlwaysHit())
+    await frontier.open(db)
+    await frontier.push(db, ["https://ics.uci.edu/a"])
+
+    added = await frontier.push(db, ["https://ics.uci.edu/a", "https://ics.uci.edu/b"])
+
+    assert added == ["https://ics.uci.edu/b"]
@@ -0,0 +1,75 @@
+import numpy as np
+from app.utils.positional import (
+    PositionalPostings,
+    min_distances,
+    phrase_documents,
+    take_positions,
+)
+from app.utils.tokenizer import get_token_positions, tokenize
+
+DOCUMENTS = {
+    1: "new york is not york new",
+    2: "the new york times",
+    3: "york and new jersey",
+    4: "new new york",
+    6: "nothing to see",
+}
+
+
+def postings(term):
+    doc_ids, frequencies, positions = [], [], []
+    for doc_id, text in DOCUMENTS.items():
+        term_positions = get_token_positions(tokenize(text)).get(term)
+        if term_positions:
+            doc_ids.append(doc_id)
+            frequencies.append(len(term_positions))
+            positions.extend(term_positions)
+    return PositionalPostings(
+        np.array(doc_ids), np.array(frequencies), np.array(positions)
+    )
+
+
+def test_take_positions_selects_and_reorders_lists():
+    positions = np.array([1, 2, 3, 10, 20, 21])
+    counts = np.array([3, 1, 2])
+
+    assert take_positions(positions, counts, np.array([2, 0])).tolist() == [
+        20,
+        21,
+        1,
+        2,
+        3,
+    ]
+    assert take_positions(positions, counts, np.array([], dtype=int)).tolist() == []
+
+
+def test_phrase_documents_need_consecutive_terms_in_order():
+    new, york = postings("new"), postings("york")
+
+    assert phrase_documents([new, york]).tolist() == [1, 2, 4]
+    assert phrase_documents([york, new]).tolist() == [1]
+    assert phrase_documents([new, york, postings("times")]).tolist() == [2]
+    assert phrase_documents([new, new]).tolist() == [4]
+    assert phrase_documents([postings("new"), postings("nothing")]).tolist() == []
+
+
+def test_min_distances_of_two_terms():
+    docs, distances = min_distances(postings("york"), postings("jersey"))
+    assert docs.tolist() == [3]
+    assert distances.tolist() == [3]
+
+    docs, distances = min_distances(postings("new"), postings("york"))
+    assert docs.tolist() == [1, 2, 3, 4]
+    assert distances.tolist() == [1, 1, 2, 1]
+
+
+def test_postings_without_positions_are_skipped():
+    new, york = postings("new"), postings("york")
+    # The second document was indexed without positions
+    missing = np.repeat(new.doc_ids == 2, new.frequencies)
+    new = new._replace(positions=np.where(missing, -1, new.positions))
+
+    assert phrase_documents([new, york]).tolist() == [1, 4]
+    docs, distances = min_distances(new, york)
+    assert docs.tolist() == [1, 3, 4]
+    assert distances.tolist() == [1, 2, 1]
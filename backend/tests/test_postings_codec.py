@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from app.utils.postings_codec import (
+    BLOCK_SIZE,
+    MISSING_POSITION,
+    decode_positions,
+    decode_postings,
+    decode_varints,
+    encode_positions,
+    encode_postings,
+    encode_varints,
+    iter_blocks,
+    missing_positions,
+)
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 16383, 16384, 2**32 - 1, 2**63], dtype=np.uint64)
+
+    encoded = encode_varints(values)
+
+    assert len(encode_varints(np.array([127]))) == 1
+    assert len(encode_varints(np.array([128]))) == 2
+    assert decode_varints(encoded, len(values)).tolist() == values.tolist()
+
+
+def test_truncated_varints_are_rejected():
+    with pytest.raises(ValueError):
+        decode_varints(encode_varints(np.array([300]))[:1], 1)
+
+
+def test_postings_round_trip():
+    rng = np.random.default_rng(0)
+    doc_ids = np.sort(rng.choice(10**6, size=3 * BLOCK_SIZE + 5, replace=False))
+    frequencies = rng.zipf(2.0, size=len(doc_ids))
+    lengths = rng.integers(1, 5000, size=len(doc_ids))
+
+    blob = encode_postings(doc_ids, frequencies, lengths)
+    decoded = decode_postings(blob)
+
+    for actual, expected in zip(decoded, (doc_ids, frequencies, lengths)):
+        assert actual.tolist() == expected.tolist()
+    assert len(blob) < doc_ids.nbytes
+
+
+def test_iter_blocks_matches_full_decode():
+    doc_ids = np.arange(1, 2 * BLOCK_SIZE + 10) * 3
+    frequencies = np.arange(len(doc_ids)) % 7 + 1
+
+    blocks = list(iter_blocks(encode_postings(doc_ids, frequencies)))
+
+    assert [len(docs) for docs, _ in blocks] == [BLOCK_SIZE, BLOCK_SIZE, 9]
+    assert np.concatenate([docs for docs, _ in blocks]).tolist() == doc_ids.tolist()
+    assert np.concatenate([f for _, f in blocks]).tolist() == frequencies.tolist()
+
+
+def test_empty_postings():
+    doc_ids, frequencies = decode_postings(encode_postings(np.array([]), np.array([])))
+
+    assert len(doc_ids) == len(frequencies) == 0
+
+
+def test_positions_round_trip():
+    counts = np.array([3, 1, 2])
+    positions = np.array([4, 5, 900, 0, 2, 70000])
+
+    encoded = encode_positions(positions, counts)
+
+    # Gaps restart with each posting's first position, plus one
+    assert decode_varints(encoded, 6).tolist() == [5, 1, 895, 1, 3, 69998]
+    assert decode_positions(encoded, counts).tolist() == positions.tolist()
+    assert decode_positions(b"", np.array([], dtype=np.int64)).tolist() == []
+
+
+def test_missing_positions_share_a_list_with_known_ones():
+    counts = np.array([2, 3, 1])
+    positions = np.array([4, 9] + [MISSING_POSITION] * 3 + [0])
+
+    encoded = encode_positions(positions, counts)
+
+    assert decode_positions(encoded, counts).tolist() == positions.tolist()
+    assert decode_positions(missing_positions(3), counts[1:2]).tolist() == [-1] * 3
@@ -0,0 +1,98 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from app.database.indexer import index_documents
+from app.database.models import Document, InvertedIndex, Term, TermPostings
+from app.database.postings_store import compact_postings, load_postings
+
+
+@pytest_asyncio.fixture
+async def doc_ids(db):
+    docs = [
+        Document(url=f"https://ics.uci.edu/{i}", title="", content="", is_crawled=True)
+        for i in range(3)
+    ]
+    db.add_all(docs)
+    await db.flush()
+    ids = [doc.id for doc in docs]
+    await db.commit()
+    return ids
+
+
+async def all_postings(db):
+    term_ids = (await db.execute(select(InvertedIndex.term_id))).scalars().all()
+    term_ids += (await db.execute(select(TermPostings.term_id))).scalars().all()
+    return [tuple(column.tolist()) for column in await load_postings(db, term_ids)]
+
+
+@pytest.mark.asyncio
+async def test_compaction_preserves_postings(db, doc_ids):
+    first, second, _ = doc_ids
+    await index_documents(
+        db, {first: {"uci": 2, "search": 1}, second: {"uci": 1, "crawler": 3}}
+    )
+    await db.commit()
+    before = await all_postings(db)
+
+    assert await compact_postings(db) == 3
+
+    assert await db.scalar(select(func.count()).select_from(InvertedIndex)) == 0
+    assert await db.scalar(select(func.count()).select_from(TermPostings)) == 3
+    assert await all_postings(db) == before
+
+
+@pytest.mark.asyncio
+async def test_compaction_merges_new_rows_into_blobs(db, doc_ids):
+    first, second, third = doc_ids
+    await index_documents(db, {first: {"uci": 2}, third: {"uci": 1}})
+    await db.commit()
+    await compact_postings(db)
+
+    await index_documents(db, {second: {"uci": 5, "crawler": 1}})
+    await db.commit()
+    before = await all_postings(db)
+    await compact_postings(db)
+
+    terms, docs, frequencies, lengths = await load_postings(
+        db, (await db.execute(select(TermPostings.term_id))).scalars().all()
+    )
+    assert [
+        tuple(column.tolist()) for column in (terms, docs, frequencies, lengths)
+    ] == before
+    uci = terms == terms[0]
+    assert docs[uci].tolist() == [first, second, third]
+    assert frequencies[uci].tolist() == [2, 5, 1]
+    assert lengths[uci].tolist() == [2, 6, 1]
+
+
+@pytest.mark.asyncio
+async def test_compaction_merges_positions(db, doc_ids):
+    first, second, third = doc_ids
+    await index_documents(
+        db,
+        {first: {"uci": 2, "crawler": 1}, third: {"uci": 1}},
+        {first: {"uci": [0, 4], "crawler": [1]}, third: {"uci": [7]}},
+    )
+    await db.commit()
+    await compact_postings(db)
+
+    # Replaces the first document's compacted postings
+    await index_documents(
+        db,
+        {first: {"uci": 1}, second: {"uci": 3, "crawler": 1}},
+        {first: {"uci": [2]}, second: {"uci": [1, 5, 6]}},
+    )
+    await db.commit()
+    await compact_postings(db)
+
+    term_ids = (await db.execute(select(TermPostings.term_id))).scalars().all()
+    terms, docs, frequencies, _, positions = await load_postings(
+        db, term_ids, with_positions=True
+    )
+    uci = await db.scalar(select(Term.id).where(Term.term == "uci"))
+    crawler = await db.scalar(select(Term.id).where(Term.term == "crawler"))
+    assert docs[terms == uci].tolist() == [first, second, third]
+    assert frequencies[terms == uci].tolist() == [1, 3, 1]
+    assert positions[uci].tolist() == [2, 1, 5, 6, 7]
+    # Only the second document's crawler posting was indexed without positions
+    assert positions[crawler].tolist() == [1, -1]
@@ -0,0 +1,74 @@
+from app.utils.query_cache import QueryCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hit_and_miss_are_counted():
+    cache = QueryCache()
+
+    assert cache.get("uci", 1) is None
+    cache.put("uci", 1, {"results": []})
+
+    assert cache.get("uci", 1) == {"results": []}
+    assert cache.statistics()["hits"] == 1
+    assert cache.statistics()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryCache(max_entries=2)
+    cache.put("a", 1, 1)
+    cache.put("b", 1, 2)
+    cache.get("a", 1)
+    cache.put("c", 1, 3)
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == 1
+    assert cache.get("c", 1) == 3
+    assert cache.evictions == 1
+
+
+def test_size_bound_evicts_entries():
+    cache = QueryCache(max_bytes=10, sizeof=len)
+    cache.put("a", 1, "x" * 6)
+    cache.put("b", 1, "y" * 6)
+    cache.put("c", 1, "z" * 20)
+
+    assert len(cache) == 1
+    assert cache.get("b", 1) == "y" * 6
+    assert cache.statistics()["bytes"] == 6
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = QueryCache(ttl=10, clock=clock)
+    cache.put("uci", 1, "results")
+    clock.now = 9.0
+    assert cache.get("uci", 1) == "results"
+
+    clock.now = 10.0
+    assert cache.get("uci", 1) is None
+    assert len(cache) == 0
+
+
+def test_new_generation_invalidates_cache():
+    cache = QueryCache()
+    cache.put("uci", 1, "old")
+
+    assert cache.get("uci", 2) is None
+    assert cache.invalidations == 1
+    # A response computed before the index changed is not kept
+    cache.put("uci", 1, "stale")
+    assert cache.get("uci", 2) is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = QueryCache(max_entries=0)
+    cache.put("uci", 1, "results")
+
+    assert cache.get("uci", 1) is None
@@ -0,0 +1,16 @@
+from app.utils.query_parser import parse_query
+
+
+def test_quoted_words_form_phrases():
+    query = parse_query('UCI "Web Crawler" politeness "web crawler" "crawler"')
+
+    assert query.terms == ("uci", "web", "crawler", "politeness")
+    assert query.phrases == (("web", "crawler"),)
+
+
+def test_unmatched_quote_is_ignored():
+    query = parse_query('"search engine" "ranking bm25')
+
+    assert query.terms == ("search", "engine", "ranking", "bm25")
+    assert query.phrases == (("search", "engine"),)
+    assert parse_query("search engine") == parse_query('search, "engine')
@@ -0,0 +1,19 @@
+import numpy as np
+from app.utils.ranking import PostingList, accumulate, top_k
+
+
+def test_top_k_orders_best_first_with_ties_by_document():
+    docs = np.array([10, 11, 12, 13, 14])
+    scores = np.array([0.5, 2.0, 1.0, 2.0, 0.1])
+
+    assert top_k(docs, scores, 3)[0].tolist() == [11, 13, 12]
+    assert top_k(docs, scores, 10)[0].tolist() == [11, 13, 12, 10, 14]
+
+
+def test_accumulate_sparse_and_dense_ids_agree():
+    lists = [PostingList(np.array([1, 2]), np.array([2.0, 1.0]))]
+    dense = accumulate(lists + [PostingList(np.array([2]), np.array([3.0]))])
+    sparse = accumulate(lists + [PostingList(np.array([2000]), np.array([3.0]))])
+
+    assert dense[0].tolist() == [1, 2] and dense[1].tolist() == [2.0, 4.0]
+    assert sparse[0].tolist() == [1, 2, 2000]
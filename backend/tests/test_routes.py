@@ -0,0 +1,60 @@
+import os
+import httpx
+import pytest
+from app.api import routes
+from app.config.globals import get_current_db
+from app.main import app, lifespan
+from app.config.settings import settings
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("segments", [False, True])
+async def test_clear_index_touches_segments_only_when_enabled(
+    db, tmp_path, monkeypatch, segments
+):
+    monkeypatch.setattr(settings, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "INDEX_SEGMENTS", segments)
+
+    await routes.clear_index(db)
+
+    assert any(name.endswith(".segments") for name in os.listdir(tmp_path)) == segments
+
+
+@pytest.mark.asyncio
+async def test_search_client_lives_with_the_application(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "SEARCH_SERVER_URL", "http://127.0.0.1:9")
+
+    async with lifespan(app):
+        client = routes._search_client
+        assert client is not None and not client.is_closed
+
+    assert client.is_closed
+    assert routes._search_client is None
+
+
+@pytest.mark.asyncio
+async def test_search_runs_here_when_the_server_serves_another_database(
+    monkeypatch,
+):
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.params["db"])
+        return httpx.Response(409, json={"detail": "Search server serves other"})
+
+    async def search_index(query, page, per_page):
+        return {"query": query, "served_here": True}
+
+    monkeypatch.setattr(settings, "SEARCH_SERVER_URL", "http://search")
+    monkeypatch.setattr(routes, "search_index", search_index)
+    client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler), base_url="http://search"
+    )
+    monkeypatch.setattr(routes, "_search_client", client)
+
+    response = await routes.search("crawler", 1, 10)
+    await client.aclose()
+
+    assert requested == [get_current_db()]
+    assert response["served_here"]
@@ -0,0 +1,98 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.config.settings import settings
+from app.database.connection import get_db_path
+from app.database.indexer import index_documents
+from app.database.models import Base, Document
+from app.search_server import DB_ENV_VAR, app, migrate_database
+
+
+async def _add_page(
+    db_path: str, url: str, terms: dict, positions: dict = None
+) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as db:
+        doc = Document(url=url, title=url, content=" ".join(terms))
+        db.add(doc)
+        await db.flush()
+        await index_documents(db, {doc.id: terms}, {doc.id: positions or {}})
+        await db.commit()
+    await engine.dispose()
+
+
+async def _drop_positions(db_path: str) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("ALTER TABLE inverted_index DROP COLUMN positions")
+    await engine.dispose()
+
+
+async def _columns(db_path: str, table: str) -> set:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with engine.connect() as conn:
+        columns = await conn.run_sync(
+            lambda sync: {c["name"] for c in inspect(sync).get_columns(table)}
+        )
+    await engine.dispose()
+    return columns
+
+
+def test_search_server_serves_read_only_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DB_DIR", str(tmp_path))
+    monkeypatch.setenv(DB_ENV_VAR, "served")
+    db_path = get_db_path("served")
+    asyncio.run(_add_page(db_path, "https://ics.uci.edu/a", {"crawler": 1}))
+
+    with TestClient(app) as client:
+        first = client.get("/api/search", params={"query": "crawler"}).json()
+        client.get("/api/search", params={"query": "Crawler"})
+        cache = client.get("/api/search/cache").json()
+
+        # The crawler writes from another process
+        asyncio.run(_add_page(db_path, "https://ics.uci.edu/b", {"crawler": 2}))
+        after_write = client.get("/api/search", params={"query": "crawler"}).json()
+
+    assert first["total_results"] == 1
+    assert cache["hits"] == 1
+    assert after_write["total_results"] == 2
+
+
+def test_search_server_refuses_other_databases(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DB_DIR", str(tmp_path))
+    monkeypatch.setenv(DB_ENV_VAR, "served")
+    asyncio.run(_add_page(get_db_path("served"), "https://ics.uci.edu/a", {"a": 1}))
+
+    with TestClient(app) as client:
+        served = client.get("/api/search", params={"query": "a", "db": "served"})
+        other = client.get("/api/search", params={"query": "a", "db": "other"})
+
+    assert served.json()["total_results"] == 1
+    assert other.status_code == 409
+
+
+def test_migrated_old_database_serves_phrases(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DB_DIR", str(tmp_path))
+    monkeypatch.setenv(DB_ENV_VAR, "old")
+    db_path = get_db_path("old")
+    asyncio.run(_add_page(db_path, "https://ics.uci.edu/a", {"web": 1}))
+    asyncio.run(_drop_positions(db_path))
+
+    asyncio.run(migrate_database("old"))
+    assert "positions" in asyncio.run(_columns(db_path, "inverted_index"))
+    asyncio.run(
+        _add_page(
+            db_path,
+            "https://ics.uci.edu/b",
+            {"web": 1, "crawler": 1},
+            {"web": [0], "crawler": [1]},
+        )
+    )
+
+    with TestClient(app) as client:
+        response = client.get("/api/search", params={"query": '"web crawler"'})
+
+    assert response.json()["total_results"] == 1
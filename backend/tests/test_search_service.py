@@ -0,0 +1,182 @@
+import threading
+import pytest
+import pytest_asyncio
+from app.api.search import SearchService
+from app.database.indexer import index_documents
+from app.database.models import Document
+from app.database.postings_store import compact_postings
+from app.database.term_dictionary import get_term_dictionary
+from app.utils.tokenizer import get_token_positions, process_text, tokenize
+
+
+@pytest_asyncio.fixture
+async def search_service(db, documents):
+    return SearchService(db)
+
+
+async def add_page(db, url, text, with_positions=True):
+    doc = Document(url=url, title=url, content=text, is_crawled=True)
+    db.add(doc)
+    await db.flush()
+    positions = (
+        {doc.id: get_token_positions(tokenize(text))} if with_positions else None
+    )
+    await index_documents(db, {doc.id: process_text(text)}, positions)
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_by_bm25(search_service):
+    response = await search_service.search("crawler")
+
+    assert response["total_results"] == 5
+    assert response["results"][0]["url"] == "https://ics.uci.edu/crawler"
+    scores = [result["score"] for result in response["results"]]
+    assert scores == sorted(scores, reverse=True) and scores[-1] > 0
+    # Same frequency, so the shorter document ranks higher
+    urls = [result["url"] for result in response["results"]]
+    assert urls.index("https://ics.uci.edu/unicode") < urls.index(
+        "https://ics.uci.edu/search"
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_sums_scores_across_terms(search_service):
+    response = await search_service.search("search crawler")
+
+    urls = [result["url"] for result in response["results"]]
+    assert urls[:2] == ["https://ics.uci.edu/engine", "https://ics.uci.edu/search"]
+
+
+@pytest.mark.asyncio
+async def test_search_paginates(search_service):
+    response = await search_service.search("crawler", page=3, per_page=2)
+
+    assert response["total_pages"] == 3
+    assert [r["url"] for r in response["results"]] == ["https://ics.uci.edu/search"]
+
+
+@pytest.mark.asyncio
+async def test_search_without_matches(search_service):
+    response = await search_service.search("nonexistent")
+
+    assert response["total_results"] == 0
+    assert response["results"] == []
+
+
+@pytest.mark.asyncio
+async def test_search_after_compaction(search_service):
+    expected = await search_service.search("search crawler")
+
+    await compact_postings(search_service.db)
+
+    assert await search_service.search("search crawler") == expected
+
+
+@pytest.mark.asyncio
+async def test_search_reuses_term_dictionary(search_service, db):
+    dictionary = get_term_dictionary(db.bind)
+    await search_service.search("crawler parking")
+    misses = dictionary.misses
+
+    await search_service.search("crawler")
+
+    assert dictionary.misses == misses
+    assert dictionary.hits >= 1
+
+
+@pytest.mark.asyncio
+async def test_term_dictionary_sees_new_documents(search_service, db):
+    await search_service.search("parking")
+    doc = Document(url="https://ics.uci.edu/permits", title="permits", content="")
+    db.add(doc)
+    await db.flush()
+    await index_documents(db, {doc.id: {"parking": 2}})
+    await db.commit()
+
+    response = await search_service.search("parking")
+
+    assert response["total_results"] == 3
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_off_the_event_loop(search_service, monkeypatch):
+    threads = []
+    rank = search_service._rank
+
+    def record_thread(*args):
+        threads.append(threading.get_ident())
+        return rank(*args)
+
+    monkeypatch.setattr(search_service, "_rank", record_thread)
+    response = await search_service.search("crawler")
+
+    assert response["total_results"] == 5
+    assert threads and threads[0] != threading.get_ident()
+
+
+@pytest.mark.asyncio
+async def test_phrase_query_requires_consecutive_terms(search_service):
+    response = await search_service.search('"web crawler"')
+    assert response["total_results"] == 1
+    assert response["results"][0]["url"] == "https://ics.uci.edu/crawler"
+
+    assert (await search_service.search('"crawler web"'))["total_results"] == 0
+    assert (await search_service.search('"web parking"'))["total_results"] == 0
+
+    # Other terms are still ranked, among documents with the phrase
+    response = await search_service.search('"search engine" crawler')
+    assert [r["url"] for r in response["results"]] == [
+        "https://ics.uci.edu/engine",
+        "https://ics.uci.edu/search",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_phrase_query_after_compaction(search_service):
+    await add_page(search_service.db, "https://ics.uci.edu/web", "the web crawler")
+    expected = await search_service.search('"web crawler"')
+
+    await compact_postings(search_service.db)
+
+    assert await search_service.search('"web crawler"') == expected
+    assert expected["total_results"] == 2
+
+
+@pytest.mark.asyncio
+async def test_postings_without_positions_match_no_phrase(search_service):
+    await add_page(
+        search_service.db,
+        "https://ics.uci.edu/web",
+        "web crawler",
+        with_positions=False,
+    )
+
+    # Documents indexed with positions still match the phrase
+    for compacted in (False, True):
+        if compacted:
+            await compact_postings(search_service.db)
+        response = await search_service.search('"web crawler"')
+        assert response["total_results"] == 1
+        assert response["results"][0]["url"] == "https://ics.uci.edu/crawler"
+    assert (await search_service.search("web crawler"))["total_results"] == 6
+
+
+@pytest.mark.asyncio
+async def test_proximity_ranks_closer_terms_higher(db):
+    for name, text in [
+        ("apart", "campus search parking engine"),
+        ("close", "campus parking search engine"),
+    ]:
+        await add_page(db, f"https://ics.uci.edu/{name}", text)
+
+    # Same frequencies and lengths, so BM25 alone ties
+    plain = await SearchService(db).search("search engine")
+    assert plain["results"][0]["score"] == plain["results"][1]["score"]
+
+    service = SearchService(db, proximity_weight=1.0)
+    response = await service.search("search engine")
+    urls = [r["url"] for r in response["results"]]
+    assert urls == ["https://ics.uci.edu/close", "https://ics.uci.edu/apart"]
+    scores = [r["score"] for r in response["results"]]
+    assert scores[0] - scores[1] == pytest.approx(1.0 - 1.0 / 2)
@@ -0,0 +1,117 @@
+import pytest
+from app.api.search import SearchService
+from app.database.indexer import index_documents
+from app.database.segmented_index import SegmentedIndex, _tier
+
+QUERIES = [
+    "crawler",
+    "search crawler",
+    "café",
+    "parking engine",
+    "nonexistent",
+    '"search engine" crawler',
+    '"engine search"',
+]
+
+
+async def assert_same_results(db, snapshot):
+    for query in QUERIES:
+        for proximity_weight in (0.0, 1.0):
+            expected = await SearchService(
+                db, proximity_weight=proximity_weight
+            ).search(query)
+            result = await SearchService(
+                segment=snapshot, proximity_weight=proximity_weight
+            ).search(query)
+            assert result == expected
+
+
+@pytest.mark.asyncio
+async def test_snapshot_searches_across_segments(db, documents, tmp_path):
+    index = SegmentedIndex(str(tmp_path))
+    # Out of id order, so segments interleave documents
+    for batch in ([documents[3], documents[0]], documents[1:3], documents[4:]):
+        index.add_documents(batch)
+
+    assert len(index) == 3
+    await assert_same_results(db, index.snapshot())
+
+
+@pytest.mark.asyncio
+async def test_merges_full_tiers_in_background(db, documents, tmp_path):
+    index = SegmentedIndex(str(tmp_path), merge_factor=2)
+    for doc in documents[:4]:
+        index.add_documents([doc])
+        index.schedule_merges()
+        await index.wait_for_merges()
+
+    # Four single-document segments merge into two, and those into one
+    assert len(index) == 1
+    index.add_documents(documents[4:])
+    assert index.merge_candidates() == []
+    await assert_same_results(db, index.snapshot())
+
+
+@pytest.mark.asyncio
+async def test_snapshot_outlives_merge(db, documents, tmp_path):
+    index = SegmentedIndex(str(tmp_path), merge_factor=len(documents))
+    for doc in documents:
+        index.add_documents([doc])
+    snapshot = index.snapshot()
+
+    index.merge(index.merge_candidates())
+
+    assert len(index) == 1
+    assert len(list(tmp_path.iterdir())) == 2
+    await assert_same_results(db, snapshot)
+
+
+@pytest.mark.asyncio
+async def test_readers_see_published_segments(db, documents, tmp_path):
+    writer = SegmentedIndex(str(tmp_path))
+    reader = SegmentedIndex(str(tmp_path))
+    writer.add_documents(documents[:2])
+    assert reader.snapshot().num_documents == 2
+
+    writer.add_documents(documents[2:])
+    writer.merge(writer.segment_names)
+
+    await assert_same_results(db, reader.snapshot())
+
+    writer.clear()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_documents_indexed_without_positions(db, corpus, tmp_path):
+    # The first document was indexed without positions
+    documents = [corpus[0]._replace(term_positions=None)] + corpus[1:]
+    await index_documents(
+        db,
+        {doc.doc_id: doc.term_frequencies for doc in documents},
+        {doc.doc_id: doc.term_positions for doc in documents[1:]},
+    )
+    await db.commit()
+    index = SegmentedIndex(str(tmp_path))
+    index.add_documents(documents[:3])
+    index.add_documents(documents[3:])
+    index.merge(index.segment_names)
+
+    await assert_same_results(db, index.snapshot())
+    response = await SearchService(segment=index.snapshot()).search(
+        '"crawler politeness"'
+    )
+    assert [r["url"] for r in response["results"]] == ["https://ics.uci.edu/politeness"]
+
+
+def test_tiers_are_exact_at_powers_of_the_merge_factor():
+    # math.log(1000, 10) is 2.9999999999999996
+    assert [_tier(size, 10) for size in (0, 1, 9, 10, 999, 1000, 1001)] == [
+        0,
+        0,
+        0,
+        1,
+        2,
+        3,
+        3,
+    ]
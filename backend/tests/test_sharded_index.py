@@ -0,0 +1,86 @@
+import os
+import pytest
+from app.api.search import SearchService
+from app.database.sharded_index import (
+    ShardedIndex,
+    close_sharded_indexes,
+    get_sharded_index,
+    remove_sharded_index,
+    shard_of,
+    shard_path,
+)
+
+QUERIES = [
+    "crawler",
+    "search crawler",
+    "café",
+    "parking engine",
+    "nonexistent",
+    '"search engine" crawler',
+    '"engine search"',
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("num_shards", [1, 3, 4])
+async def test_scatter_gather_matches_unsharded_search(
+    db, documents, tmp_path, num_shards
+):
+    index = ShardedIndex(str(tmp_path), num_shards)
+    index.add_documents(documents[:4])
+    index.add_documents(documents[4:])
+    snapshot = index.snapshot()
+
+    for query in QUERIES:
+        expected = await SearchService(db, proximity_weight=1.0).search(
+            query, per_page=3
+        )
+        result = await SearchService(segment=snapshot, proximity_weight=1.0).search(
+            query, per_page=3
+        )
+        assert result == expected
+
+
+@pytest.mark.asyncio
+async def test_documents_are_partitioned_by_id(documents, tmp_path):
+    index = ShardedIndex(str(tmp_path), 3)
+    index.add_documents(documents)
+
+    snapshot = index.snapshot()
+    for shard, shard_snapshot in enumerate(snapshot.shards):
+        ids = [doc.doc_id for doc in documents if shard_of(doc.doc_id, 3) == shard]
+        assert shard_snapshot.num_documents == len(ids)
+        assert set(shard_snapshot.documents(ids)) == set(ids)
+    assert snapshot.num_documents == len(documents)
+
+
+def test_shard_count_cannot_change(tmp_path):
+    ShardedIndex(str(tmp_path), 3)
+
+    with pytest.raises(ValueError):
+        ShardedIndex(str(tmp_path), 2)
+
+
+@pytest.mark.asyncio
+async def test_remove_sharded_index(documents, tmp_path):
+    directory = str(tmp_path / "index.shards")
+    index = ShardedIndex(directory, 2)
+    index.add_documents(documents)
+    await index.wait_for_merges()
+    assert os.path.isdir(shard_path(directory, 1))
+
+    remove_sharded_index(directory)
+
+    assert not os.path.exists(directory)
+
+
+def test_close_sharded_indexes_stops_their_threads(documents, tmp_path):
+    index = get_sharded_index(str(tmp_path), 2)
+    index.add_documents(documents)
+
+    close_sharded_indexes()
+
+    with pytest.raises(RuntimeError):
+        index.add_documents(documents)
+    assert get_sharded_index(str(tmp_path), 2) is not index
+    close_sharded_indexes()
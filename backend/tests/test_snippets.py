@@ -0,0 +1,41 @@
+from app.utils.snippets import build_passage_index, passage_snippet, passage_starts
+from app.utils.tokenizer import tokenize
+
+TEXT = (
+    "The campus has several libraries. "
+    "Parking permits are sold online.\n"
+    "The web crawler respects robots.txt and politeness delays. "
+    "Search results are ranked with BM25."
+)
+
+
+def snippet(text, query, max_length=80):
+    index = build_passage_index(text, max_length)
+    return passage_snippet(text, index, tokenize(query), max_length)
+
+
+def test_snippet_is_the_passage_with_most_query_terms():
+    assert snippet(TEXT, "crawler politeness").startswith("...The web crawler")
+    assert snippet(TEXT, "search ranked bm25").startswith("...Search results")
+
+
+def test_snippet_keeps_the_stored_text():
+    text = "Intro sentence here. The Café serves Résumé workshops daily."
+    result = snippet(text, "café", max_length=40)
+    assert result == "...The Café serves Résumé workshops daily."
+
+
+def test_snippet_without_matches_is_the_start_of_the_text():
+    assert snippet(TEXT, "nonexistent") == TEXT[:80].strip() + "..."
+    assert snippet("", "crawler") == ""
+
+
+def test_long_sentences_are_split_at_whitespace():
+    text = " ".join(f"word{i}" for i in range(100))
+    starts = passage_starts(text, 50)
+
+    ends = starts[1:] + [len(text)]
+    assert starts[0] == 0
+    assert all(0 < end - start <= 50 for start, end in zip(starts, ends))
+    assert all(text[start] == " " for start in starts[1:])
+    assert "word90" in snippet(text, "word90", max_length=50)
@@ -0,0 +1,35 @@
+import pytest
+from app.database.indexer import index_documents
+from app.database.models import Document
+from app.database.term_dictionary import TermDictionary
+
+
+@pytest.mark.asyncio
+async def test_lookup_remembers_terms_until_version_changes(db):
+    doc = Document(url="https://ics.uci.edu/", title="uci", content="uci ics")
+    db.add(doc)
+    await db.flush()
+    await index_documents(db, {doc.id: {"uci": 1, "ics": 1}})
+    await db.commit()
+    dictionary = TermDictionary()
+
+    first = await dictionary.lookup(db, ["uci", "missing"], version=1)
+    second = await dictionary.lookup(db, ["uci", "missing"], version=1)
+    third = await dictionary.lookup(db, ["uci"], version=2)
+
+    assert set(first) == {"uci"}
+    assert first["uci"][1] == 1
+    assert second == first
+    assert third == {"uci": first["uci"]}
+    assert dictionary.misses == 3
+    assert dictionary.hits == 2
+
+
+@pytest.mark.asyncio
+async def test_lookup_stays_within_size_bound(db):
+    dictionary = TermDictionary(max_terms=2)
+
+    await dictionary.lookup(db, ["a", "b"], version=1)
+    await dictionary.lookup(db, ["c"], version=1)
+
+    assert len(dictionary) == 1